@@ -0,0 +1,129 @@
+"""
+   Wall report and volume scan stages timed over recorded exchange responses, offline
+
+   run from discord_pure_bot: python -m benchmarks.pipeline
+   record fresh fixtures with: python -m benchmarks.record_fixtures
+"""
+
+import timeit
+import tracemalloc
+
+from digicoins import decoding
+from digicoins.entity import registry
+from benchmarks.replay import ReplayQueryExecutor
+from wall_calculator import WallCalculator
+from volume_history import VolumeHistory,MarketVolumeStore
+from subscriptions import SubscriptionIndex,DEFAULT_SUBSCRIPTIONS
+
+# name, exchange, market, requested depth, cut to the requested depth like !walls does
+BOOK_CASES = [
+    ("bittrex 50", "BITTREX", registry.market("BTC", "LTC"), 50, True),
+    ("bittrex 500", "BITTREX", registry.market("BTC", "LTC"), 500, True),
+    ("gdax level2", "GDAX", registry.market("USD", "BTC"), 50, True),
+    ("gdax level3", "GDAX", registry.market("USD", "BTC"), 500, False),
+    ("bitfinex 50", "BITFINEX", registry.market("USD", "BTC"), 50, True),
+    ("bitfinex 500", "BITFINEX", registry.market("USD", "BTC"), 500, True),
+]
+
+# minutes -> rule, with rolling statistics next to plain changes as !tf sets them
+TRACKED_TIMEFRAMES = {5: 0.1, 15: {"change": 0.15, "z": 3.0}, 30: {"rise": 0.2}, 60: 0.3,
+                      240: {"change": 0.5, "breakout": 0.1}, 1440: 1.0}
+# one tick a minute like the bittrex poller
+POLL_INTERVAL = 60
+
+
+def measure(operation, budget=0.2):
+    """
+    :return: (seconds per call, peak bytes allocated by one call, blocks still held after it)
+    """
+    timer = timeit.Timer(operation)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * budget / max(elapsed, 1e-9)))
+    seconds = min(timer.repeat(repeat=5, number=number)) / number
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        result = operation()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    del result
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    return seconds, peak - base, blocks
+
+
+def report(name, stage, items, measured):
+    seconds, peak, blocks = measured
+    print("{:<14} {:<8} {:>12.1f} {:>12.0f} {:>14.0f} {:>11.1f} {:>9}".format(
+        name, stage, seconds * 1e6, 1 / seconds, items / seconds, peak / 1024, blocks))
+
+
+def wall_pipeline(executor, calculator):
+    for name, exchange, market, depth, cut in BOOK_CASES:
+        client = executor.clients[exchange]
+
+        def parse():
+            order_book = client.get_order_book(market, depth)
+            return order_book.cut(depth) if cut else order_book
+
+        order_book = parse()
+        ticker = client.get_ticker(market)
+        levels = order_book.depth("asks") + order_book.depth("bids")
+        model = calculator.calculate_walls_model(order_book, ticker)
+
+        report(name, "parse", levels, measure(parse))
+        report(name, "model", levels, measure(lambda: calculator.calculate_walls_model(order_book, ticker)))
+        report(name, "view", len(model.walls), measure(model.view))
+
+        def render():
+            # the replayed book is the same every time, keep the report cache out of the total
+            calculator.report_cache.entries.clear()
+            return calculator.render(parse(), ticker)
+
+        report(name, "total", levels, measure(render))
+        report(name, "cached", levels, measure(lambda: calculator.render(order_book, ticker)))
+
+
+def filled_store(client, subscriptions):
+    """
+    MarketVolumeStore of bittrex full of a day of minutes, volumes drifting around the recorded ones
+    """
+    history = VolumeHistory(MarketVolumeStore.capacity(POLL_INTERVAL), market_filter=subscriptions.__contains__)
+    store = MarketVolumeStore({"BITTREX": history}, {"BITTREX": POLL_INTERVAL})
+    names, volumes = client.parse_volumes(client.client.get_market_summaries(), subscriptions.matches_market)
+    for tick in range(history.capacity):
+        store.record("BITTREX", names, volumes * (1 + 0.0005 * (tick % 97)))
+    return store, names, volumes
+
+
+def volume_scan(executor):
+    # the stages a VolumeScanner tick runs: parse the polled summaries, record them, scan for alerts
+    client = executor.clients["BITTREX"]
+    subscriptions = SubscriptionIndex(DEFAULT_SUBSCRIPTIONS)
+    store, names, volumes = filled_store(client, subscriptions)
+    markets = len(names)
+
+    def parse():
+        return client.parse_volumes(client.client.get_market_summaries(), subscriptions.matches_market)
+
+    report("summaries", "parse", markets, measure(parse))
+    report("summaries", "record", markets, measure(lambda: store.record("BITTREX", names, volumes)))
+    report("summaries", "scan", markets * len(TRACKED_TIMEFRAMES), measure(lambda: store.scan("BITTREX", TRACKED_TIMEFRAMES)))
+
+
+def main():
+    executor = ReplayQueryExecutor()
+    calculator = WallCalculator(executor)
+    print("json backend:", decoding.BACKEND)
+    print("{:<14} {:<8} {:>12} {:>12} {:>14} {:>11} {:>9}".format(
+        "case", "stage", "us/op", "ops/s", "items/s", "peak KiB", "blocks"))
+    wall_pipeline(executor, calculator)
+    volume_scan(executor)
+
+
+if __name__ == "__main__":
+    main()
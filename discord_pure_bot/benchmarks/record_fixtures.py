@@ -0,0 +1,222 @@
+"""
+   Records the exchange responses replayed by the offline benchmarks
+
+   run from discord_pure_bot: python -m benchmarks.record_fixtures [--synthetic]
+
+   Without --synthetic every fixture is fetched from the live public APIs,
+   with it a seeded generator writes payloads of the same shape and size
+"""
+
+import gzip
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+from digicoins.libs import sessions
+
+FIXTURE_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "responses")
+
+BITTREX_URL = "https://bittrex.com/api/v1.1/public/"
+GDAX_URL = "https://api.gdax.com"
+BITFINEX_URL = "https://api.bitfinex.com/v1"
+
+BITTREX_MARKET = "BTC-LTC"
+GDAX_MARKET = "BTC-USD"
+BITFINEX_MARKET = "btcusd"
+
+SMALL_DEPTH = 50
+LARGE_DEPTH = 500
+
+# fixtures bigger than this are stored gzipped
+GZIP_OVER = 256 * 1024
+
+
+def fixture_path(exchange, name):
+    return os.path.join(FIXTURE_ROOT, exchange, name + ".json")
+
+
+def write_fixture(exchange, name, payload):
+    path = fixture_path(exchange, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf8")
+    for stale in (path, path + ".gz"):
+        if os.path.exists(stale):
+            os.remove(stale)
+    if len(raw) > GZIP_OVER:
+        path += ".gz"
+        with gzip.GzipFile(path, "wb", mtime=0) as file:
+            file.write(raw)
+    else:
+        with open(path, "wb") as file:
+            file.write(raw)
+    print("wrote", path, len(raw), "bytes")
+
+
+def record_live():
+    session = sessions.blocking_session()
+
+    def get(url, params=None):
+        return session.get(url, params=params, timeout=sessions.TIMEOUTS).json()
+
+    write_fixture("bittrex", "getmarkets", get(BITTREX_URL + "getmarkets"))
+    write_fixture("bittrex", "getmarketsummaries", get(BITTREX_URL + "getmarketsummaries"))
+    write_fixture("bittrex", "getticker", get(BITTREX_URL + "getticker", {"market": BITTREX_MARKET}))
+    book = get(BITTREX_URL + "getorderbook", {"market": BITTREX_MARKET, "type": "both"})
+    for depth in (SMALL_DEPTH, LARGE_DEPTH):
+        cut = dict(book, result={side: levels[:depth] for side, levels in book["result"].items()})
+        write_fixture("bittrex", "getorderbook_{}".format(depth), cut)
+
+    write_fixture("gdax", "products", get(GDAX_URL + "/products"))
+    write_fixture("gdax", "ticker", get(GDAX_URL + "/products/{}/ticker".format(GDAX_MARKET)))
+    write_fixture("gdax", "book_level2", get(GDAX_URL + "/products/{}/book".format(GDAX_MARKET), {"level": 2}))
+    write_fixture("gdax", "book_level3", get(GDAX_URL + "/products/{}/book".format(GDAX_MARKET), {"level": 3}))
+
+    write_fixture("bitfinex", "tickers", get(BITFINEX_URL + "/tickers"))
+    write_fixture("bitfinex", "pubticker", get(BITFINEX_URL + "/pubticker/" + BITFINEX_MARKET))
+    for depth in (SMALL_DEPTH, LARGE_DEPTH):
+        write_fixture("bitfinex", "book_{}".format(depth),
+                      get(BITFINEX_URL + "/book/" + BITFINEX_MARKET, {"limit_bids": depth, "limit_asks": depth}))
+
+
+SYNTHETIC_COINS = [
+    "LTC", "ETH", "DOGE", "XRP", "DASH", "XMR", "ZEC", "ETC", "NEO", "OMG", "QTUM", "LSK", "STRAT", "WAVES", "ARK",
+    "XEM", "XLM", "ADA", "BCC", "BTG", "SC", "DGB", "RDD", "NXT", "SYS", "VTC", "PIVX", "NAV", "GRS", "VIA",
+    "BLK", "POT", "GAME", "DCR", "STEEM", "SBD", "FCT", "MAID", "REP", "GNT", "GNO", "ANT", "BAT", "CVC", "PAY",
+    "STORJ", "SNT", "MCO", "EDG", "WINGS", "RLC", "GUP", "LUN", "TKN", "HMQ", "ADX", "QRL", "MTL", "BNT", "FUN",
+    "SALT", "ENG", "UKG", "POWR", "MANA", "XVG", "BURST", "EMC2", "NMR", "SNGLS", "TRST", "UBQ", "KMD", "ARDR",
+    "EXP", "GBYTE", "DNT", "AMP", "CLOAK", "SPR", "XZC", "NXS", "BAY", "SHIFT", "RADS", "EMC", "OK", "IOP", "XEL",
+    "SIB", "MONA", "EBST", "VRC", "FLO", "PTOY", "CRB", "BLOCK", "ZEN", "GOLOS", "INCNT", "SWT", "MUE", "XWC"
+]
+
+
+def synthetic_book_levels(generator, mid, tick, depth, side):
+    direction = 1 if side == "asks" else -1
+    levels = []
+    rate = mid + direction * tick
+    for _ in range(depth):
+        # mostly dust with now and then a wall
+        quantity = generator.lognormvariate(0.0, 1.2) * (12 if generator.random() < 0.03 else 1)
+        levels.append((round(rate, 8), round(quantity, 8)))
+        rate += direction * tick * generator.randint(1, 4)
+    return levels
+
+
+def synthetic_bittrex(generator):
+    markets = []
+    summaries = []
+    created = "2014-02-13T00:00:00"
+    for base, count in (("BTC", len(SYNTHETIC_COINS)), ("ETH", 60), ("USDT", 12)):
+        for coin in SYNTHETIC_COINS[:count]:
+            name = "{}-{}".format(base, coin)
+            markets.append({
+                "MarketCurrency": coin, "BaseCurrency": base, "MarketCurrencyLong": coin.title(),
+                "BaseCurrencyLong": base.title(), "MinTradeSize": 1e-8, "MarketName": name,
+                "IsActive": True, "Created": created, "Notice": None, "IsSponsored": None, "LogoUrl": None
+            })
+            last = generator.uniform(0.00000100, 0.05) if base != "USDT" else generator.uniform(1, 1000)
+            volume = generator.lognormvariate(9, 2)
+            summaries.append({
+                "MarketName": name, "High": round(last * 1.08, 8), "Low": round(last * 0.93, 8),
+                "Volume": round(volume, 8), "Last": round(last, 8), "BaseVolume": round(volume * last, 8),
+                "TimeStamp": "2018-01-27T12:00:{:02d}.{:03d}".format(generator.randint(0, 59), generator.randint(0, 999)),
+                "Bid": round(last * 0.998, 8), "Ask": round(last * 1.002, 8),
+                "OpenBuyOrders": generator.randint(10, 5000), "OpenSellOrders": generator.randint(10, 5000),
+                "PrevDay": round(last * generator.uniform(0.9, 1.1), 8), "Created": created
+            })
+    write_fixture("bittrex", "getmarkets", {"success": True, "message": "", "result": markets})
+    write_fixture("bittrex", "getmarketsummaries", {"success": True, "message": "", "result": summaries})
+
+    mid = 0.0161
+    write_fixture("bittrex", "getticker", {"success": True, "message": "", "result": {"Bid": 0.01609, "Ask": 0.01611, "Last": mid}})
+    asks = synthetic_book_levels(generator, mid, 0.00000100, LARGE_DEPTH, "asks")
+    bids = synthetic_book_levels(generator, mid, 0.00000100, LARGE_DEPTH, "bids")
+    for depth in (SMALL_DEPTH, LARGE_DEPTH):
+        write_fixture("bittrex", "getorderbook_{}".format(depth), {"success": True, "message": "", "result": {
+            "buy": [{"Quantity": quantity, "Rate": rate} for rate, quantity in bids[:depth]],
+            "sell": [{"Quantity": quantity, "Rate": rate} for rate, quantity in asks[:depth]]
+        }})
+
+
+def synthetic_gdax(generator):
+    products = []
+    for base, quote in (("BTC", "USD"), ("BTC", "EUR"), ("BTC", "GBP"), ("ETH", "USD"), ("ETH", "EUR"),
+                        ("ETH", "BTC"), ("LTC", "USD"), ("LTC", "EUR"), ("LTC", "BTC")):
+        products.append({
+            "id": "{}-{}".format(base, quote), "base_currency": base, "quote_currency": quote,
+            "base_min_size": "0.01", "base_max_size": "10000", "quote_increment": "0.01",
+            "display_name": "{}/{}".format(base, quote), "status": "online", "margin_enabled": False,
+            "status_message": None
+        })
+    write_fixture("gdax", "products", products)
+
+    mid = 11250.00
+    write_fixture("gdax", "ticker", {"trade_id": 36410001, "price": "11250.00000000", "size": "0.01000000",
+                                     "bid": "11249.99", "ask": "11250", "volume": "14202.51330729",
+                                     "time": "2018-01-27T12:00:00.123000Z"})
+
+    sequence = 4913270001
+    level2 = {"sequence": sequence, "bids": [], "asks": []}
+    level3 = {"sequence": sequence, "bids": [], "asks": []}
+    for side in ("asks", "bids"):
+        # the full book has about 14000 resting orders a side spread over a few thousand prices
+        for rate, quantity in synthetic_book_levels(generator, mid, 0.01, 4500, side):
+            orders = max(1, int(generator.expovariate(1 / 3.0)))
+            sizes = [quantity / orders] * orders
+            for size in sizes:
+                level3[side].append(["{:.2f}".format(rate), "{:.8f}".format(size), str(uuid.UUID(int=generator.getrandbits(128)))])
+            if len(level2[side]) < SMALL_DEPTH:
+                level2[side].append(["{:.2f}".format(rate), "{:.8f}".format(quantity), orders])
+    write_fixture("gdax", "book_level2", level2)
+    write_fixture("gdax", "book_level3", level3)
+
+
+def synthetic_bitfinex(generator):
+    timestamp = 1517054400.0
+    tickers = []
+    for pair in ("btcusd", "ltcusd", "ltcbtc", "ethusd", "ethbtc", "etcbtc", "etcusd", "rrtusd", "rrtbtc", "zecusd",
+                 "zecbtc", "xmrusd", "xmrbtc", "dshusd", "dshbtc", "btceur", "xrpusd", "xrpbtc", "iotusd", "iotbtc",
+                 "ioteth", "eosusd", "eosbtc", "eoseth", "sanusd", "sanbtc", "saneth", "omgusd", "omgbtc", "omgeth"):
+        last = generator.uniform(0.001, 12000)
+        tickers.append({
+            "mid": "{:.5f}".format(last), "bid": "{:.5f}".format(last * 0.999), "ask": "{:.5f}".format(last * 1.001),
+            "last_price": "{:.5f}".format(last), "low": "{:.5f}".format(last * 0.95), "high": "{:.5f}".format(last * 1.05),
+            "volume": "{:.8f}".format(generator.lognormvariate(9, 2)), "timestamp": "{:.6f}".format(timestamp), "pair": pair.upper()
+        })
+    write_fixture("bitfinex", "tickers", tickers)
+
+    mid = 11260.0
+    write_fixture("bitfinex", "pubticker", {
+        "mid": "11260.05", "bid": "11260.0", "ask": "11260.1", "last_price": "11260.0", "low": "10900.0",
+        "high": "11500.0", "volume": "41523.51962843", "timestamp": "{:.6f}".format(timestamp)
+    })
+    asks = synthetic_book_levels(generator, mid, 0.1, LARGE_DEPTH, "asks")
+    bids = synthetic_book_levels(generator, mid, 0.1, LARGE_DEPTH, "bids")
+    for depth in (SMALL_DEPTH, LARGE_DEPTH):
+        write_fixture("bitfinex", "book_{}".format(depth), {
+            side: [{"price": "{:.1f}".format(rate), "amount": "{:.8f}".format(quantity), "timestamp": "{:.1f}".format(timestamp)}
+                   for rate, quantity in levels[:depth]]
+            for side, levels in (("bids", bids), ("asks", asks))
+        })
+
+
+def record_synthetic(seed=20180127):
+    generator = random.Random(seed)
+    synthetic_bittrex(generator)
+    synthetic_gdax(generator)
+    synthetic_bitfinex(generator)
+
+
+def main():
+    started = time.time()
+    if "--synthetic" in sys.argv[1:]:
+        record_synthetic()
+    else:
+        record_live()
+    print("done in {:.1f}s".format(time.time() - started))
+
+
+if __name__ == "__main__":
+    main()
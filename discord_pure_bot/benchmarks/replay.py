@@ -0,0 +1,138 @@
+"""
+   Public clients answering from the recorded fixtures instead of the exchanges,
+   every call decodes the recorded bytes again like a fresh http response
+"""
+
+import gzip
+import os
+
+from digicoins import decoding
+from digicoins.digicoinlib import BittrexPublicClient,GdaxPublicClient,BitfinexPublicClient
+from digicoins.cache import ExpiringLruCache
+from digicoins.queries import PublicClientQueryExecutor
+from benchmarks.record_fixtures import fixture_path,SMALL_DEPTH
+
+
+def read_fixture(exchange, name):
+    path = fixture_path(exchange, name)
+    if os.path.exists(path):
+        with open(path, "rb") as file:
+            return file.read()
+    with gzip.open(path + ".gz", "rb") as file:
+        return file.read()
+
+
+class ReplayApi:
+    def __init__(self, exchange):
+        self.exchange = exchange
+        self.raw = {}
+
+    def response(self, name):
+        if name not in self.raw:
+            self.raw[name] = read_fixture(self.exchange, name)
+        return decoding.loads(self.raw[name])
+
+
+class ReplayBittrexApi(ReplayApi):
+    def __init__(self):
+        super().__init__("bittrex")
+
+    def get_markets(self):
+        return self.response("getmarkets")
+
+    def get_market_summaries(self):
+        return self.response("getmarketsummaries")
+
+    def get_ticker(self, market):
+        return self.response("getticker")
+
+    def get_orderbook(self, market, depth_type="both", depth=SMALL_DEPTH):
+        return self.response("getorderbook_{}".format(depth))
+
+
+class ReplayGdaxApi(ReplayApi):
+    def __init__(self):
+        super().__init__("gdax")
+
+    def get_products(self):
+        return self.response("products")
+
+    def get_product_ticker(self, product_id):
+        return self.response("ticker")
+
+    def get_product_order_book(self, product_id, level=1):
+        return self.response("book_level{}".format(level))
+
+
+class ReplayBitfinexApi(ReplayApi):
+    def __init__(self):
+        super().__init__("bitfinex")
+
+    def tickers(self):
+        return self.response("tickers")
+
+    def ticker(self, symbol):
+        # same float conversion as bitfinex.Client.ticker
+        return {key: float(value) for key, value in self.response("pubticker").items()}
+
+    def order_book(self, symbol, parameters=None):
+        data = self.response("book_{}".format(parameters["limit_bids"]))
+        # same float conversion as bitfinex.Client.order_book
+        for side in data:
+            for entry in data[side]:
+                for key, value in entry.items():
+                    entry[key] = float(value)
+        return data
+
+
+class ReplayBittrexPublicClient(BittrexPublicClient):
+
+    def __init_child__(self):
+        self.name = "Bittrex"
+        self.client = ReplayBittrexApi()
+
+    def get_order_book(self,market,depth=50):
+        # Bittrex sends its whole book, the recordings are cut to 50 and 500 levels
+        return self.__get_order_book__(
+            market=market,
+            depth=depth,
+            order_book_method=lambda market,depth:self.client.get_orderbook(market,depth_type="both",depth=depth),
+            response_validation=BittrexPublicClient.__default_response_validator__,
+            ask_getter=lambda response: response['result']['sell'],
+            bid_getter=lambda response:response['result']['buy'],
+            level_fields=('Rate','Quantity'),
+            timestamp_getter=lambda response: None
+        )
+
+
+class ReplayGdaxPublicClient(GdaxPublicClient):
+
+    def __init_child__(self):
+        self.name = "Gdax"
+        self.client = ReplayGdaxApi()
+
+
+class ReplayBitfinexPublicClient(BitfinexPublicClient):
+
+    def __init_child__(self):
+        self.name = "Bitfinex"
+        self.client = ReplayBitfinexApi()
+
+
+class ReplayQueryExecutor(PublicClientQueryExecutor):
+    """
+    Query executor over the recordings, with the response caches turned off
+    """
+
+    def __init__(self):
+        super().__init__()
+        # entries expire as soon as they are stored
+        self.order_book_cache = ExpiringLruCache({}, self.presets["cache_max_entries"], default_ttl=-1.0)
+        self.ticker_cache = ExpiringLruCache({}, self.presets["cache_max_entries"], default_ttl=-1.0)
+
+    def __create_clients__(self):
+        return {
+            "GDAX" : ReplayGdaxPublicClient(),
+            "BITFINEX" : ReplayBitfinexPublicClient(),
+            "BITTREX" : ReplayBittrexPublicClient()
+        }
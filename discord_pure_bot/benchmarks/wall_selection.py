@@ -0,0 +1,76 @@
+"""
+   Wall selection cost against book depth, offline. tests/test_wall_engine.py checks
+   that the wall engine selects the same levels as the entry sort it replaced
+
+   run from discord_pure_bot: python -m benchmarks.wall_selection
+"""
+
+import random
+import timeit
+
+import numpy as np
+
+from digicoins.entity import registry,OrderBookEntry,ColumnarOrderBook
+from wall_engine import WallEngine
+
+DEPTHS = [50, 100, 500, 5000, 50000]
+WALL_MAX_COUNT = 10
+
+
+def build_levels(depth, seed=7):
+    generator = random.Random(seed)
+    asks = [(1.0 + i * 0.0001, generator.expovariate(1.0)) for i in range(depth)]
+    bids = [(1.0 - i * 0.0001, generator.expovariate(1.0)) for i in range(depth)]
+    return asks, bids
+
+
+def sorted_entries(market, asks, bids):
+    # selection as done before the wall engine: entry objects, full sort of both sides
+    ask_entries = [OrderBookEntry(market, "asks", quantity, rate) for rate, quantity in asks]
+    bid_entries = [OrderBookEntry(market, "bids", quantity, rate) for rate, quantity in bids]
+
+    def select():
+        sum(bid.traded_quantity for bid in bid_entries)
+        sum(ask.traded_quantity for ask in ask_entries)
+        return sorted(bid_entries + ask_entries, key=lambda entry: entry.traded_quantity, reverse=True)[:WALL_MAX_COUNT]
+    return select
+
+
+def sorted_columns(order_book):
+    def select():
+        bid_quantities = order_book.quantities["bids"]
+        ask_quantities = order_book.quantities["asks"]
+        bid_quantities.sum()
+        ask_quantities.sum()
+        return np.argsort(-np.concatenate((bid_quantities, ask_quantities)), kind="stable")[:WALL_MAX_COUNT]
+    return select
+
+
+def wall_engine(order_book):
+    engine = WallEngine(WALL_MAX_COUNT)
+    return lambda: engine.select(order_book)
+
+
+def measure(select, budget=0.2):
+    timer = timeit.Timer(select)
+    number, _ = timer.autorange()
+    number = max(1, int(number * budget / 0.2))
+    return min(timer.repeat(repeat=5, number=number)) / number
+
+
+def main():
+    market = registry.market("BTC", "BENCH", "BTC-BENCH", "Bench")
+    print("{:>8} {:>16} {:>16} {:>16} {:>9}".format("depth", "entry sort us", "array sort us", "wall engine us", "speedup"))
+    for depth in DEPTHS:
+        asks, bids = build_levels(depth)
+        order_book = ColumnarOrderBook.from_levels(market, asks, bids)
+
+        entry_sort = measure(sorted_entries(market, asks, bids))
+        array_sort = measure(sorted_columns(order_book))
+        engine = measure(wall_engine(order_book))
+        print("{:>8} {:>16.1f} {:>16.1f} {:>16.1f} {:>8.1f}x".format(
+            depth, entry_sort * 1e6, array_sort * 1e6, engine * 1e6, entry_sort / engine))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import time
+from collections import OrderedDict
+
+
+class ExpiringLruCache:
+    """
+    Least recently used cache whose entries go stale after a per-exchange ttl,
+    keys are tuples starting with the exchange name
+    """
+
+    def __init__(self, ttls, max_entries=256, default_ttl=5.0):
+        self.ttls = ttls
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def ttl(self, key):
+        return self.ttls.get(key[0], self.default_ttl)
+
+    def get(self, key, accept=None):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl(key):
+            del self.entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        if accept is not None and not accept(value):
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = (time.monotonic(), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expirations": self.expirations,
+            "evictions": self.evictions
+        }
+
+    def __str__(self):
+        return "[ExpiringLruCache {}]".format(self.stats())
@@ -0,0 +1,49 @@
+import json
+import os
+import time
+
+
+class MarketCatalog:
+    """
+    Market lists of every exchange client saved to a local json file,
+    so clients can start from the last known markets without a round trip
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.saved_at = None
+
+    def load(self, clients):
+        """
+        Fills clients with the saved markets
+
+        :return: exchanges that were loaded
+        """
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, encoding="utf8") as file:
+                content = json.load(file)
+        except (OSError, ValueError) as problem:
+            print("unable to read market catalog", self.path, problem)
+            return []
+
+        self.saved_at = content.get("saved_at")
+        loaded = []
+        for exchange, entries in content.get("exchanges", {}).items():
+            if exchange in clients:
+                clients[exchange].load_markets(entries)
+                loaded.append(exchange)
+        return loaded
+
+    def save(self, clients):
+        content = {
+            "saved_at": time.time(),
+            "exchanges": {exchange: client.dump_markets() for exchange, client in clients.items() if client.markets}
+        }
+        # the bot and the volume worker process may save at the same time
+        temporary_path = "{}.{}.tmp".format(self.path, os.getpid())
+        with open(temporary_path, "w", encoding="utf8") as file:
+            json.dump(content, file)
+        os.replace(temporary_path, self.path)
+        self.saved_at = content["saved_at"]
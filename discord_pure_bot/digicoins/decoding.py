@@ -0,0 +1,56 @@
+"""
+   Response decoding shared by the exchange clients: orjson when it is installed,
+   book sides pulled into float64 columns in bulk
+"""
+
+import calendar
+import json
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = "json" if orjson is None else "orjson"
+
+EMPTY_COLUMN = np.empty(0, dtype=np.float64)
+
+
+def loads(body):
+    """
+    :param body: response bytes or text
+    """
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def book_columns(levels, price_field, quantity_field):
+    """
+    (prices, quantities) float64 arrays of one book side, numbers sent as strings are converted by numpy
+
+    :param levels: raw levels, lists or dicts
+    :param price_field: index or key of the price in a level
+    :param quantity_field: index or key of the quantity in a level
+    """
+    if not levels:
+        return EMPTY_COLUMN, EMPTY_COLUMN
+    prices = np.array([level[price_field] for level in levels], dtype=np.float64)
+    quantities = np.array([level[quantity_field] for level in levels], dtype=np.float64)
+    return prices, quantities
+
+
+def iso_timestamp(text):
+    """
+    Unix time of an UTC ISO 8601 time like 2018-01-27T12:00:00.123000Z, gdax sends it so,
+    bittrex without the Z and with any number of fraction digits, e.g. 2018-01-27T12:00:00.12
+    """
+    if text.endswith("Z"):
+        text = text[:-1]
+    seconds, _, fraction = text.partition(".")
+    # %f takes up to 6 digits, shorter fractions are padded since .12 means 120000 microseconds
+    moment = datetime.strptime(seconds + "." + (fraction + "000000")[:6], "%Y-%m-%dT%H:%M:%S.%f")
+    return calendar.timegm(moment.utctimetuple()) + moment.microsecond / 1e6
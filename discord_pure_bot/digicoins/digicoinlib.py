@@ -1,9 +1,12 @@
 import digicoins.libs.bittrex_api_copy as bittrex
+import digicoins.libs.async_public_api as async_public_api
+from digicoins.libs import sessions
+from digicoins import decoding
 import gdax
 import bitfinex
-import copy
-from datetime import datetime
-from digicoins.entity import Coin,Market,Ticker,OrderBookEntry,OrderBook
+import numpy as np
+from digicoins.entity import Market,Ticker,ColumnarOrderBook,registry
+from digicoins.metrics import metrics
 
 
 class BasePublicClient:
@@ -12,6 +15,7 @@ class BasePublicClient:
         self.name = None
         self.market_names = {}
         self.markets = {}
+        self.canonical_markets = {}
         self.__init_child__()
         self.cache_markets()
 
@@ -20,16 +24,39 @@ class BasePublicClient:
 
     def __read_markets__(self,market_method,response_validation,content_getter,market_checker,market_builder):
         response = market_method()
+        self.__parse_markets__(response,response_validation,content_getter,market_checker,market_builder)
+
+    def __parse_markets__(self,response,response_validation,content_getter,market_checker,market_builder):
         if not response_validation(response):
             raise BaseException("Unable to init {} client".format(self.name))
-        markets = content_getter(response)
-        for market in markets:
+        market_names = {}
+        markets = {}
+        canonical_markets = {}
+        for market in content_getter(response):
             if not market_checker(market):
                 continue
 
             market = market_builder(market)
-            self.market_names[market] = market.market_name
-            self.markets[market.market_name] = market
+            market_names[market] = market.market_name
+            markets[market.market_name] = market
+            canonical_markets[market] = market
+
+        # swapped at once so a refresh never exposes a half built catalog
+        self.market_names = market_names
+        self.markets = markets
+        self.canonical_markets = canonical_markets
+
+    def dump_markets(self):
+        return [[market.base_coin.coin,market.traded_coin.coin,market.market_name] for market in self.markets.values()]
+
+    def load_markets(self,entries):
+        self.__parse_markets__(
+            entries,
+            response_validation=lambda response: type(response) == list,
+            content_getter=lambda response: response,
+            market_checker=lambda entry: True,
+            market_builder=lambda entry: registry.market(entry[0],entry[1],entry[2],self.name)
+        )
 
     def cache_markets(self):
         raise NotImplementedError
@@ -44,15 +71,9 @@ class BasePublicClient:
         return markets
 
     def __specify_market__(self,market):
-        market_name = None
-        if type(market) == Market:
-            if market in self.market_names:
-                market_name = self.market_names[market]
-        if market_name is None:
+        if type(market) != Market:
             return None
-
-        market = self.markets[self.market_names[market]]
-        return copy.copy(market)
+        return self.canonical_markets.get(market)
 
     def __get_ticker__(self, market,ticker_method,response_validation,content_getter,ticker_builder):
 
@@ -60,6 +81,9 @@ class BasePublicClient:
         if market is None:
             return None
         response = ticker_method(market.market_name)
+        return self.__parse_ticker__(market,response,response_validation,content_getter,ticker_builder)
+
+    def __parse_ticker__(self,market,response,response_validation,content_getter,ticker_builder):
         if not response_validation(response):
             raise BaseException("Unable to get ticker {} from {}".format(market.market_name, self.name))
 
@@ -69,35 +93,84 @@ class BasePublicClient:
     def get_ticker(self,market):
         raise NotImplementedError
 
-    def __get_order_book__(self,market,depth,order_book_method,response_validation,ask_getter,bid_getter,book_entry_builder,timestamp_getter):
+    def __get_tickers__(self,tickers_method,tickers_parser):
+        response = tickers_method()
+        return tickers_parser(response)
+
+    def __parse_tickers__(self,response,response_validation,content_getter,name_getter,ticker_checker,ticker_builder):
+        if not response_validation(response):
+            raise BaseException("Unable to get tickers from {}".format(self.name))
+
+        started = metrics.start()
+        tickers = {}
+        for ticker in content_getter(response):
+            market = self.markets.get(name_getter(ticker))
+            # markets listed after the last catalog refresh and ones not trading yet are left out
+            if market is None or not ticker_checker(ticker):
+                continue
+            tickers[market] = ticker_builder(market,ticker)
+        metrics.observe("tickers", self.name, started)
+        return tickers
+
+    def get_tickers(self):
+        """
+        Ticker of every cached market from one round trip, by market
+        """
+        raise NotImplementedError
+
+    def __parse_volumes__(self,response,response_validation,content_getter,name_getter,volume_getter,subscribed=None):
+        if not response_validation(response):
+            raise BaseException("Unable to get volumes from {}".format(self.name))
+
+        names = []
+        volumes = []
+        for entry in content_getter(response):
+            market = self.markets.get(name_getter(entry))
+            if market is None:
+                continue
+            if subscribed is not None and not subscribed(market):
+                continue
+            names.append(market.pair_name())
+            volumes.append(volume_getter(entry))
+        # missing volumes become NaN
+        return names,np.array(volumes,dtype=np.float64)
+
+    def parse_volumes(self,response,subscribed=None):
+        """
+        (exchange agnostic market names, float64 24 hour volumes) out of the exchange's volume response
+
+        :param subscribed: market -> whether to keep it, all markets are kept without it
+        """
+        raise NotImplementedError
+
+    def __get_order_book__(self,market,depth,order_book_method,response_validation,ask_getter,bid_getter,level_fields,timestamp_getter):
         market = self.__specify_market__(market)
         if market is None:
             return None
         response = order_book_method(market.market_name,depth)
+        return self.__parse_order_book__(market,response,response_validation,ask_getter,bid_getter,level_fields,timestamp_getter)
+
+    def __parse_order_book__(self,market,response,response_validation,ask_getter,bid_getter,level_fields,timestamp_getter):
         if not response_validation(response):
             raise BaseException("Unable to get order book {} from {}".format(market.market_name, self.name))
 
-        raw_book = {
-            "bids":bid_getter(response),
-            "asks":ask_getter(response)
-        }
-        book = {
-            "bids":[],
-            "asks":[]
-        }
-        for side in raw_book:
-            for raw_entry in raw_book[side]:
-                orderBookEntry = book_entry_builder(market,side,raw_entry)
-
-                book[side].append(orderBookEntry)
-
-        orderBook = OrderBook(market,book["asks"],book["bids"],timestamp=timestamp_getter(response))
+        started = metrics.start()
+        ask_rates,ask_quantities = decoding.book_columns(ask_getter(response),*level_fields)
+        bid_rates,bid_quantities = decoding.book_columns(bid_getter(response),*level_fields)
+        orderBook = ColumnarOrderBook(market,ask_rates,ask_quantities,bid_rates,bid_quantities,timestamp=timestamp_getter(response))
+        metrics.observe("book", self.name, started)
 
         return orderBook
 
     def get_order_book(self,market):
         raise NotImplementedError
 
+    def book_level(self,depth):
+        """
+        Kind of book a query of depth gets, books of different levels do not answer each other's queries
+        """
+        return None
+
 
 class BittrexPublicClient(BasePublicClient):
 
@@ -117,12 +190,12 @@ class BittrexPublicClient(BasePublicClient):
         return response['result']
 
     def cache_markets(self):
-        self.__read_markets__(
+        return self.__read_markets__(
             market_method=self.client.get_markets,
             response_validation=BittrexPublicClient.__default_response_validator__,
             content_getter=BittrexPublicClient.__default_content_getter__,
             market_checker=lambda market: market['IsActive'],
-            market_builder=lambda market: Market(Coin(market['BaseCurrency']),Coin(market['MarketCurrency']),market['MarketName'],self.name),
+            market_builder=lambda market: registry.market(market['BaseCurrency'],market['MarketCurrency'],market['MarketName'],self.name),
         )
 
     def get_ticker(self,market):
@@ -134,6 +207,33 @@ class BittrexPublicClient(BasePublicClient):
             ticker_builder= lambda market,ticker: Ticker(market,ticker['Ask'],ticker['Bid'],ticker['Last'])
         )
 
+    def parse_tickers(self,response):
+        """
+        Tickers out of a getmarketsummaries response, also polled for volumes
+        """
+        return self.__parse_tickers__(
+            response=response,
+            response_validation=BittrexPublicClient.__default_response_validator__,
+            content_getter=BittrexPublicClient.__default_content_getter__,
+            name_getter=lambda ticker: ticker['MarketName'],
+            ticker_checker=lambda ticker: ticker['Ask'] and ticker['Bid'] and ticker['Last'],
+            ticker_builder=lambda market,ticker: Ticker(market,ticker['Ask'],ticker['Bid'],ticker['Last'],
+                                    timestamp=decoding.iso_timestamp(ticker['TimeStamp']))
+        )
+
+    def get_tickers(self):
+        return self.__get_tickers__(self.client.get_market_summaries,self.parse_tickers)
+
+    def parse_volumes(self,response,subscribed=None):
+        return self.__parse_volumes__(
+            response=response,
+            response_validation=BittrexPublicClient.__default_response_validator__,
+            content_getter=BittrexPublicClient.__default_content_getter__,
+            name_getter=lambda summary: summary['MarketName'],
+            volume_getter=lambda summary: summary['BaseVolume'],
+            subscribed=subscribed
+        )
+
     def get_order_book(self,market,depth=50):
         return self.__get_order_book__(
             market=market,
@@ -142,11 +242,36 @@ class BittrexPublicClient(BasePublicClient):
             response_validation=BittrexPublicClient.__default_response_validator__,
             ask_getter=lambda response: response['result']['sell'],
             bid_getter=lambda response:response['result']['buy'],
-            book_entry_builder=lambda market,side,raw_entry : OrderBookEntry(market,side,raw_entry['Quantity'],raw_entry['Rate']),
+            level_fields=('Rate','Quantity'),
             timestamp_getter=lambda response: None
         )
 
 
+class GdaxClientExt(gdax.PublicClient):
+    """
+    gdax.PublicClient market data calls over a pooled keep-alive session with deadlines
+    """
+    def __init__(self, api_url='https://api.gdax.com'):
+        super().__init__(api_url)
+        self.api_url = api_url.rstrip('/')
+        self.pooled_session = sessions.blocking_session()
+
+    def __request__(self, path, params=None):
+        return decoding.loads(self.pooled_session.get(self.api_url + path, params=params, timeout=sessions.TIMEOUTS).content)
+
+    def get_products(self):
+        return self.__request__('/products')
+
+    def get_product_order_book(self, product_id, level=1):
+        return self.__request__('/products/{}/book'.format(product_id), {'level': level})
+
+    def get_product_ticker(self, product_id):
+        return self.__request__('/products/{}/ticker'.format(product_id))
+
+    def get_product_24hr_stats(self, product_id):
+        return self.__request__('/products/{}/stats'.format(product_id))
+
+
 class GdaxPublicClient(BasePublicClient):
 
     def __init__(self):
@@ -154,15 +279,15 @@ class GdaxPublicClient(BasePublicClient):
 
     def __init_child__(self):
         self.name = "Gdax"
-        self.client = gdax.PublicClient()
+        self.client = GdaxClientExt()
 
     def cache_markets(self):
-        self.__read_markets__(
+        return self.__read_markets__(
             market_method=self.client.get_products,
             response_validation=lambda response: type(response) == list,
             content_getter=lambda response: response,
             market_checker=lambda market: True,
-            market_builder=lambda market: Market( Coin(market['quote_currency']),Coin(market['base_currency']),market['id'], self.name)
+            market_builder=lambda market: registry.market(market['quote_currency'],market['base_currency'],market['id'], self.name)
         )
 
     def get_ticker(self,market):
@@ -172,23 +297,47 @@ class GdaxPublicClient(BasePublicClient):
             response_validation=lambda response: type(response) == dict,
             content_getter=lambda response: response,
             ticker_builder= lambda market,ticker: Ticker(market,float(ticker['ask']),float(ticker['bid']),float(ticker['price']),
-                                    timestamp=datetime.strptime(ticker['time'], "%Y-%m-%dT%H:%M:%S.%fZ").timestamp())
+                                    timestamp=decoding.iso_timestamp(ticker['time']))
         )
 
     def get_order_book(self,market,depth=50):
         return self.__get_order_book__(
             market=market,
             depth=depth,
-            order_book_method=lambda market,depth:self.client.get_product_order_book(market,level=(3 if depth > 50 else 2)),
+            order_book_method=lambda market,depth:self.client.get_product_order_book(market,level=self.book_level(depth)),
             response_validation=lambda response: type(response) == dict,
             ask_getter=lambda response: response['asks'],
             bid_getter=lambda response:response['bids'],
-            book_entry_builder=lambda market,side,raw_entry : OrderBookEntry(market,side,float(raw_entry[1]),float(raw_entry[0])),
+            level_fields=(0,1),
             timestamp_getter=lambda response: None
         )
 
+    def book_level(self,depth):
+        # level 2 aggregates the best 50 prices, level 3 is the full book of single orders
+        return 3 if depth > 50 else 2
+
+    def parse_volumes(self,response,subscribed=None):
+        """
+        Volumes out of /products/<id>/stats responses by product id, gdax has no call for all of them
+        """
+        return self.__parse_volumes__(
+            response=response,
+            response_validation=lambda response: type(response) == dict,
+            content_getter=lambda response: response.items(),
+            name_getter=lambda entry: entry[0],
+            volume_getter=lambda entry: entry[1].get('volume'),
+            subscribed=subscribed
+        )
+
 
 class BitfinexClientExt(bitfinex.Client):
+    def __init__(self):
+        super().__init__()
+        self.session = sessions.blocking_session()
+
+    def _get(self, url):
+        return decoding.loads(self.session.get(url, timeout=sessions.TIMEOUTS).content)
+
     def tickers(self):
         url = self.url_for("tickers")
         return self._get(url)
@@ -202,12 +351,12 @@ class BitfinexPublicClient(BasePublicClient):
         self.client = BitfinexClientExt()
 
     def cache_markets(self):
-        self.__read_markets__(
+        return self.__read_markets__(
             market_method=self.client.tickers,
             response_validation=lambda response: type(response) == list,
             content_getter=lambda response: response,
             market_checker=lambda market: True,
-            market_builder=lambda market: Market(Coin(market['pair'][3:]),Coin(market['pair'][:3]),market['pair'],self.name)
+            market_builder=lambda market: registry.market(market['pair'][3:],market['pair'][:3],market['pair'],self.name)
         )
 
     def get_ticker(self,market):
@@ -219,6 +368,36 @@ class BitfinexPublicClient(BasePublicClient):
             ticker_builder= lambda market,ticker: Ticker(market,ticker['ask'],ticker['bid'],ticker['last_price'],timestamp=ticker['timestamp'])
         )
 
+    def parse_tickers(self,response):
+        """
+        Tickers out of a /tickers response, numbers there are sent as strings
+        """
+        return self.__parse_tickers__(
+            response=response,
+            response_validation=lambda response: type(response) == list,
+            content_getter=lambda response: response,
+            name_getter=lambda ticker: ticker['pair'],
+            ticker_checker=lambda ticker: float(ticker['ask']) and float(ticker['bid']) and float(ticker['last_price']),
+            ticker_builder=lambda market,ticker: Ticker(market,float(ticker['ask']),float(ticker['bid']),float(ticker['last_price']),
+                                    timestamp=float(ticker['timestamp']))
+        )
+
+    def get_tickers(self):
+        return self.__get_tickers__(self.client.tickers,self.parse_tickers)
+
+    def parse_volumes(self,response,subscribed=None):
+        """
+        Volumes out of a /tickers response, in the traded coin
+        """
+        return self.__parse_volumes__(
+            response=response,
+            response_validation=lambda response: type(response) == list,
+            content_getter=lambda response: response,
+            name_getter=lambda ticker: ticker['pair'],
+            volume_getter=lambda ticker: ticker['volume'],
+            subscribed=subscribed
+        )
+
     def get_order_book(self,market,depth=50):
         return self.__get_order_book__(
             market=market,
@@ -227,11 +406,63 @@ class BitfinexPublicClient(BasePublicClient):
             response_validation=lambda response: type(response) == dict,
             ask_getter=lambda response: response['asks'],
             bid_getter=lambda response:response['bids'],
-            book_entry_builder=lambda market,side,raw_entry : OrderBookEntry(market,side,raw_entry['amount'],raw_entry['price']),
-            timestamp_getter=lambda response: response['bids'][0]['timestamp']
+            level_fields=('price','amount'),
+            timestamp_getter=lambda response: float(response['bids'][0]['timestamp'])
         )
 
 
+class AsyncBasePublicClient(BasePublicClient):
+    """
+    Same contract as BasePublicClient but every exchange round trip is awaited,
+    markets are cached by awaiting cache_markets() instead of in the constructor
+    """
+
+    def __init__(self):
+        self.name = None
+        self.market_names = {}
+        self.markets = {}
+        self.canonical_markets = {}
+        self.__init_child__()
+
+    async def __read_markets__(self,market_method,response_validation,content_getter,market_checker,market_builder):
+        response = await market_method()
+        self.__parse_markets__(response,response_validation,content_getter,market_checker,market_builder)
+
+    async def __get_ticker__(self, market,ticker_method,response_validation,content_getter,ticker_builder):
+        market = self.__specify_market__(market)
+        if market is None:
+            return None
+        response = await ticker_method(market.market_name)
+        return self.__parse_ticker__(market,response,response_validation,content_getter,ticker_builder)
+
+    async def __get_tickers__(self,tickers_method,tickers_parser):
+        response = await tickers_method()
+        return tickers_parser(response)
+
+    async def __get_order_book__(self,market,depth,order_book_method,response_validation,ask_getter,bid_getter,level_fields,timestamp_getter):
+        market = self.__specify_market__(market)
+        if market is None:
+            return None
+        response = await order_book_method(market.market_name,depth)
+        return self.__parse_order_book__(market,response,response_validation,ask_getter,bid_getter,level_fields,timestamp_getter)
+
+
+class AsyncBittrexPublicClient(AsyncBasePublicClient,BittrexPublicClient):
+
+    def __init_child__(self):
+        self.name = "Bittrex"
+        self.client = bittrex.AsyncBittrex('key', 'value')
 
 
+class AsyncGdaxPublicClient(AsyncBasePublicClient,GdaxPublicClient):
 
+    def __init_child__(self):
+        self.name = "Gdax"
+        self.client = async_public_api.AsyncGdaxPublicClient()
+
+
+class AsyncBitfinexPublicClient(AsyncBasePublicClient,BitfinexPublicClient):
+
+    def __init_child__(self):
+        self.name = "Bitfinex"
+        self.client = async_public_api.AsyncBitfinexClient()
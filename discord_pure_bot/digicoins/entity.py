@@ -1,7 +1,14 @@
+import heapq
 import time
+from collections import OrderedDict
+from operator import itemgetter
+
+import numpy as np
 
 class Coin:
 
+    __slots__ = ("coin","symbol")
+
     coin_synonims = {
         "USDT":"USD"
     }
@@ -32,20 +39,33 @@ class Coin:
         return "[Coin:{}]".format(self.coin)
 
 class Market:
+
+    __slots__ = ("base_coin","traded_coin","market_name","exchange_name","pair_hash")
+
     def __init__(self,base_coin : Coin, traded_coin : Coin,market_name=None ,exchange_name=None):
+        # markets are shared between clients, books and queries, so they never change once built
+        object.__setattr__(self,"base_coin",base_coin)
+        object.__setattr__(self,"traded_coin",traded_coin)
+        object.__setattr__(self,"market_name",market_name)
+        object.__setattr__(self,"exchange_name",exchange_name)
+        object.__setattr__(self,"pair_hash",hash(frozenset((base_coin.coin,traded_coin.coin))))
 
-        self.base_coin = base_coin
-        self.traded_coin = traded_coin
-        self.market_name = market_name
-        self.exchange_name = exchange_name
+    def __setattr__(self, name, value):
+        raise AttributeError("Market is immutable")
 
     def __hash__(self):
-        return self.base_coin.__hash__() * self.traded_coin.__hash__()
+        return self.pair_hash
 
     def __eq__(self, other):
         return (self.base_coin == other.base_coin and self.traded_coin == other.traded_coin) or \
                (self.base_coin == other.traded_coin and self.traded_coin == other.base_coin)
 
+    def pair_name(self):
+        """
+        Exchange agnostic name like BTC-LTC, coin synonyms applied
+        """
+        return "{}-{}".format(self.base_coin.coin,self.traded_coin.coin)
+
     def __str__(self):
         return "[Market {}-{} as {} at {}]".format(self.base_coin,self.traded_coin,self.market_name,self.exchange_name)
 
@@ -53,7 +73,68 @@ class Market:
         return self.__str__()
 
     def __copy__(self):
-        return Market(self.base_coin,self.traded_coin,self.market_name,self.exchange_name)
+        return self
+
+class MarketRegistry:
+    """
+    Interns coins and markets: one canonical Market per (exchange, base, traded).
+    Only exchange catalogs intern, markets of user text are looked up without growing the registry
+    """
+
+    def __init__(self, max_symbols=256):
+        self.coins = {}
+        self.markets = {}
+        # normalized user text -> market, least recently used first
+        self.symbols = OrderedDict()
+        self.max_symbols = max_symbols
+
+    def coin(self, code):
+        code = code.upper()
+        coin = self.coins.get(code)
+        if coin is None:
+            coin = Coin(code)
+            self.coins[code] = coin
+        return coin
+
+    def market(self, base_code, traded_code, market_name=None, exchange_name=None):
+        key = (exchange_name, base_code.upper(), traded_code.upper())
+        market = self.markets.get(key)
+        if market is None:
+            market = Market(self.coin(base_code),self.coin(traded_code),market_name,exchange_name)
+            self.markets[key] = market
+        return market
+
+    def lookup(self, base_code, traded_code):
+        """
+        Exchange agnostic market, the interned one when there is one, else a new one the registry does not keep
+        """
+        base_code, traded_code = base_code.upper(), traded_code.upper()
+        market = self.markets.get((None, base_code, traded_code))
+        if market is None:
+            market = Market(self.coins.get(base_code) or Coin(base_code),
+                            self.coins.get(traded_code) or Coin(traded_code))
+        return market
+
+    def parse(self, symbol):
+        """
+        Exchange agnostic market from user text like BTC-DOGE, None when the text is no market
+        """
+        symbol = symbol.upper().strip()
+        market = self.symbols.get(symbol)
+        if market is not None:
+            self.symbols.move_to_end(symbol)
+            return market
+
+        parts = symbol.split("-")
+        if len(parts) != 2 or not all(part.isalnum() for part in parts):
+            return None
+        market = self.lookup(*parts)
+        self.symbols[symbol] = market
+        while len(self.symbols) > self.max_symbols:
+            self.symbols.popitem(last=False)
+        return market
+
+registry = MarketRegistry()
 
 class Ticker:
     def __init__(self,market,ask,bid,last,timestamp=None,reversed=False):
@@ -111,6 +192,9 @@ class OrderBook:
             "bids": self.bids,
         }
 
+    def depth(self,side):
+        return len(self.deals[side])
+
     def cut(self,size):
         return OrderBook(self.market,self.asks[:size],self.bids[:size],self.timestamp,self.full)
 
@@ -120,5 +204,112 @@ class OrderBook:
     def __repr__(self):
         return self.__str__()
 
+class ColumnarOrderBook:
+    """
+    Order book keeping rates and traded quantities of each side in float64 arrays,
+    best price first. cut() returns views over the same arrays
+    """
+
+    def __init__(self,market,ask_rates,ask_quantities,bid_rates,bid_quantities,timestamp=None,full=False):
+        self.market = market
+        self.rates = {
+            "asks": ask_rates,
+            "bids": bid_rates
+        }
+        self.quantities = {
+            "asks": ask_quantities,
+            "bids": bid_quantities
+        }
+        if timestamp is None:
+            self.timestamp = time.time()
+        else:
+            self.timestamp = timestamp
+        self.full = full
+        self.entries = {}
+        self.fingerprint_value = None
+
+    @staticmethod
+    def from_levels(market,asks,bids,timestamp=None,full=False):
+        """
+        Builds the book from (rate, quantity) pairs of each side
+        """
+        ask_levels = np.array(asks,dtype=np.float64).reshape(-1,2)
+        bid_levels = np.array(bids,dtype=np.float64).reshape(-1,2)
+        return ColumnarOrderBook(market,ask_levels[:,0],ask_levels[:,1],bid_levels[:,0],bid_levels[:,1],timestamp,full)
+
+    @staticmethod
+    def merge(market,books,timestamp=None):
+        """
+        One book out of books of the same market on several exchanges, k-way merged
+        best price first with the quantities of equal prices summed
+        """
+        columns = {}
+        for side in ("asks","bids"):
+            levels = heapq.merge(
+                *[zip(book.rates[side].tolist(),book.quantities[side].tolist()) for book in books],
+                key=itemgetter(0),
+                reverse=(side == "bids")
+            )
+            rates = []
+            quantities = []
+            for rate,quantity in levels:
+                if rates and rates[-1] == rate:
+                    quantities[-1] += quantity
+                else:
+                    rates.append(rate)
+                    quantities.append(quantity)
+            columns[side] = (np.array(rates,dtype=np.float64),np.array(quantities,dtype=np.float64))
+        if timestamp is None and books:
+            timestamp = max(book.timestamp for book in books)
+        return ColumnarOrderBook(market,columns["asks"][0],columns["asks"][1],columns["bids"][0],columns["bids"][1],timestamp)
+
+    def depth(self,side):
+        return len(self.rates[side])
+
+    def fingerprint(self):
+        """
+        Hashable summary of every rate and quantity, equal books have equal fingerprints
+        whatever their timestamps, e.g. bitfinex only sends the timestamp of single orders
+        """
+        if self.fingerprint_value is None:
+            self.fingerprint_value = tuple(hash(column.tobytes()) for side in ("asks","bids")
+                                           for column in (self.rates[side],self.quantities[side]))
+        return self.fingerprint_value
+
+    def cut(self,size):
+        return ColumnarOrderBook(self.market,
+                                 self.rates["asks"][:size],self.quantities["asks"][:size],
+                                 self.rates["bids"][:size],self.quantities["bids"][:size],
+                                 self.timestamp,self.full)
+
+    def entry(self,side,index):
+        return OrderBookEntry(self.market,side,float(self.quantities[side][index]),float(self.rates[side][index]))
 
+    def side_entries(self,side):
+        """
+        OrderBookEntry list of one side, built on first use for code that iterates entries
+        """
+        if side not in self.entries:
+            self.entries[side] = [self.entry(side,index) for index in range(self.depth(side))]
+        return self.entries[side]
 
+    @property
+    def asks(self):
+        return self.side_entries("asks")
+
+    @property
+    def bids(self):
+        return self.side_entries("bids")
+
+    @property
+    def deals(self):
+        return {
+            "asks": self.asks,
+            "bids": self.bids,
+        }
+
+    def __str__(self):
+        return "[ColumnarOrderBook asks:{} bids:{} market:{}]".format(self.depth("asks"),self.depth("bids"),self.market)
+
+    def __repr__(self):
+        return self.__str__()
@@ -0,0 +1,81 @@
+"""
+   Asyncio counterparts of the gdax.PublicClient and bitfinex.Client
+   public methods used by digicoinlib, same names and same return values
+   except for book levels, left as sent for digicoinlib to convert in bulk
+"""
+
+import urllib.parse
+
+from digicoins import decoding
+from digicoins.libs import sessions
+from digicoins.metrics import metrics
+
+
+class AsyncRestClient(object):
+    """
+    Minimal json-over-http client sharing one aiohttp session
+    """
+
+    def __init__(self, base_url, exchange=""):
+        self.base_url = base_url
+        self.exchange = exchange
+        self.session = None
+
+    async def _get(self, path, params=None):
+        url = self.base_url + path
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+
+        if self.session is None:
+            self.session = sessions.async_session()
+        started = metrics.start()
+        async with self.session.get(url) as ret:
+            body = await ret.read()
+        metrics.observe("fetch", self.exchange, started)
+
+        started = metrics.start()
+        data = decoding.loads(body)
+        metrics.observe("decode", self.exchange, started)
+        return data
+
+
+class AsyncGdaxPublicClient(AsyncRestClient):
+    """
+    See https://docs.gdax.com/#market-data
+    """
+
+    def __init__(self, api_url='https://api.gdax.com'):
+        super().__init__(api_url.rstrip('/'), "GDAX")
+
+    async def get_products(self):
+        return await self._get('/products')
+
+    async def get_product_order_book(self, product_id, level=1):
+        return await self._get('/products/{}/book'.format(product_id), {'level': level})
+
+    async def get_product_ticker(self, product_id):
+        return await self._get('/products/{}/ticker'.format(product_id))
+
+    async def get_product_24hr_stats(self, product_id):
+        return await self._get('/products/{}/stats'.format(product_id))
+
+
+class AsyncBitfinexClient(AsyncRestClient):
+    """
+    See https://bitfinex.readme.io/v1/reference
+    """
+
+    def __init__(self, api_url='https://api.bitfinex.com/v1'):
+        super().__init__(api_url.rstrip('/'), "BITFINEX")
+
+    async def tickers(self):
+        return await self._get('/tickers')
+
+    async def ticker(self, symbol):
+        data = await self._get('/pubticker/{}'.format(symbol))
+        # same float conversion as bitfinex.Client.ticker
+        return {key: float(value) for key, value in data.items()}
+
+    async def order_book(self, symbol, parameters=None):
+        # levels keep their string numbers, decoding.book_columns converts them
+        return await self._get('/book/{}'.format(symbol), parameters)
@@ -7,9 +7,11 @@
 import urllib
 import urllib.parse
 import time
-import requests
 import hmac
 import hashlib
+from digicoins import decoding
+from digicoins.libs import sessions
+from digicoins.metrics import metrics
 
 BUY_ORDERBOOK = 'buy'
 SELL_ORDERBOOK = 'sell'
@@ -35,6 +37,7 @@ class Bittrex(object):
         self.public_set = set(PUBLIC_SET)
         self.market_set = set(MARKET_SET)
         self.account_set = set(ACCOUNT_SET)
+        self.session = sessions.blocking_session()
 
     def api_query(self, method, options=None):
         """
@@ -49,28 +52,46 @@ class Bittrex(object):
         :return: JSON response from Bittrex
         :rtype : dict
         """
+        request_url, headers = self.build_request(method, options)
+
+        ret = self.session.get(request_url, headers=headers, timeout=sessions.TIMEOUTS)
+        return decoding.loads(ret.content)
+
+    def build_request(self, method, options=None):
+        """
+        Builds the url and headers used to query Bittrex
+
+        :param method: Query method for getting info
+        :type method: str
+
+        :param options: Extra options for query
+        :type options: dict
+
+        :return: request url and request headers
+        :rtype : tuple
+        """
         if not options:
             options = {}
-        nonce = str(int(time.time() * 1000))
         base_url = 'https://bittrex.com/api/v1.1/%s/'
-        request_url = ''
 
         if method in self.public_set:
-            request_url = (base_url % 'public') + method + '?'
-        elif method in self.market_set:
+            # public methods need neither nonce nor signature
+            return (base_url % 'public') + method + '?' + urllib.parse.urlencode(options), {}
+
+        nonce = str(int(time.time() * 1000))
+        request_url = ''
+        if method in self.market_set:
             request_url = (base_url % 'market') + method + '?apikey=' + self.api_key + "&nonce=" + nonce + '&'
         elif method in self.account_set:
             request_url = (base_url % 'account') + method + '?apikey=' + self.api_key + "&nonce=" + nonce + '&'
 
         request_url += urllib.parse.urlencode(options)
-        request_url = bytes(request_url,encoding="utf8")
 
-        signature = hmac.new(self.api_secret, request_url, hashlib.sha512).hexdigest()
+        signature = hmac.new(self.api_secret, bytes(request_url,encoding="utf8"), hashlib.sha512).hexdigest()
 
         headers = {"apisign": signature}
 
-        ret = requests.get(request_url, headers=headers)
-        return ret.json()
+        return request_url, headers
 
     def get_markets(self):
         """
@@ -384,3 +405,40 @@ class Bittrex(object):
         :rtype : dict
         """
         return self.api_query('getdeposithistory', {"currency": currency})
+
+
+class AsyncBittrex(Bittrex):
+    """
+    Asyncio flavour of Bittrex, every query method returns a coroutine
+    """
+
+    def __init__(self, api_key, api_secret):
+        super().__init__(api_key, api_secret)
+        self.async_session = None
+
+    async def api_query(self, method, options=None):
+        """
+        Queries Bittrex with given method and options without blocking the event loop
+
+        :param method: Query method for getting info
+        :type method: str
+
+        :param options: Extra options for query
+        :type options: dict
+
+        :return: JSON response from Bittrex
+        :rtype : dict
+        """
+        request_url, headers = self.build_request(method, options)
+
+        if self.async_session is None:
+            self.async_session = sessions.async_session()
+        started = metrics.start()
+        async with self.async_session.get(request_url, headers=headers) as ret:
+            body = await ret.read()
+        metrics.observe("fetch", "BITTREX", started)
+
+        started = metrics.start()
+        data = decoding.loads(body)
+        metrics.observe("decode", "BITTREX", started)
+        return data
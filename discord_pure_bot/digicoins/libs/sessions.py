@@ -0,0 +1,38 @@
+"""
+   Pooled keep-alive http sessions with connect and read deadlines shared by the exchange clients
+"""
+
+import aiohttp
+import requests
+import requests.adapters
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10.0
+# whole request, connecting, waiting and reading the body, level 3 books take a while to read
+TOTAL_TIMEOUT = 30.0
+POOL_SIZE = 10
+KEEPALIVE_TIMEOUT = 60.0
+
+
+def blocking_session(pool_size=POOL_SIZE):
+    """
+    requests.Session reusing up to pool_size connections per host, pass TIMEOUTS to every call
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+TIMEOUTS = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+
+def async_session(pool_size=POOL_SIZE, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, total_timeout=TOTAL_TIMEOUT):
+    """
+    aiohttp.ClientSession keeping connections alive, must be created inside the event loop
+    """
+    connector = aiohttp.TCPConnector(limit_per_host=pool_size, keepalive_timeout=KEEPALIVE_TIMEOUT, ttl_dns_cache=300)
+    # a server trickling bytes never trips sock_read, total bounds the request anyway
+    timeout = aiohttp.ClientTimeout(total=total_timeout, sock_connect=connect_timeout, sock_read=read_timeout)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
@@ -0,0 +1,128 @@
+"""
+   Latency histograms and counters of the hot paths, served in Prometheus text format.
+
+   Disabled by default, then start() returns None and observe() and increment() return at once
+"""
+
+import bisect
+import time
+
+from aiohttp import web
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE_METRIC = "digicoins_stage_seconds"
+COUNTER_HELP = {
+    "digicoins_exchange_errors_total": "Failed exchange round trips",
+    "digicoins_fallback_ticks_total": "Volume ticks that repeated the last samples instead of fresh ones"
+}
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # the last slot counts observations above the largest bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def format_labels(labels):
+    return ",".join('{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"')) for name, value in labels)
+
+
+class Metrics:
+    """
+    Stage latencies keyed by (stage, exchange) and counters keyed by (name, exchange),
+    exchange labels are upper cased so client names and executor keys line up
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.enabled = False
+        self.buckets = buckets
+        self.histograms = {}
+        self.counters = {}
+
+    def start(self):
+        """
+        :return: start time to hand to observe(), None while disabled
+        """
+        if self.enabled:
+            return time.perf_counter()
+        return None
+
+    def observe(self, stage, exchange, started):
+        if started is None:
+            return
+        key = (stage, exchange.upper())
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(self.buckets)
+        histogram.observe(time.perf_counter() - started)
+
+    def increment(self, name, exchange="", amount=1):
+        if not self.enabled:
+            return
+        key = (name, exchange.upper())
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def render(self):
+        lines = [
+            "# HELP {} Latency of one hot path stage".format(STAGE_METRIC),
+            "# TYPE {} histogram".format(STAGE_METRIC)
+        ]
+        for (stage, exchange), histogram in sorted(self.histograms.items()):
+            labels = [("stage", stage), ("exchange", exchange)]
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append("{}_bucket{{{}}} {}".format(STAGE_METRIC, format_labels(labels + [("le", repr(bound))]), cumulative))
+            lines.append("{}_bucket{{{}}} {}".format(STAGE_METRIC, format_labels(labels + [("le", "+Inf")]), histogram.count))
+            lines.append("{}_sum{{{}}} {!r}".format(STAGE_METRIC, format_labels(labels), histogram.sum))
+            lines.append("{}_count{{{}}} {}".format(STAGE_METRIC, format_labels(labels), histogram.count))
+
+        for name in sorted(set(name for name, _ in self.counters) | set(COUNTER_HELP)):
+            lines.append("# HELP {} {}".format(name, COUNTER_HELP.get(name, name)))
+            lines.append("# TYPE {} counter".format(name))
+            for (counter, exchange), value in sorted(self.counters.items()):
+                if counter == name:
+                    lines.append("{}{{{}}} {}".format(name, format_labels([("exchange", exchange)]), value))
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    Local http endpoint answering GET /metrics with Metrics.render()
+    """
+
+    def __init__(self, metrics, host="127.0.0.1", port=9108):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.runner = None
+
+    async def start(self):
+        application = web.Application()
+        application.router.add_get("/metrics", self.__handle__)
+        self.runner = web.AppRunner(application)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        if self.port == 0:
+            self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def __handle__(self, request):
+        return web.Response(text=self.metrics.render(), content_type="text/plain", charset="utf-8")
+
+
+metrics = Metrics()
@@ -1,32 +1,355 @@
+import asyncio
+
 from digicoins.digicoinlib import BittrexPublicClient,BitfinexPublicClient,GdaxPublicClient
+from digicoins.digicoinlib import AsyncBittrexPublicClient,AsyncBitfinexPublicClient,AsyncGdaxPublicClient
+from digicoins.singleflight import SingleFlight
+from digicoins.cache import ExpiringLruCache
+from digicoins.catalog import MarketCatalog
+from digicoins.streaming import GdaxBookFeed,BitfinexBookFeed
+from digicoins.scheduler import ExchangeScheduler,INTERACTIVE,BACKGROUND
+from digicoins.snapshots import TickerSnapshot
+from digicoins.metrics import metrics
 
 class OrderBookQuery:
-    def __init__(self,exchange,market,depth):
+    def __init__(self,exchange,market,depth,priority=INTERACTIVE):
         self.exchange = exchange
         self.market = market
         self.depth = depth
+        self.priority = priority
+
+    def key(self):
+        return self.exchange, self.market, self.depth
+
+    def cache_key(self):
+        return self.exchange, self.market
 
 class TickerQuery:
-    def __init__(self,exchange,market):
+    def __init__(self,exchange,market,priority=INTERACTIVE):
         self.exchange = exchange
         self.market = market
+        self.priority = priority
+
+    def key(self):
+        return self.exchange, self.market
+
+    def cache_key(self):
+        return self.exchange, self.market
 
 
 class PublicClientQueryExecutor:
     def __init__(self):
-        self.clients = {
+        self.clients = self.__create_clients__()
+        self.presets = {
+            "order_book_ttl": {"GDAX": 2.0, "BITFINEX": 3.0, "BITTREX": 5.0},
+            "ticker_ttl": {"GDAX": 2.0, "BITFINEX": 3.0, "BITTREX": 5.0},
+            "cache_max_entries": 256
+        }
+        self.order_book_cache = ExpiringLruCache(self.presets["order_book_ttl"], self.presets["cache_max_entries"])
+        self.ticker_cache = ExpiringLruCache(self.presets["ticker_ttl"], self.presets["cache_max_entries"])
+
+    def __create_clients__(self):
+        return {
             "GDAX" : GdaxPublicClient(),
             "BITFINEX" : BitfinexPublicClient(),
             "BITTREX" : BittrexPublicClient()
         }
 
+    def cache_stats(self):
+        return {
+            "order_book": self.order_book_cache.stats(),
+            "ticker": self.ticker_cache.stats()
+        }
+
+    def __cached_ticker__(self,tickerQuery):
+        return self.ticker_cache.get(tickerQuery.cache_key())
+
+    def __cache_ticker__(self,tickerQuery,ticker):
+        if ticker is not None:
+            self.ticker_cache.put(tickerQuery.cache_key(),ticker)
+        return ticker
+
+    def __order_book_cache_key__(self,orderBookQuery):
+        # gdax sends level 2 and level 3 books depending on the depth, each level is cached apart
+        return orderBookQuery.cache_key() + (self.clients[orderBookQuery.exchange].book_level(orderBookQuery.depth),)
+
+    def __cached_order_book__(self,orderBookQuery):
+        # a deeper book of the same level fetched a moment ago answers any shallower query
+        entry = self.order_book_cache.get(self.__order_book_cache_key__(orderBookQuery),accept=lambda entry: entry[0] >= orderBookQuery.depth)
+        if entry is None:
+            return None
+        return entry[1]
+
+    def __cache_order_book__(self,orderBookQuery,orderBook):
+        if orderBook is not None:
+            self.order_book_cache.put(self.__order_book_cache_key__(orderBookQuery),(orderBookQuery.depth,orderBook))
+        return orderBook
+
     def get_ticker(self,tickerQuery):
-        return self.clients[tickerQuery.exchange].get_ticker(tickerQuery.market)
+        ticker = self.__cached_ticker__(tickerQuery)
+        if ticker is None:
+            ticker = self.__cache_ticker__(tickerQuery,self.clients[tickerQuery.exchange].get_ticker(tickerQuery.market))
+        return ticker
 
     def get_order_book(self, orderBookQuery,cut=False):
-        orderBook = self.clients[orderBookQuery.exchange].get_order_book(orderBookQuery.market, orderBookQuery.depth)
+        orderBook = self.__cached_order_book__(orderBookQuery)
+        if orderBook is None:
+            orderBook = self.__cache_order_book__(orderBookQuery,self.clients[orderBookQuery.exchange].get_order_book(orderBookQuery.market, orderBookQuery.depth))
+        if orderBook is None:
+            return None
+        if cut:
+            orderBook = orderBook.cut(orderBookQuery.depth)
+        return orderBook
+
+
+class AsyncPublicClientQueryExecutor(PublicClientQueryExecutor):
+    def __init__(self,catalog_path="market_catalog.json"):
+        super().__init__()
+        self.presets["market_refresh_interval"] = 3600
+        self.presets["market_retry_interval"] = 60
+        self.presets["streamed_markets"] = {
+            "GDAX": ["BTC-USD","ETH-USD","LTC-USD"],
+            "BITFINEX": ["btcusd"]
+        }
+        # (requests per second, burst) shared by wall queries, market refreshes and the volume poller
+        self.presets["rate_limits"] = {"GDAX": (3.0, 6), "BITFINEX": (1.0, 10), "BITTREX": (1.0, 5)}
+        # seconds a request may wait for its slot, background work gives up before the next poll
+        self.presets["deadlines"] = {INTERACTIVE: 10.0, BACKGROUND: 50.0}
+        self.schedulers = {exchange: ExchangeScheduler(exchange,rate,burst) for exchange,(rate,burst) in self.presets["rate_limits"].items()}
+        # seconds between bulk ticker calls of the exchanges that have one, bittrex also gets them from the volume poller
+        self.presets["ticker_snapshot_interval"] = {"BITTREX": 60, "BITFINEX": 15}
+        # wall reports use a snapshot until it is this old, then fetch the single ticker
+        self.presets["ticker_snapshot_max_age"] = {"BITTREX": 90, "BITFINEX": 30}
+        self.ticker_snapshots = {exchange: TickerSnapshot(exchange,max_age) for exchange,max_age in self.presets["ticker_snapshot_max_age"].items()}
+        # off where nothing reads tickers, e.g. in the volume worker process
+        self.presets["refresh_ticker_snapshots"] = True
+        self.snapshot_tasks = []
+        self.catalog = MarketCatalog(catalog_path)
+        self.refresh_task = None
+        self.streams = {}
+        self.stream_tasks = []
+        self.ticker_flights = SingleFlight()
+        self.order_book_flights = SingleFlight()
+
+    def set_rate_limits(self, rate_limits):
+        """
+        Replaces the (requests per second, burst) of every exchange, before start while nothing waits on the schedulers
+        """
+        self.presets["rate_limits"] = dict(rate_limits)
+        self.schedulers = {exchange: ExchangeScheduler(exchange,rate,burst) for exchange,(rate,burst) in self.presets["rate_limits"].items()}
+
+    def __create_clients__(self):
+        return {
+            "GDAX" : AsyncGdaxPublicClient(),
+            "BITFINEX" : AsyncBitfinexPublicClient(),
+            "BITTREX" : AsyncBittrexPublicClient()
+        }
+
+    def scheduler_stats(self):
+        return {exchange: scheduler.stats() for exchange,scheduler in self.schedulers.items()}
+
+    def cache_stats(self):
+        stats = super().cache_stats()
+        stats["ticker_snapshots"] = {exchange: snapshot.stats() for exchange,snapshot in self.ticker_snapshots.items()}
+        return stats
+
+    async def __throttle__(self,exchange,priority):
+        started = metrics.start()
+        await self.schedulers[exchange].acquire(priority,self.presets["deadlines"][priority])
+        metrics.observe("queue",exchange,started)
+
+    async def __exchange_call__(self,exchange,call):
+        try:
+            return await call()
+        except Exception:
+            metrics.increment("digicoins_exchange_errors_total",exchange)
+            raise
+
+    async def start(self):
+        """
+        Loads the saved market catalog and keeps it fresh in the background,
+        no exchange round trip happens before this returns
+        """
+        loaded = self.catalog.load(self.clients)
+        print("market catalog loaded for", loaded)
+        if self.refresh_task is None:
+            self.refresh_task = asyncio.ensure_future(self.refresh_markets_periodically())
+        if not self.streams:
+            self.start_streams()
+        if not self.snapshot_tasks and self.presets["refresh_ticker_snapshots"]:
+            self.snapshot_tasks = [asyncio.ensure_future(self.refresh_tickers_periodically(exchange)) for exchange in self.ticker_snapshots]
+
+    def __create_stream__(self,exchange,market_names):
+        if exchange == "GDAX":
+            return GdaxBookFeed(market_names)
+        if exchange == "BITFINEX":
+            return BitfinexBookFeed(market_names)
+        return None
+
+    def start_streams(self):
+        for exchange,market_names in self.presets["streamed_markets"].items():
+            stream = self.__create_stream__(exchange,market_names)
+            if stream is None:
+                continue
+            self.streams[exchange] = stream
+            self.stream_tasks.append(asyncio.ensure_future(stream.run()))
+
+    def track(self,exchange,market_name,listener):
+        """
+        Feeds every change of a streamed book to listener, e.g. a WallTracker
+        """
+        self.streams[exchange].track(market_name,listener)
+
+    def __streamed_order_book__(self,orderBookQuery):
+        stream = self.streams.get(orderBookQuery.exchange)
+        if stream is None:
+            return None
+        # streams aggregate orders by price, a level 3 query wants the single orders of the rest api
+        if self.clients[orderBookQuery.exchange].book_level(orderBookQuery.depth) == 3:
+            return None
+        market = self.clients[orderBookQuery.exchange].__specify_market__(orderBookQuery.market)
+        if market is None:
+            return None
+        return stream.order_book(market,orderBookQuery.depth)
+
+    async def __refresh_exchange_markets__(self,exchange):
+        await self.__throttle__(exchange,BACKGROUND)
+        return await self.clients[exchange].cache_markets()
+
+    async def refresh_markets(self):
+        exchanges = list(self.clients)
+        results = await asyncio.gather(*[self.__refresh_exchange_markets__(exchange) for exchange in exchanges],return_exceptions=True)
+
+        failed = []
+        for exchange,result in zip(exchanges,results):
+            if isinstance(result,BaseException):
+                print("unable to refresh markets of",exchange,result)
+                failed.append(exchange)
+        if len(failed) < len(exchanges):
+            self.catalog.save(self.clients)
+        return failed
+
+    async def refresh_markets_periodically(self):
+        while True:
+            try:
+                failed = await self.refresh_markets()
+            except Exception as problem:
+                print("unable to refresh markets",problem)
+                failed = list(self.clients)
+            if failed:
+                await asyncio.sleep(self.presets["market_retry_interval"])
+            else:
+                await asyncio.sleep(self.presets["market_refresh_interval"])
+
+    def __bulk_tickers_method__(self,exchange):
+        client = self.clients[exchange].client
+        if exchange == "BITTREX":
+            return client.get_market_summaries
+        return client.tickers
+
+    async def __fetch_bulk_tickers__(self,exchange):
+        """
+        One bulk ticker response at background priority, fed to the exchange's ticker snapshot on the way
+        """
+        await self.__throttle__(exchange,BACKGROUND)
+        started = metrics.start()
+        response = await self.__exchange_call__(exchange,self.__bulk_tickers_method__(exchange))
+        metrics.observe("snapshot",exchange,started)
+        self.__update_ticker_snapshot__(exchange,response)
+        return response
+
+    def __update_ticker_snapshot__(self,exchange,response):
+        try:
+            self.ticker_snapshots[exchange].update(self.clients[exchange].parse_tickers(response))
+        except Exception as problem:
+            # the previous snapshot goes stale and wall queries fall back to single tickers
+            print("unable to read tickers of",exchange,problem)
+
+    async def get_market_summaries(self):
+        """
+        Bittrex getmarketsummaries, waits behind wall queries.
+        The same response refreshes the bittrex ticker snapshot
+        """
+        return await self.__fetch_bulk_tickers__("BITTREX")
+
+    async def refresh_tickers(self,exchange):
+        await self.__fetch_bulk_tickers__(exchange)
+
+    async def __fetch_product_stats__(self,exchange,product_id):
+        await self.__throttle__(exchange,BACKGROUND)
+        return await self.__exchange_call__(exchange,lambda: self.clients[exchange].client.get_product_24hr_stats(product_id))
+
+    async def __fetch_all_product_stats__(self,exchange,subscribed=None):
+        markets = self.clients[exchange].markets
+        product_ids = [product_id for product_id,market in markets.items() if subscribed is None or subscribed(market)]
+        results = await asyncio.gather(*[self.__fetch_product_stats__(exchange,product_id) for product_id in product_ids],return_exceptions=True)
+        stats = {product_id: result for product_id,result in zip(product_ids,results) if not isinstance(result,BaseException)}
+        if product_ids and not stats:
+            raise BaseException("Unable to get any product stats from {}".format(exchange))
+        # products that failed are missing from this tick only
+        return stats
+
+    async def get_market_volumes(self,exchange,subscribed=None):
+        """
+        24 hour volumes of the markets of exchange at background priority
+
+        :param subscribed: market -> whether it is polled, every market is without it
+        :return: (exchange agnostic market names, float64 volumes), NaN where the exchange sent none
+        """
+        if exchange in self.ticker_snapshots:
+            response = await self.__fetch_bulk_tickers__(exchange)
+        else:
+            response = await self.__fetch_all_product_stats__(exchange,subscribed)
+        return self.clients[exchange].parse_volumes(response,subscribed)
+
+    async def refresh_tickers_periodically(self,exchange):
+        interval = self.presets["ticker_snapshot_interval"][exchange]
+        while True:
+            # skipped while something else, like the volume poller, keeps the snapshot fresh
+            if not self.ticker_snapshots[exchange].is_fresh(interval):
+                try:
+                    await self.refresh_tickers(exchange)
+                except Exception as problem:
+                    print("unable to refresh tickers of",exchange,problem)
+            await asyncio.sleep(interval)
+
+    def __snapshot_ticker__(self,tickerQuery):
+        snapshot = self.ticker_snapshots.get(tickerQuery.exchange)
+        if snapshot is None:
+            return None
+        return snapshot.get(tickerQuery.market)
+
+    async def __fetch_ticker__(self,tickerQuery):
+        await self.__throttle__(tickerQuery.exchange,tickerQuery.priority)
+        started = metrics.start()
+        ticker = await self.__exchange_call__(tickerQuery.exchange,lambda: self.clients[tickerQuery.exchange].get_ticker(tickerQuery.market))
+        metrics.observe("ticker",tickerQuery.exchange,started)
+        return self.__cache_ticker__(tickerQuery,ticker)
+
+    async def __fetch_order_book__(self,orderBookQuery):
+        await self.__throttle__(orderBookQuery.exchange,orderBookQuery.priority)
+        started = metrics.start()
+        orderBook = await self.__exchange_call__(orderBookQuery.exchange,lambda: self.clients[orderBookQuery.exchange].get_order_book(orderBookQuery.market, orderBookQuery.depth))
+        metrics.observe("order_book",orderBookQuery.exchange,started)
+        return self.__cache_order_book__(orderBookQuery,orderBook)
+
+    async def get_ticker(self,tickerQuery):
+        ticker = self.__cached_ticker__(tickerQuery)
+        if ticker is None:
+            ticker = self.__snapshot_ticker__(tickerQuery)
+        if ticker is None:
+            ticker = await self.ticker_flights.do(tickerQuery.key(),lambda: self.__fetch_ticker__(tickerQuery))
+        return ticker
+
+    async def get_order_book(self, orderBookQuery,cut=False):
+        # live books are already cut to the query depth
+        orderBook = self.__streamed_order_book__(orderBookQuery)
+        if orderBook is not None:
+            return orderBook
+        orderBook = self.__cached_order_book__(orderBookQuery)
+        if orderBook is None:
+            orderBook = await self.order_book_flights.do(orderBookQuery.key(),lambda: self.__fetch_order_book__(orderBookQuery))
         if orderBook is None:
             return None
         if cut:
             orderBook = orderBook.cut(orderBookQuery.depth)
-        return orderBook
\ No newline at end of file
+        return orderBook
@@ -0,0 +1,135 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+PRIORITY_NAMES = {
+    INTERACTIVE: "interactive",
+    BACKGROUND: "background"
+}
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class TokenBucket:
+    """
+    rate tokens per second, at most capacity saved up for bursts
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def __refill__(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_consume(self):
+        self.__refill__()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def delay(self):
+        """
+        seconds until the next token is available
+        """
+        self.__refill__()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class ExchangeScheduler:
+    """
+    Hands out an exchange's request quota, lower priority values first, queued requests wait
+    for a token until their deadline instead of being sent and throttled
+    """
+
+    def __init__(self, name, rate, burst):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.queue = []
+        self.order = itertools.count()
+        self.dispatcher = None
+
+        self.granted = {priority: 0 for priority in PRIORITY_NAMES}
+        self.total_wait = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self.max_wait = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self.expired = {priority: 0 for priority in PRIORITY_NAMES}
+
+    async def acquire(self, priority=BACKGROUND, deadline=None):
+        """
+        Waits for a request slot
+
+        :param deadline: seconds the caller is willing to wait, DeadlineExceeded when over
+        """
+        queued_at = time.monotonic()
+        if self.bucket.capacity < 1:
+            # no burst at all, e.g. it all went to the volume worker, no token ever comes
+            self.expired[priority] += 1
+            raise DeadlineExceeded("no {} request slot, its burst is 0".format(self.name))
+        if not self.queue and self.bucket.try_consume():
+            self.__granted__(priority, queued_at)
+            return
+
+        future = asyncio.get_event_loop().create_future()
+        heapq.heappush(self.queue, (priority, next(self.order), future))
+        if self.dispatcher is None:
+            self.dispatcher = asyncio.ensure_future(self.__dispatch__())
+
+        try:
+            if deadline is None:
+                await future
+            else:
+                await asyncio.wait_for(future, deadline)
+        except asyncio.TimeoutError:
+            self.expired[priority] += 1
+            raise DeadlineExceeded("no {} request slot within {} seconds".format(self.name, deadline))
+        self.__granted__(priority, queued_at)
+
+    def __granted__(self, priority, queued_at):
+        wait = time.monotonic() - queued_at
+        self.granted[priority] += 1
+        self.total_wait[priority] += wait
+        self.max_wait[priority] = max(self.max_wait[priority], wait)
+
+    async def __dispatch__(self):
+        try:
+            while self.queue:
+                delay = self.bucket.delay()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    continue
+                priority, order, future = heapq.heappop(self.queue)
+                # waiters that gave up leave a cancelled future behind
+                if future.done():
+                    continue
+                self.bucket.try_consume()
+                future.set_result(None)
+        finally:
+            self.dispatcher = None
+
+    def stats(self):
+        stats = {"queued": sum(1 for entry in self.queue if not entry[2].done())}
+        for priority, name in PRIORITY_NAMES.items():
+            granted = self.granted[priority]
+            stats[name] = {
+                "granted": granted,
+                "expired": self.expired[priority],
+                "mean_wait": self.total_wait[priority] / granted if granted else 0.0,
+                "max_wait": self.max_wait[priority]
+            }
+        return stats
+
+    def __str__(self):
+        return "[ExchangeScheduler {} {}]".format(self.name, self.stats())
@@ -0,0 +1,32 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls sharing a key: the first caller runs the coroutine,
+    callers arriving while it is in flight await the same result
+    """
+
+    def __init__(self):
+        self.in_flight = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key, coroutine_factory):
+        self.calls += 1
+        future = self.in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(coroutine_factory())
+            self.in_flight[key] = future
+            future.add_done_callback(lambda done: self.__forget__(key, done))
+        else:
+            self.coalesced += 1
+        # a cancelled caller must not cancel the computation the others wait on
+        return await asyncio.shield(future)
+
+    def __forget__(self, key, future):
+        if self.in_flight.get(key) is future:
+            del self.in_flight[key]
+
+    def __str__(self):
+        return "[SingleFlight in_flight:{} calls:{} coalesced:{}]".format(len(self.in_flight), self.calls, self.coalesced)
@@ -0,0 +1,53 @@
+import time
+
+
+class TickerSnapshot:
+    """
+    Tickers of every market of one exchange built from one bulk response,
+    lookups miss once the snapshot is older than max_age seconds
+    """
+
+    def __init__(self, exchange, max_age):
+        self.exchange = exchange
+        self.max_age = max_age
+        self.tickers = {}
+        self.taken_at = None
+
+        self.updates = 0
+        self.hits = 0
+        self.misses = 0
+
+    def update(self, tickers):
+        """
+        :param tickers: Ticker by the exchange's market, replaces the previous snapshot as a whole
+        """
+        self.tickers = tickers
+        self.taken_at = time.monotonic()
+        self.updates += 1
+
+    def age(self):
+        if self.taken_at is None:
+            return None
+        return time.monotonic() - self.taken_at
+
+    def is_fresh(self, max_age=None):
+        age = self.age()
+        return age is not None and age <= (self.max_age if max_age is None else max_age)
+
+    def get(self, market):
+        ticker = self.tickers.get(market) if self.is_fresh() else None
+        if ticker is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return ticker
+
+    def stats(self):
+        age = self.age()
+        return {
+            "markets": len(self.tickers),
+            "age": None if age is None else round(age, 1),
+            "updates": self.updates,
+            "hits": self.hits,
+            "misses": self.misses
+        }
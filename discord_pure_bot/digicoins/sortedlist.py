@@ -0,0 +1,133 @@
+import bisect
+
+
+class SortedKeyList:
+    """
+    Sorted list split in bounded sublists, add and remove touch one sublist only.
+    A Fenwick tree over the sublist lengths finds positions in O(log n)
+    """
+
+    def __init__(self, load=128):
+        self.load = load
+        self.lists = []
+        self.maxes = []
+        # index[i] holds the total length of lists[i & (i + 1):i + 1]
+        self.index = []
+        self.size = 0
+
+    @staticmethod
+    def from_sorted(keys, load=128):
+        keys_list = SortedKeyList(load)
+        keys_list.lists = [keys[start:start + load] for start in range(0, len(keys), load)]
+        keys_list.maxes = [sublist[-1] for sublist in keys_list.lists]
+        keys_list.size = len(keys)
+        keys_list.__build_index__()
+        return keys_list
+
+    def __build_index__(self):
+        # after sublists were split or dropped, which happens once every load changes or so
+        index = [len(sublist) for sublist in self.lists]
+        for position in range(len(index)):
+            parent = position | (position + 1)
+            if parent < len(index):
+                index[parent] += index[position]
+        self.index = index
+
+    def __resize__(self, position, change):
+        while position < len(self.index):
+            self.index[position] += change
+            position |= position + 1
+
+    def __count_before__(self, position):
+        """
+        Number of keys in lists[:position]
+        """
+        count = 0
+        while position > 0:
+            count += self.index[position - 1]
+            position &= position - 1
+        return count
+
+    def __locate__(self, position):
+        """
+        (sublist, offset in it) of the key at position
+        """
+        sublist = 0
+        step = 1 << (len(self.index).bit_length() - 1)
+        while step:
+            upper = sublist + step
+            if upper <= len(self.index) and self.index[upper - 1] <= position:
+                position -= self.index[upper - 1]
+                sublist = upper
+            step >>= 1
+        return sublist, position
+
+    def add(self, key):
+        if not self.maxes:
+            self.lists.append([key])
+            self.maxes.append(key)
+            self.index = [1]
+        else:
+            position = bisect.bisect_left(self.maxes, key)
+            if position == len(self.maxes):
+                position -= 1
+                self.lists[position].append(key)
+                self.maxes[position] = key
+            else:
+                bisect.insort(self.lists[position], key)
+
+            sublist = self.lists[position]
+            if len(sublist) > 2 * self.load:
+                half = sublist[self.load:]
+                del sublist[self.load:]
+                self.maxes[position] = sublist[-1]
+                self.lists.insert(position + 1, half)
+                self.maxes.insert(position + 1, half[-1])
+                self.__build_index__()
+            else:
+                self.__resize__(position, 1)
+        self.size += 1
+
+    def remove(self, key):
+        position = bisect.bisect_left(self.maxes, key)
+        sublist = self.lists[position]
+        del sublist[bisect.bisect_left(sublist, key)]
+        if sublist:
+            self.maxes[position] = sublist[-1]
+            self.__resize__(position, -1)
+        else:
+            del self.lists[position]
+            del self.maxes[position]
+            self.__build_index__()
+        self.size -= 1
+
+    def bisect_left(self, key):
+        """
+        Position key has or would have in the whole list
+        """
+        position = bisect.bisect_left(self.maxes, key)
+        if position == len(self.maxes):
+            return self.size
+        return self.__count_before__(position) + bisect.bisect_left(self.lists[position], key)
+
+    def first(self, count):
+        keys = []
+        for sublist in self.lists:
+            if len(keys) + len(sublist) >= count:
+                keys.extend(sublist[:count - len(keys)])
+                return keys
+            keys.extend(sublist)
+        return keys
+
+    def __getitem__(self, position):
+        if not 0 <= position < self.size:
+            raise IndexError("position {} out of {} keys".format(position, self.size))
+        sublist, offset = self.__locate__(position)
+        return self.lists[sublist][offset]
+
+    def __iter__(self):
+        for sublist in self.lists:
+            yield from sublist
+
+    def __len__(self):
+        return self.size
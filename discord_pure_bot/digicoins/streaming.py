@@ -0,0 +1,334 @@
+"""
+   Live L2 order books kept current from exchange websocket feeds
+"""
+
+import asyncio
+import json
+import time
+
+import aiohttp
+import numpy as np
+
+from digicoins.entity import ColumnarOrderBook
+from digicoins.sortedlist import SortedKeyList
+
+
+class FeedGap(Exception):
+    """
+    Raised when the feed can no longer be trusted and books need a fresh snapshot
+    """
+    pass
+
+
+class L2Book:
+    """
+    Price aggregated book of one market, levels kept sorted best price first
+    """
+
+    def __init__(self, market_name):
+        self.market_name = market_name
+        self.sizes = {
+            "asks": {},
+            "bids": {}
+        }
+        # sort keys, asks by price and bids by negated price, so index 0 is the best level
+        self.keys = {
+            "asks": SortedKeyList(),
+            "bids": SortedKeyList()
+        }
+        self.synced = False
+        self.timestamp = None
+        self.version = 0
+        self.snapshot = None
+        # objects with reset(asks, bids, timestamp) and update(side, price, size, timestamp), e.g. WallTracker
+        self.listeners = []
+
+    @staticmethod
+    def __key__(side, price):
+        # its own inverse, also turns a key back into its price
+        return price if side == "asks" else -price
+
+    def reset(self, asks, bids, timestamp=None):
+        for side, levels in (("asks", asks), ("bids", bids)):
+            sizes = {}
+            for price, size in levels:
+                if size > 0:
+                    sizes[price] = size
+            self.sizes[side] = sizes
+            self.keys[side] = SortedKeyList.from_sorted(sorted(L2Book.__key__(side, price) for price in sizes))
+        self.synced = True
+        self.__touch__(timestamp)
+        for listener in self.listeners:
+            listener.reset(self.levels("asks"), self.levels("bids"), self.timestamp)
+
+    def update(self, side, price, size, timestamp=None):
+        sizes = self.sizes[side]
+        keys = self.keys[side]
+        key = L2Book.__key__(side, price)
+        if size > 0:
+            if price not in sizes:
+                keys.add(key)
+            sizes[price] = size
+        elif price in sizes:
+            del sizes[price]
+            keys.remove(key)
+        else:
+            return
+        self.__touch__(timestamp)
+        for listener in self.listeners:
+            listener.update(side, price, size, self.timestamp)
+
+    def levels(self, side):
+        prices = [L2Book.__key__(side, key) for key in self.keys[side]]
+        return [(price, self.sizes[side][price]) for price in prices]
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+        if self.synced:
+            listener.reset(self.levels("asks"), self.levels("bids"), self.timestamp)
+
+    def desync(self):
+        self.synced = False
+        self.snapshot = None
+
+    def __touch__(self, timestamp):
+        self.version += 1
+        self.snapshot = None
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    def depth(self, side):
+        return len(self.keys[side])
+
+    def order_book(self, market, depth):
+        """
+        ColumnarOrderBook of the current state cut to depth, arrays are rebuilt only after a change
+        """
+        if not self.synced:
+            return None
+        if self.snapshot is None or self.snapshot.market is not market:
+            columns = {}
+            for side in ("asks", "bids"):
+                sizes = self.sizes[side]
+                rates = np.fromiter((L2Book.__key__(side, key) for key in self.keys[side]), dtype=np.float64, count=len(sizes))
+                quantities = np.fromiter((sizes[rate] for rate in rates.tolist()), dtype=np.float64, count=len(sizes))
+                columns[side] = (rates, quantities)
+            self.snapshot = ColumnarOrderBook(market, columns["asks"][0], columns["asks"][1],
+                                              columns["bids"][0], columns["bids"][1], timestamp=self.timestamp)
+        return self.snapshot.cut(depth)
+
+
+class BookFeed:
+    """
+    Websocket connection feeding L2Books, reconnects and resyncs on gaps, errors and silence
+    """
+
+    def __init__(self, name, url, market_names, stale_after=30.0, max_depth=None, record_path=None):
+        self.name = name
+        self.url = url
+        self.books = {market_name: L2Book(market_name) for market_name in market_names}
+        self.stale_after = stale_after
+        # deepest book the feed provides, None when it sends the whole book
+        self.max_depth = max_depth
+        self.record_path = record_path
+        self.session = None
+        self.connected = False
+
+        self.messages = 0
+        self.resyncs = 0
+        self.gaps = 0
+
+    def subscribe_messages(self):
+        raise NotImplementedError
+
+    def handle(self, message):
+        raise NotImplementedError
+
+    def __reset_connection_state__(self):
+        pass
+
+    def order_book(self, market, depth):
+        book = self.books.get(market.market_name)
+        if book is None or not self.connected:
+            return None
+        if self.max_depth is not None and depth > self.max_depth:
+            return None
+        return book.order_book(market, depth)
+
+    def desync(self):
+        for book in self.books.values():
+            book.desync()
+
+    def track(self, market_name, listener):
+        """
+        Feeds every change of a market's book to listener, e.g. a WallTracker
+        """
+        self.books[market_name].add_listener(listener)
+
+    async def run(self, retry_delay=1.0, max_retry_delay=60.0):
+        delay = retry_delay
+        while True:
+            try:
+                await self.listen()
+                delay = retry_delay
+            except FeedGap as problem:
+                self.gaps += 1
+                print("resyncing", self.name, "feed:", problem)
+                delay = retry_delay
+            except asyncio.CancelledError:
+                raise
+            except Exception as problem:
+                print("feed", self.name, "failed:", problem)
+            finally:
+                self.connected = False
+                self.desync()
+            self.resyncs += 1
+            await asyncio.sleep(delay)
+            delay = min(2 * delay, max_retry_delay)
+
+    async def listen(self):
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+        self.__reset_connection_state__()
+
+        record = open(self.record_path, "a", encoding="utf8") if self.record_path else None
+        try:
+            async with self.session.ws_connect(self.url) as websocket:
+                self.connected = True
+                for message in self.subscribe_messages():
+                    await websocket.send_str(json.dumps(message))
+
+                while True:
+                    try:
+                        received = await asyncio.wait_for(websocket.receive(), self.stale_after)
+                    except asyncio.TimeoutError:
+                        raise FeedGap("no message for {} seconds".format(self.stale_after))
+
+                    if received.type != aiohttp.WSMsgType.TEXT:
+                        return
+                    if record is not None:
+                        record.write(received.data + "\n")
+                    self.messages += 1
+                    self.handle(json.loads(received.data))
+        finally:
+            if record is not None:
+                record.close()
+
+
+class GdaxBookFeed(BookFeed):
+    """
+    See https://docs.gdax.com/#the-level2-channel
+
+    level2 carries no sequence numbers: a snapshot always precedes updates on a connection,
+    the heartbeat channel proves liveness and any inconsistency reconnects for fresh snapshots
+    """
+
+    def __init__(self, market_names, url="wss://ws-feed.gdax.com", **kwargs):
+        super().__init__("Gdax", url, market_names, **kwargs)
+
+    def subscribe_messages(self):
+        return [{
+            "type": "subscribe",
+            "product_ids": list(self.books),
+            "channels": ["level2", "heartbeat"]
+        }]
+
+    def handle(self, message):
+        kind = message.get("type")
+        if kind == "snapshot":
+            book = self.books.get(message["product_id"])
+            if book is not None:
+                book.reset(
+                    [(float(price), float(size)) for price, size in message["asks"]],
+                    [(float(price), float(size)) for price, size in message["bids"]]
+                )
+        elif kind == "l2update":
+            book = self.books.get(message["product_id"])
+            if book is None:
+                return
+            if not book.synced:
+                raise FeedGap("update before snapshot for {}".format(message["product_id"]))
+            for side, price, size in message["changes"]:
+                book.update("bids" if side == "buy" else "asks", float(price), float(size))
+        elif kind == "error":
+            raise FeedGap(message.get("message"))
+
+
+class BitfinexBookFeed(BookFeed):
+    """
+    See https://docs.bitfinex.com/v2/reference#ws-public-order-books
+
+    Every message carries a connection wide sequence number (SEQ_ALL), a skipped number is a gap
+    """
+
+    SEQ_ALL = 65536
+    RECONNECT_CODES = (20051, 20060)
+
+    def __init__(self, market_names, url="wss://api.bitfinex.com/ws/2", length=100, **kwargs):
+        super().__init__("Bitfinex", url, market_names, max_depth=length, **kwargs)
+        self.length = length
+        self.channels = {}
+        self.sequence = None
+
+    def __reset_connection_state__(self):
+        self.channels = {}
+        self.sequence = None
+
+    @staticmethod
+    def symbol(market_name):
+        return "t" + market_name.upper()
+
+    def subscribe_messages(self):
+        messages = [{"event": "conf", "flags": BitfinexBookFeed.SEQ_ALL}]
+        for market_name in self.books:
+            messages.append({
+                "event": "subscribe",
+                "channel": "book",
+                "symbol": BitfinexBookFeed.symbol(market_name),
+                "prec": "P0",
+                "len": str(self.length)
+            })
+        return messages
+
+    def handle(self, message):
+        if isinstance(message, dict):
+            self.__handle_event__(message)
+            return
+
+        sequence = message[-1]
+        if self.sequence is not None and sequence != self.sequence + 1:
+            raise FeedGap("sequence jumped from {} to {}".format(self.sequence, sequence))
+        self.sequence = sequence
+
+        book = self.channels.get(message[0])
+        payload = message[1]
+        if book is None or payload == "hb" or payload == "cs":
+            return
+
+        if len(payload) > 0 and isinstance(payload[0], list):
+            asks = []
+            bids = []
+            for price, count, amount in payload:
+                if amount > 0:
+                    bids.append((price, amount))
+                else:
+                    asks.append((price, -amount))
+            book.reset(asks, bids)
+        elif len(payload) == 3:
+            if not book.synced:
+                raise FeedGap("update before snapshot for {}".format(book.market_name))
+            price, count, amount = payload
+            if count > 0:
+                book.update("bids" if amount > 0 else "asks", price, abs(amount))
+            else:
+                book.update("bids" if amount > 0 else "asks", price, 0)
+
+    def __handle_event__(self, message):
+        event = message.get("event")
+        if event == "subscribed" and message.get("channel") == "book":
+            market_name = message["symbol"][1:].lower()
+            if market_name in self.books:
+                self.channels[message["chanId"]] = self.books[market_name]
+        elif event == "info" and message.get("code") in BitfinexBookFeed.RECONNECT_CODES:
+            raise FeedGap("exchange asked to reconnect, code {}".format(message["code"]))
+        elif event == "error":
+            raise FeedGap(message.get("msg"))
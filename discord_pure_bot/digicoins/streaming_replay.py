@@ -0,0 +1,75 @@
+"""
+   Local stand-in for an exchange websocket feed, replays server messages recorded with
+   BookFeed(record_path=...) or written by hand. The feeds in fixtures/feeds are synthetic,
+   made up in the exchanges' message formats rather than recorded from them
+"""
+
+import asyncio
+
+from aiohttp import web
+
+
+class ReplayFeedServer:
+    """
+    Serves every websocket client the same messages, one per line of a recording
+    written by BookFeed(record_path=...), after reading the client's subscription messages.
+    Connections after the first get reconnect_messages instead when given, e.g. a clean
+    feed after one with an injected gap
+    """
+
+    def __init__(self, messages, host="127.0.0.1", port=0, interval=0.0, subscriptions=1, reconnect_messages=None):
+        self.messages = messages
+        self.reconnect_messages = reconnect_messages
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.subscriptions = subscriptions
+        self.received = []
+        self.connections = 0
+        self.runner = None
+
+    @staticmethod
+    def from_file(path, **kwargs):
+        with open(path, encoding="utf8") as file:
+            messages = [line.rstrip("\n") for line in file if line.strip()]
+        return ReplayFeedServer(messages, **kwargs)
+
+    @property
+    def url(self):
+        return "ws://{}:{}/".format(self.host, self.port)
+
+    async def start(self):
+        application = web.Application()
+        application.router.add_get("/", self.__handle__)
+        self.runner = web.AppRunner(application)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        if self.port == 0:
+            self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def __handle__(self, request):
+        websocket = web.WebSocketResponse()
+        await websocket.prepare(request)
+        self.connections += 1
+        messages = self.messages
+        if self.connections > 1 and self.reconnect_messages is not None:
+            messages = self.reconnect_messages
+
+        for _ in range(self.subscriptions):
+            self.received.append(await websocket.receive_str())
+
+        for message in messages:
+            await websocket.send_str(message)
+            if self.interval > 0:
+                await asyncio.sleep(self.interval)
+
+        # stay connected like an idle exchange until the client leaves
+        async for _ in websocket:
+            pass
+        return websocket
@@ -2,8 +2,15 @@ import asyncio
 
 import discord
 
-import digicoins.libs.bittrex_api_copy as bittrex
 import wall_calculator
+import volume_history
+import volume_worker
+from volume_scanner import VolumeScanner
+from subscriptions import SubscriptionIndex,DEFAULT_SUBSCRIPTIONS
+from volume_statistics import edit_timeframes
+import outbox
+from rendering import templates
+from digicoins.metrics import metrics,MetricsServer
 from presets import test_presets
 
 discordClient = discord.Client()
@@ -14,73 +21,32 @@ async def on_ready():
     print('Logged in as', discordClient.user.name, discordClient.user.id)
 
 
-def update_pair_volumes():
-    try:
-        result = bittrexClient.get_market_summaries()['result']
-        for market in result:
-            market_name = market['MarketName']
-            new_value = market['BaseVolume']
-            if market_name not in HISTORY:
-                HISTORY[market_name] = []
-            HISTORY[market_name].insert(0,new_value)
-    except Exception:
-        for market_name in HISTORY:
-            new_value = HISTORY[market_name][0]
-            HISTORY[market_name].insert(0, new_value)
+async def publish_alerts(alerts):
+    """
+    :param alerts: (exchange name, market name, time frame, change) of one scanner tick
+    """
+    message = "".join(templates.volume_alert(exchange_name,pair).render(change * 100,time_frame)
+                      for exchange_name,pair,time_frame,change in alerts)
+    print(message)
+    # queued for every channel at once, delivery goes on while the next tick is polled
+    started = metrics.start()
+    await OUTBOX.send(CHANNELS, message)
+    metrics.observe("alert_queue", "discord", started)
+
+
+def subscriptions_changed():
+    if VOLUME_WORKER is not None:
+        VOLUME_WORKER.set_subscriptions(SUBSCRIPTIONS)
+    else:
+        VOLUME_SCANNER.set_subscriptions(SUBSCRIPTIONS)
 
 
 async def volume_changes():
     await discordClient.wait_until_ready()
-
-    while not discordClient.is_closed:
-        update_pair_volumes()
-
-        message = ""
-
-        for pair in HISTORY:
-
-            if not (pair.startswith("BTC-") or pair.endswith("-BTC")):
-                continue
-
-            pair_history = HISTORY[pair]
-            tracked = False
-            for time_frame,threshold in presets["tracked_timeframes"].items():
-                if len(pair_history) <= time_frame:
-                    continue
-
-                try:
-                    new = pair_history[0]
-                    old = pair_history[time_frame]
-                    change = (new - old) / old
-                    change_prc = change * 100
-                    counter_ccy = pair.split("-")[1]
-
-                    if change < threshold:
-                        continue
-                    tracked = True
-                    message += "```\n[{}]\n" \
-                               "Vol. Change: {:.02f}%\n"\
-                               "Time Period: {} minutes\n\n"\
-                               "{}'s volume has risen {:.02f}% in the last {} minutes, this could be signs of mass accumulation, trade accordingly.```\n"\
-                        .format(pair,change_prc,time_frame,counter_ccy,change_prc,time_frame)
-                except Exception as problem:
-                    await discordClient.send_message(channel, "oops I got exception " + str(problem))
-
-            if tracked:
-                HISTORY[pair] = []
-            if len(HISTORY[pair]) >= 1000:
-                HISTORY[pair] = HISTORY[pair][:100]
-
-        if message != "":
-            print(message)
-            try:
-                for channel in CHANNELS:
-                    await discordClient.send_message(channel, message)
-            except Exception as problem:
-                print("unable to send message",problem)
-        else:
-            print("no big deals ..")
-        await asyncio.sleep(60) # task runs every 60 seconds
+    if VOLUME_WORKER is not None:
+        await VOLUME_WORKER.run(publish_alerts)
+    else:
+        VOLUME_SCANNER.start()
 
 
 @discordClient.event
@@ -101,45 +67,75 @@ async def on_message(message):
                     return
 
                 if message.content.startswith("!walls"):
-                    answer = wallCalculator.walls(message)
+                    answer = await wallCalculator.walls(message)
                     if answer is not None:
-                        await discordClient.send_message(message.channel,answer)
+                        await OUTBOX.deliver([message.channel],answer)
 
                 if message.content.startswith("!tf"):
-                    s = message.content[4:].upper()
-                    data = s.split(",")
+                    # !tf minutes[,threshold][,statistic] sets a threshold, !tf minutes,statistic drops one,
+                    # !tf minutes drops the time frame. Statistics are change (the default), rise, breakout and z
+                    s = message.content[4:].lower()
+                    data = [part.strip() for part in s.split(",")]
                     print(data)
-                    if len(data) == 2:
-                        minutes = int(data[0])
-                        percent = float(data[1])
-                        presets["tracked_timeframes"][minutes] = percent
-                    elif len(data) == 1:
-                        if int(data[0]) in presets["tracked_timeframes"]:
-                            del presets["tracked_timeframes"][int(data[0])]
-                    await discordClient.send_message(message.channel, " new timetable " + str(presets["tracked_timeframes"]))
+                    try:
+                        edit_timeframes(presets["tracked_timeframes"], data)
+                    except ValueError as problem:
+                        await discordClient.send_message(message.channel, str(problem))
+                    else:
+                        if VOLUME_WORKER is not None:
+                            VOLUME_WORKER.set_timeframes(presets["tracked_timeframes"])
+                        await discordClient.send_message(message.channel, " new timetable " + str(presets["tracked_timeframes"]))
 
+                elif message.content.startswith("!pairs"):
+                    await discordClient.send_message(message.channel, "tracked markets " + ", ".join(SUBSCRIPTIONS.entries()))
                 elif message.content.startswith("!pair"):
-                    s = message.content[6:].upper()
-                    if not s in presets["tracked_pairs"]:
-                        presets["tracked_pairs"].append(s)
-                        await discordClient.send_message(message.channel,"bot will now track " + s)
-                        print("bot will now track",s)
+                    # BTC-LTC, or BTC-* for every market quoted in BTC, or *-BTC for every market trading BTC
+                    s = message.content[6:].upper().strip(" ")
+                    try:
+                        added = SUBSCRIPTIONS.add(s)
+                    except ValueError as problem:
+                        await discordClient.send_message(message.channel, str(problem))
+                    else:
+                        if added:
+                            subscriptions_changed()
+                            await discordClient.send_message(message.channel,"bot will now track " + s)
+                            print("bot will now track",s)
+                        else:
+                            await discordClient.send_message(message.channel, s + " is tracked already")
                 elif message.content.startswith("!unpair"):
                     s = message.content[8:].upper().strip(" ")
-                    if not s in presets["tracked_pairs"]:
-                        await discordClient.send_message(message.channel, s + " is not there")
+                    try:
+                        removed = SUBSCRIPTIONS.remove(s)
+                    except ValueError as problem:
+                        await discordClient.send_message(message.channel, str(problem))
                     else:
-                        presets["tracked_pairs"].remove(s)
-                        await discordClient.send_message(message.channel, "bot will not track " + s + " anymore")
+                        if not removed:
+                            await discordClient.send_message(message.channel, s + " is not there")
+                        else:
+                            subscriptions_changed()
+                            await discordClient.send_message(message.channel, "bot will not track " + s + " anymore")
+                elif message.content.startswith("!cache"):
+                    stats = wallCalculator.publicClientQueryExecutor.cache_stats()
+                    await discordClient.send_message(message.channel, "cache stats " + str(stats))
+                elif message.content.startswith("!outbox"):
+                    await discordClient.send_message(message.channel, "outbox " + str(OUTBOX.stats()))
+                elif message.content.startswith("!worker"):
+                    stats = "not running, volumes are scanned in process" if VOLUME_WORKER is None else str(VOLUME_WORKER.stats())
+                    await discordClient.send_message(message.channel, "volume worker " + stats)
+                elif message.content.startswith("!queues"):
+                    stats = wallCalculator.publicClientQueryExecutor.scheduler_stats()
+                    await discordClient.send_message(message.channel, "request queues " + str(stats))
 
                 print("processed")
             else:
                 pass
         else:
             if message.content.startswith("!walls"):
-                answer = wallCalculator.walls(message)
+                answer = await wallCalculator.walls(message)
                 if answer is not None:
-                    await discordClient.send_message(message.channel, answer)
+                    started = metrics.start()
+                    await OUTBOX.deliver([message.channel], answer)
+                    metrics.observe("walls_send", "discord", started)
 
                 print("public channel message",message.channel,message.channel.id)
     except Exception as problem:
@@ -147,11 +143,41 @@ async def on_message(message):
 
 
 
-bittrexClient = bittrex.Bittrex('123key123zzuegflsrksfyousufferbutwhy', 'meowwhoiscareaboutthisbotbutstillhavetoaddsecretkey')
-wallCalculator = wall_calculator.WallCalculator()
-presets = test_presets
-CHANNELS = [discord.Object(id=id) for id in presets["channel_ids"]]
-HISTORY = {}
-discordClient.loop.create_task(volume_changes())
-discordClient.run(presets['bot-token'])
-
+if __name__ == "__main__":
+    wallCalculator = wall_calculator.AsyncWallCalculator()
+    presets = test_presets
+    CHANNELS = [discord.Object(id=id) for id in presets["channel_ids"]]
+    OUTBOX = outbox.Outbox(discordClient, presets.get("outbox"))
+    # seconds between two volume polls of each exchange
+    POLL_INTERVALS = presets.get("volume_poll_intervals", {"BITTREX": 60, "BITFINEX": 60, "GDAX": 120})
+    # markets the volume scanner polls and scans, changed with !pair and !unpair
+    SUBSCRIPTIONS = SubscriptionIndex.from_entries(presets.get("tracked_pairs") or DEFAULT_SUBSCRIPTIONS)
+    VOLUME_WORKER = None
+    VOLUME_SCANNER = None
+    if presets.get("volume_worker"):
+        # polling and scanning in a process of their own, started and restarted from here.
+        # both processes call the same exchanges, each gets a part of every quota
+        executor = wallCalculator.publicClientQueryExecutor
+        bot_rate_limits, worker_rate_limits = volume_worker.split_rate_limits(
+            executor.presets["rate_limits"], presets.get("volume_worker_rate_share", 0.5))
+        executor.set_rate_limits(bot_rate_limits)
+        VOLUME_WORKER = volume_worker.VolumeWorker({
+            "timeframes": dict(presets["tracked_timeframes"]),
+            "subscriptions": SUBSCRIPTIONS.entries(),
+            "poll_intervals": POLL_INTERVALS,
+            "history_path": presets.get("history_path", "volume_history.bin"),
+            "catalog_path": "market_catalog.json",
+            "metrics_port": presets.get("volume_worker_metrics_port"),
+            "rate_limits": worker_rate_limits
+        })
+    else:
+        HISTORY = volume_history.MarketVolumeStore.persistent(presets.get("history_path", "volume_history.bin"), POLL_INTERVALS, market_filter=SUBSCRIPTIONS.__contains__)
+        # the scanner reads the presets time frames, !tf changes apply on its next tick
+        VOLUME_SCANNER = VolumeScanner(wallCalculator.publicClientQueryExecutor, HISTORY, presets["tracked_timeframes"], SUBSCRIPTIONS, publish_alerts)
+    if presets.get("metrics_port") is not None:
+        # Prometheus text on http://127.0.0.1:<metrics_port>/metrics, instrumentation stays off without it
+        metrics.enabled = True
+        discordClient.loop.run_until_complete(MetricsServer(metrics, port=presets["metrics_port"]).start())
+    discordClient.loop.run_until_complete(wallCalculator.start())
+    discordClient.loop.create_task(volume_changes())
+    discordClient.run(presets['bot-token'])
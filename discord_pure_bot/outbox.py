@@ -0,0 +1,216 @@
+"""
+   Outgoing Discord messages: split under the length limit at code block boundaries,
+   one worker per channel so channels are served concurrently and independently
+"""
+
+import asyncio
+
+import discord
+
+from digicoins.scheduler import TokenBucket
+
+FENCE = "```"
+MESSAGE_LIMIT = 2000
+
+
+def pack_parts(pieces, limit, opening="", closing=""):
+    """
+    Joins pieces greedily into chunks of at most limit characters, each wrapped in opening and closing
+    """
+    room = limit - len(opening) - len(closing)
+    chunks = []
+    current = []
+    size = 0
+    for piece in pieces:
+        while len(piece) > room:
+            # a single line longer than a message is cut where it has to
+            if current:
+                chunks.append(opening + "".join(current) + closing)
+                current, size = [], 0
+            chunks.append(opening + piece[:room] + closing)
+            piece = piece[room:]
+        if size + len(piece) > room:
+            chunks.append(opening + "".join(current) + closing)
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece)
+    if current:
+        chunks.append(opening + "".join(current) + closing)
+    return chunks
+
+
+def code_blocks(message):
+    """
+    The message as consecutive fenced code blocks, each with its trailing newline, and the text between them
+    """
+    blocks = []
+    position = 0
+    while position < len(message):
+        start = message.find(FENCE, position)
+        if start < 0:
+            blocks.append(message[position:])
+            break
+        if start > position:
+            blocks.append(message[position:start])
+        end = message.find(FENCE, start + len(FENCE))
+        if end < 0:
+            blocks.append(message[start:])
+            break
+        end += len(FENCE)
+        if message.startswith("\n", end):
+            end += 1
+        blocks.append(message[start:end])
+        position = end
+    return blocks
+
+
+def split_block(block, limit):
+    if not block.startswith(FENCE):
+        return pack_parts(block.splitlines(keepends=True), limit)
+
+    # reopen the fence with its language line in every piece and close it again
+    closing_at = block.find(FENCE, len(FENCE))
+    if closing_at < 0:
+        # left open at the end of the message, every piece gets closed anyway
+        closing_at = len(block)
+        closing = FENCE + "\n"
+    else:
+        closing = block[closing_at:]
+        if not closing.endswith("\n"):
+            closing += "\n"
+    first_line_end = block.find("\n", 0, closing_at) + 1
+    if first_line_end == 0:
+        # a block on a single line has no language line, only the fence is repeated
+        first_line_end = len(FENCE)
+    opening = block[:first_line_end]
+    return pack_parts(block[first_line_end:closing_at].splitlines(keepends=True), limit, opening, closing)
+
+
+def split_message(message, limit=MESSAGE_LIMIT):
+    """
+    Parts of at most limit characters, cut between code blocks and inside one only when it is longer than limit
+    """
+    pieces = []
+    for block in code_blocks(message):
+        if len(block) > limit:
+            pieces.extend(split_block(block, limit))
+        else:
+            pieces.append(block)
+    return [part for part in pack_parts(pieces, limit) if part.strip()]
+
+
+class Outbox:
+    """
+    Bounded message queue and worker per channel. Each worker paces itself with the channel's
+    token bucket, all of them share the global one, and failed sends are retried with backoff.
+    send() waits while a channel queue is full, so a flood slows its producer down instead of piling up
+    """
+
+    def __init__(self, client, presets=None):
+        self.client = client
+        self.presets = {
+            # discord allows 5 messages per 5 seconds in a channel and 50 requests per second overall
+            "channel_rate": 1.0,
+            "channel_burst": 5,
+            "global_rate": 50.0,
+            "global_burst": 50,
+            "queue_size": 50,
+            "retries": 4,
+            "retry_delay": 1.0,
+            "message_limit": MESSAGE_LIMIT
+        }
+        if presets is not None:
+            self.presets.update(presets)
+        self.global_bucket = TokenBucket(self.presets["global_rate"], self.presets["global_burst"])
+        self.queues = {}
+        self.buckets = {}
+        self.workers = {}
+
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def __queue__(self, channel):
+        queue = self.queues.get(channel.id)
+        if queue is None:
+            queue = self.queues[channel.id] = asyncio.Queue(self.presets["queue_size"])
+            self.buckets[channel.id] = TokenBucket(self.presets["channel_rate"], self.presets["channel_burst"])
+            self.workers[channel.id] = asyncio.ensure_future(self.__work__(channel, queue))
+        return queue
+
+    async def send(self, channels, message):
+        """
+        Queues message for every channel, waits for queue room but not for delivery
+
+        :return: one future per channel, True once every part of the message was delivered there
+        """
+        parts = split_message(message, self.presets["message_limit"])
+        futures = []
+        for channel in channels:
+            delivered = asyncio.get_event_loop().create_future()
+            await self.__queue__(channel).put((parts, delivered))
+            futures.append(delivered)
+        return futures
+
+    async def deliver(self, channels, message):
+        """
+        send() and wait until every channel got the message or gave up on it
+
+        :return: list of delivered flags, one per channel
+        """
+        return list(await asyncio.gather(*await self.send(channels, message)))
+
+    async def __wait_for_tokens__(self, bucket):
+        delay = max(bucket.delay(), self.global_bucket.delay())
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = max(bucket.delay(), self.global_bucket.delay())
+        # no await since the check, other workers cannot have taken the tokens
+        bucket.try_consume()
+        self.global_bucket.try_consume()
+
+    async def __work__(self, channel, queue):
+        bucket = self.buckets[channel.id]
+        while True:
+            parts, delivered = await queue.get()
+            ok = True
+            for part in parts:
+                ok = await self.__send_part__(channel, bucket, part)
+                if not ok:
+                    break
+            if not delivered.done():
+                delivered.set_result(ok)
+
+    async def __send_part__(self, channel, bucket, part):
+        delay = self.presets["retry_delay"]
+        for attempt in range(self.presets["retries"] + 1):
+            await self.__wait_for_tokens__(bucket)
+            try:
+                await self.client.send_message(channel, part)
+                self.sent += 1
+                return True
+            except (discord.Forbidden, discord.NotFound) as problem:
+                print("unable to send message to", channel.id, problem)
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception as problem:
+                status = getattr(getattr(problem, "response", None), "status", None)
+                if status == 429:
+                    # the route bucket is empty whatever we counted
+                    bucket.tokens = 0
+                print("send to", channel.id, "failed, attempt", attempt + 1, problem)
+            if attempt < self.presets["retries"]:
+                self.retried += 1
+                await asyncio.sleep(delay)
+                delay *= 2
+        self.failed += 1
+        return False
+
+    def stats(self):
+        return {
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "queued": {channel_id: queue.qsize() for channel_id, queue in self.queues.items()}
+        }
@@ -0,0 +1,107 @@
+"""
+   Discord report templates compiled once per market: symbols, coin names, number
+   precision and headers are baked in, a report is one join over its parts
+"""
+
+STRIKE_LINE = "======================================================"
+
+SIDE_TITLES = {
+    "asks": "Asks",
+    "bids": "Bids"
+}
+
+
+def literal(text):
+    # coin names and symbols end up inside format strings
+    return str(text).replace("{", "{{").replace("}", "}}")
+
+
+class WallReportTemplate:
+    """
+    Everything of a wall report that only depends on the market
+    """
+
+    def __init__(self, market):
+        self.market = market
+        self.is_usd = market.base_coin.coin == "USD" or market.traded_coin.coin == "USD"
+        symbol = literal(market.base_coin.symbol)
+
+        self.header = "```\n[Wall report from {}]\n\n[Last Price]\n{}\n".format(market.exchange_name, STRIKE_LINE)
+        self.last_price = "  " + symbol + (" {:2.02f}\n" if self.is_usd else " {:2.08f}\n")
+        self.side_titles = {
+            side: "\n[" + literal(market.market_name) + "] In {} " + title + "\n" + STRIKE_LINE + "\n"
+            for side, title in SIDE_TITLES.items()
+        }
+        if self.is_usd:
+            # usd markets show walls in the traded coin, the others in the base coin
+            self.wall_line = "  " + symbol + " {:8.02f}  -  {:12.02f} " + literal(market.traded_coin.coin) + " {}\n"
+            self.summary_coin = market.traded_coin.coin
+        else:
+            self.wall_line = "  " + symbol + " {:8.08f}  -  {:8.02f} " + literal(market.base_coin.coin) + " {}\n"
+            self.summary_coin = market.base_coin.coin
+        self.summary = "====> Summary : Total Resistance / Support : {:.02f} " + literal(self.summary_coin) + \
+                       " / {:.02f} " + literal(self.summary_coin) + " === {:.02f}% Resistance\n```"
+
+    def render(self, model):
+        wall_lines = {"asks": [], "bids": []}
+        wall_line = self.wall_line.format
+        for wallEntry in model.walls:
+            entry = wallEntry.orderBookEntry
+            quantity = entry.traded_quantity if self.is_usd else entry.base_quantity
+            wall_lines[entry.side].append(wall_line(entry.rate, quantity, "█" * int(wallEntry.size * 100)))
+
+        parts = [self.header, self.last_price.format(model.ticker.last)]
+        for side in ("asks", "bids"):
+            parts.append(self.side_titles[side].format(model.book.depth(side)))
+            parts.extend(wall_lines[side])
+            parts.append("\n")
+
+        if self.is_usd:
+            parts.append(self.summary.format(model.ask_grand_volume, model.bid_grand_volume, model.resistance))
+        else:
+            parts.append(self.summary.format(model.ask_grand_volume_in_base_coin, model.bid_grand_volume_in_base_coin, model.resistance))
+        return "".join(parts)
+
+
+class VolumeAlertTemplate:
+    """
+    Volume rise alert of one market of one exchange, e.g. BTC-LTC at Bittrex
+    """
+
+    def __init__(self, exchange_name, market_name):
+        counter_coin = market_name.split("-")[1]
+        self.text = "```\n[" + literal(market_name) + "] at " + literal(exchange_name) + "\n" \
+                    "Vol. Change: {0:.02f}%\n" \
+                    "Time Period: {1} minutes\n\n" + \
+                    literal(counter_coin) + "'s volume has risen {0:.02f}% in the last {1} minutes, " \
+                    "this could be signs of mass accumulation, trade accordingly.```\n"
+
+    def render(self, change_prc, time_frame):
+        return self.text.format(change_prc, time_frame)
+
+
+class Templates:
+    """
+    Compiled templates by (exchange, market name)
+    """
+
+    def __init__(self):
+        self.wall_reports = {}
+        self.volume_alerts = {}
+
+    def wall_report(self, market):
+        key = (market.exchange_name, market.market_name)
+        template = self.wall_reports.get(key)
+        if template is None:
+            template = self.wall_reports[key] = WallReportTemplate(market)
+        return template
+
+    def volume_alert(self, exchange_name, market_name):
+        key = (exchange_name, market_name)
+        template = self.volume_alerts.get(key)
+        if template is None:
+            template = self.volume_alerts[key] = VolumeAlertTemplate(exchange_name, market_name)
+        return template
+
+
+templates = Templates()
@@ -0,0 +1,105 @@
+"""
+   Markets the volume scanner polls, keeps and scans, as set by !pair and !unpair
+"""
+
+from digicoins.entity import Coin
+
+WILDCARD = "*"
+
+# what the scanner watched before subscriptions existed: every market with bitcoin on either side
+DEFAULT_SUBSCRIPTIONS = ["BTC-*", "*-BTC"]
+
+
+class SubscriptionIndex:
+    """
+    Subscribed markets by quote currency, in exchange agnostic names like BTC-LTC.
+    BTC-* subscribes every market quoted in BTC and *-BTC every market trading BTC.
+    A membership test is a few dict and set lookups whatever the number of subscriptions
+    """
+
+    def __init__(self, entries=()):
+        # quote coin -> traded coins
+        self.pairs = {}
+        self.quotes = set()
+        self.traded = set()
+        for entry in entries:
+            self.add(entry)
+
+    @staticmethod
+    def parse(entry):
+        """
+        :return: (quote coin, traded coin) with coin synonyms applied, either may be WILDCARD
+        """
+        parts = str(entry).upper().strip().split("-")
+        if len(parts) != 2 or not all(parts) or parts == [WILDCARD, WILDCARD]:
+            raise ValueError("{} is not a market like BTC-LTC, BTC-* or *-BTC".format(entry))
+        return tuple(part if part == WILDCARD else Coin(part).coin for part in parts)
+
+    @staticmethod
+    def from_entries(entries):
+        """
+        SubscriptionIndex of the valid entries, e.g. from presets, each invalid one is reported and skipped
+        """
+        subscriptions = SubscriptionIndex()
+        for entry in entries:
+            try:
+                subscriptions.add(entry)
+            except ValueError as problem:
+                print("skipping subscription:", problem)
+        return subscriptions
+
+    def add(self, entry):
+        """
+        :return: False when entry was subscribed already
+        """
+        quote, traded = SubscriptionIndex.parse(entry)
+        if traded == WILDCARD:
+            subscriptions, value = self.quotes, quote
+        elif quote == WILDCARD:
+            subscriptions, value = self.traded, traded
+        else:
+            subscriptions, value = self.pairs.setdefault(quote, set()), traded
+        if value in subscriptions:
+            return False
+        subscriptions.add(value)
+        return True
+
+    def remove(self, entry):
+        """
+        :return: False when entry was not subscribed, a pair covered by a wildcard is not removed by itself
+        """
+        quote, traded = SubscriptionIndex.parse(entry)
+        if traded == WILDCARD:
+            subscriptions, value = self.quotes, quote
+        elif quote == WILDCARD:
+            subscriptions, value = self.traded, traded
+        else:
+            subscriptions, value = self.pairs.get(quote, set()), traded
+        if value not in subscriptions:
+            return False
+        subscriptions.remove(value)
+        if quote in self.pairs and not self.pairs[quote]:
+            del self.pairs[quote]
+        return True
+
+    def matches(self, quote, traded):
+        return quote in self.quotes or traded in self.traded or traded in self.pairs.get(quote, ())
+
+    def matches_market(self, market):
+        return self.matches(market.base_coin.coin, market.traded_coin.coin)
+
+    def __contains__(self, market_name):
+        quote, _, traded = market_name.partition("-")
+        return self.matches(quote, traded)
+
+    def entries(self):
+        entries = ["{}-{}".format(quote, WILDCARD) for quote in self.quotes]
+        entries += ["{}-{}".format(WILDCARD, traded) for traded in self.traded]
+        entries += ["{}-{}".format(quote, traded) for quote, traded_coins in self.pairs.items() for traded in traded_coins]
+        return sorted(entries)
+
+    def __len__(self):
+        return len(self.quotes) + len(self.traded) + sum(len(traded_coins) for traded_coins in self.pairs.values())
+
+    def __str__(self):
+        return "[SubscriptionIndex {}]".format(", ".join(self.entries()))
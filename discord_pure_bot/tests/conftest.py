@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the bot imports its modules from discord_pure_bot itself, e.g. "import wall_calculator"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
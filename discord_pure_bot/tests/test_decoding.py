@@ -0,0 +1,28 @@
+import calendar
+
+import pytest
+
+from digicoins import decoding
+
+MIDNIGHT = calendar.timegm((2018, 1, 27, 12, 0, 0))
+
+
+@pytest.mark.parametrize("text,expected", [
+    # bittrex getmarketsummaries, no Z and a varying number of fraction digits
+    ("2018-01-27T12:00:42.542", MIDNIGHT + 42.542),
+    ("2018-01-27T12:00:00.12", MIDNIGHT + 0.12),
+    ("2018-01-27T12:00:00.1234567", MIDNIGHT + 0.123456),
+    ("2014-02-13T00:00:00", calendar.timegm((2014, 2, 13, 0, 0, 0))),
+    # gdax ticker, with Z
+    ("2018-01-27T12:00:00.123000Z", MIDNIGHT + 0.123),
+    ("2018-01-27T12:00:00.906Z", MIDNIGHT + 0.906),
+    ("2018-01-27T12:00:00Z", MIDNIGHT),
+])
+def test_iso_timestamp(text, expected):
+    assert decoding.iso_timestamp(text) == pytest.approx(expected, abs=1e-6)
+
+
+def test_iso_timestamp_rejects_garbage():
+    with pytest.raises(ValueError):
+        decoding.iso_timestamp("yesterday")
+
@@ -0,0 +1,48 @@
+from digicoins.entity import MarketRegistry, registry as shared_registry
+from wall_calculator import WallCommandInterpreter
+
+MALFORMED_SYMBOLS = ["BTC", "BTC-", "-DOGE", "BTC-DOGE-ETH", "BTC-DO GE", "BTC-DOGE!", ""]
+
+
+def test_parse_rejects_malformed_symbols():
+    registry = MarketRegistry()
+    for symbol in MALFORMED_SYMBOLS:
+        assert registry.parse(symbol) is None
+    assert not registry.symbols
+
+
+def test_parse_does_not_intern_user_text():
+    registry = MarketRegistry()
+    for number in range(1000):
+        market = registry.parse("btc-coin{}".format(number))
+        assert market.traded_coin.coin == "COIN{}".format(number)
+    assert not registry.markets
+    assert not registry.coins
+    assert len(registry.symbols) == registry.max_symbols
+
+
+def test_parse_keys_on_normalized_text():
+    registry = MarketRegistry()
+    assert registry.parse("btc-doge") is registry.parse(" BTC-DOGE")
+    assert list(registry.symbols) == ["BTC-DOGE"]
+
+
+def test_parse_returns_interned_markets():
+    registry = MarketRegistry()
+    interned = registry.market("USD", "BTC")
+    assert registry.parse("usd-btc") is interned
+    # catalog markets of an exchange stay equal to the exchange agnostic one
+    assert registry.market("USD", "BTC", "BTC-USD", "GDAX") == registry.parse("USD-BTC")
+
+
+def test_interpreter_leaves_registry_alone():
+    interpreter = WallCommandInterpreter()
+    markets = len(shared_registry.markets)
+    for number in range(100):
+        book_query, _ = interpreter.get_params(["coin{}".format(number)])
+        assert book_query.market.traded_coin.coin == "COIN{}".format(number)
+        book_query, _ = interpreter.get_params(["btc-coin{}".format(number), "gdax"])
+        assert book_query.exchange == "GDAX"
+    assert len(shared_registry.markets) == markets
+    assert interpreter.get_params(["btc"])[0].exchange == "BITFINEX"
+    assert interpreter.get_params(["btcdoge-"])[0].market is None
@@ -0,0 +1,57 @@
+import pytest
+
+from outbox import FENCE, pack_parts, split_message
+
+LIMIT = 100
+
+
+def test_pack_parts_joins_pieces_greedily():
+    pieces = ["a" * 40, "b" * 40, "c" * 40, "d" * 10]
+    assert pack_parts(pieces, LIMIT) == ["a" * 40 + "b" * 40, "c" * 40 + "d" * 10]
+
+
+def test_pack_parts_cuts_pieces_longer_than_room():
+    chunks = pack_parts(["a" * 10, "b" * 250], LIMIT, "<", ">")
+    assert chunks == ["<" + "a" * 10 + ">", "<" + "b" * 98 + ">", "<" + "b" * 98 + ">", "<" + "b" * 54 + ">"]
+
+
+def test_short_message_is_one_part():
+    message = "walls\n" + FENCE + "py\nprint(1)\n" + FENCE + "\n"
+    assert split_message(message, LIMIT) == [message]
+
+
+def test_plain_text_splits_between_lines():
+    lines = ["line {}\n".format(number) for number in range(40)]
+    parts = split_message("".join(lines), LIMIT)
+    assert len(parts) > 1
+    assert all(len(part) <= LIMIT and part.endswith("\n") for part in parts)
+    assert "".join(parts) == "".join(lines)
+
+
+def fenced_contents(parts, opening, closing):
+    for part in parts:
+        assert len(part) <= LIMIT
+        assert part.startswith(opening) and part.endswith(closing)
+    return "".join(part[len(opening):-len(closing)] for part in parts)
+
+
+def test_long_block_reopens_its_fence_in_every_part():
+    body = "".join("{:>8} {:>12}\n".format(number, number * 3.5) for number in range(30))
+    parts = split_message(FENCE + "py\n" + body + FENCE + "\n", LIMIT)
+    assert len(parts) > 1
+    assert fenced_contents(parts, FENCE + "py\n", FENCE + "\n") == body
+
+
+def test_unclosed_block_keeps_its_last_character():
+    body = "".join("row {}\n".format(number) for number in range(30)) + "last"
+    parts = split_message(FENCE + "\n" + body, LIMIT)
+    assert len(parts) > 1
+    assert fenced_contents(parts, FENCE + "\n", FENCE + "\n") == body
+
+
+@pytest.mark.parametrize("after", ["", "\n"])
+def test_single_line_block_is_fenced_in_every_part(after):
+    body = "x" * 250
+    parts = split_message(FENCE + body + FENCE + after, LIMIT)
+    assert len(parts) == 3
+    assert fenced_contents(parts, FENCE, FENCE + "\n") == body
@@ -0,0 +1,68 @@
+from digicoins.digicoinlib import BasePublicClient,GdaxPublicClient
+from digicoins.entity import registry
+from digicoins.queries import OrderBookQuery,PublicClientQueryExecutor,AsyncPublicClientQueryExecutor
+
+MARKET = registry.market("USD", "BTC", "BTC-USD", "Gdax")
+
+
+class CountingClient:
+    """
+    Answers every order book call with the depth it was asked for, book levels are the exchange's
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def get_order_book(self, market, depth):
+        self.calls.append(depth)
+        return ("book", depth)
+
+
+class CountingGdaxClient(CountingClient, GdaxPublicClient):
+    pass
+
+
+class CountingBittrexClient(CountingClient, BasePublicClient):
+    pass
+
+
+class CountingExecutor(PublicClientQueryExecutor):
+    def __create_clients__(self):
+        return {
+            "GDAX": CountingGdaxClient(),
+            "BITTREX": CountingBittrexClient()
+        }
+
+
+def test_deeper_book_answers_shallower_query_of_same_level():
+    executor = CountingExecutor()
+    assert executor.get_order_book(OrderBookQuery("BITTREX", MARKET, 200)) == ("book", 200)
+    assert executor.get_order_book(OrderBookQuery("BITTREX", MARKET, 20)) == ("book", 200)
+    assert executor.get_order_book(OrderBookQuery("GDAX", MARKET, 50)) == ("book", 50)
+    assert executor.get_order_book(OrderBookQuery("GDAX", MARKET, 10)) == ("book", 50)
+    assert executor.clients["BITTREX"].calls == [200]
+    assert executor.clients["GDAX"].calls == [50]
+
+
+def test_gdax_levels_do_not_answer_each_other():
+    executor = CountingExecutor()
+    assert executor.get_order_book(OrderBookQuery("GDAX", MARKET, 200)) == ("book", 200)
+    # a level 3 book does not answer a level 2 query, however deep
+    assert executor.get_order_book(OrderBookQuery("GDAX", MARKET, 50)) == ("book", 50)
+    assert executor.get_order_book(OrderBookQuery("GDAX", MARKET, 100)) == ("book", 200)
+    assert executor.get_order_book(OrderBookQuery("GDAX", MARKET, 30)) == ("book", 50)
+    assert executor.clients["GDAX"].calls == [200, 50]
+
+
+class FixedStream:
+    def order_book(self, market, depth):
+        return ("streamed", depth)
+
+
+def test_gdax_stream_answers_level_2_queries_only():
+    executor = AsyncPublicClientQueryExecutor()
+    executor.streams["GDAX"] = FixedStream()
+    executor.clients["GDAX"].canonical_markets = {MARKET: MARKET}
+    assert executor.__streamed_order_book__(OrderBookQuery("GDAX", MARKET, 50)) == ("streamed", 50)
+    # deeper gdax queries keep the level 3 book of single orders
+    assert executor.__streamed_order_book__(OrderBookQuery("GDAX", MARKET, 51)) is None
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from digicoins.scheduler import ExchangeScheduler, DeadlineExceeded, INTERACTIVE, BACKGROUND
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_zero_burst_fails_at_once():
+    scheduler = ExchangeScheduler("GDAX", 2.0, 0)
+    with pytest.raises(DeadlineExceeded):
+        run(scheduler.acquire(INTERACTIVE, deadline=10.0))
+    assert scheduler.stats()["interactive"]["expired"] == 1
+    assert not scheduler.queue
+
+
+def test_queued_requests_go_by_priority_then_arrival():
+    async def scenario():
+        scheduler = ExchangeScheduler("GDAX", 50.0, 1)
+        await scheduler.acquire(INTERACTIVE)
+        granted = []
+
+        async def request(name, priority):
+            await scheduler.acquire(priority)
+            granted.append(name)
+
+        # queued in this order, gather alone does not start its coroutines in order on python 3.6
+        requests = [asyncio.ensure_future(request("first background", BACKGROUND)),
+                    asyncio.ensure_future(request("interactive", INTERACTIVE)),
+                    asyncio.ensure_future(request("second background", BACKGROUND))]
+        await asyncio.gather(*requests)
+        return scheduler, granted
+
+    scheduler, granted = run(scenario())
+    assert granted == ["interactive", "first background", "second background"]
+    stats = scheduler.stats()
+    assert stats["queued"] == 0
+    assert stats["interactive"]["granted"] == 2
+    assert stats["background"]["granted"] == 2
+    # waits are those of the queued requests, the first interactive one got a token at once
+    assert 0 < stats["background"]["mean_wait"] <= stats["background"]["max_wait"]
+    assert stats["interactive"]["max_wait"] > 0
+
+
+def test_deadline_expires_without_token():
+    async def scenario():
+        scheduler = ExchangeScheduler("BITTREX", 0.5, 1)
+        await scheduler.acquire(BACKGROUND)
+        with pytest.raises(DeadlineExceeded):
+            await scheduler.acquire(INTERACTIVE, deadline=0.05)
+        return scheduler
+
+    scheduler = run(scenario())
+    stats = scheduler.stats()
+    assert stats["interactive"] == {"granted": 0, "expired": 1, "mean_wait": 0.0, "max_wait": 0.0}
+    assert stats["background"]["granted"] == 1
+    # the expired request is no longer counted as waiting
+    assert stats["queued"] == 0
@@ -0,0 +1,149 @@
+"""
+   Book feeds against ReplayFeedServer serving the feeds in fixtures/feeds. Those are synthetic:
+   hand made in the GDAX level2 and Bitfinex v2 book formats, not recorded from the exchanges
+"""
+
+import asyncio
+import json
+import os
+import time
+
+from digicoins.streaming import GdaxBookFeed, BitfinexBookFeed
+from digicoins.streaming_replay import ReplayFeedServer
+
+FEEDS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "feeds")
+
+
+def read_feed(name):
+    with open(os.path.join(FEEDS, name), encoding="utf8") as file:
+        return [line.rstrip("\n") for line in file if line.strip()]
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+async def replay(feed, server, done, timeout=5.0):
+    """
+    Runs feed against server until done() holds
+
+    :return: (synced, ask levels, bid levels) of every book then, stopping the feed desyncs them
+    """
+    await server.start()
+    feed.url = server.url
+    task = asyncio.ensure_future(feed.run(retry_delay=0.01))
+    try:
+        deadline = time.monotonic() + timeout
+        while not done():
+            assert time.monotonic() < deadline, "feed did not get there in {} seconds".format(timeout)
+            await asyncio.sleep(0.01)
+        return {name: (book.synced, book.levels("asks"), book.levels("bids")) for name, book in feed.books.items()}
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await feed.session.close()
+        await server.stop()
+
+
+def gdax_book(messages):
+    """
+    {side: {price: size}} after messages, applied without L2Book
+    """
+    sizes = {"asks": {}, "bids": {}}
+    for message in map(json.loads, messages):
+        if message["type"] == "snapshot":
+            for side in ("asks", "bids"):
+                sizes[side] = {float(price): float(size) for price, size in message[side]}
+        elif message["type"] == "l2update":
+            for side, price, size in message["changes"]:
+                levels = sizes["bids" if side == "buy" else "asks"]
+                levels[float(price)] = float(size)
+                if float(size) == 0:
+                    del levels[float(price)]
+    return sizes
+
+
+def bitfinex_book(messages):
+    sizes = {"asks": {}, "bids": {}}
+    for message in map(json.loads, messages):
+        if not isinstance(message, list) or message[1] == "hb":
+            continue
+        if isinstance(message[1][0], list):
+            sizes = {"asks": {}, "bids": {}}
+            entries = message[1]
+        else:
+            entries = [message[1]]
+        for price, count, amount in entries:
+            levels = sizes["bids" if amount > 0 else "asks"]
+            if count > 0:
+                levels[price] = abs(amount)
+            else:
+                levels.pop(price, None)
+    return sizes
+
+
+def assert_book(book, expected):
+    synced, asks, bids = book
+    assert synced
+    assert asks == sorted(expected["asks"].items())
+    assert bids == sorted(expected["bids"].items(), reverse=True)
+
+
+def test_gdax_feed_syncs_from_replay():
+    messages = read_feed("gdax_level2.jsonl")
+    server = ReplayFeedServer(messages)
+    feed = GdaxBookFeed(["BTC-USD"], url=None)
+    books = run(replay(feed, server, lambda: feed.messages == len(messages)))
+
+    assert_book(books["BTC-USD"], gdax_book(messages))
+    assert feed.gaps == 0
+    assert server.connections == 1
+    subscription = json.loads(server.received[0])
+    assert subscription["product_ids"] == ["BTC-USD"]
+    assert subscription["channels"] == ["level2", "heartbeat"]
+
+
+def test_gdax_feed_resubscribes_after_update_before_snapshot():
+    messages = read_feed("gdax_level2.jsonl")
+    snapshot = next(index for index, message in enumerate(messages) if '"snapshot"' in message)
+    # an update arriving before the snapshot means updates went missing
+    gapped = messages[:snapshot] + messages[snapshot + 1:snapshot + 2] + messages[snapshot:]
+    server = ReplayFeedServer(gapped, reconnect_messages=messages)
+    feed = GdaxBookFeed(["BTC-USD"], url=None)
+    books = run(replay(feed, server, lambda: server.connections == 2 and feed.messages == snapshot + 1 + len(messages)))
+
+    assert feed.gaps == 1
+    assert len(server.received) == 2
+    assert server.received[0] == server.received[1]
+    assert_book(books["BTC-USD"], gdax_book(messages))
+
+
+def test_bitfinex_feed_syncs_from_replay():
+    messages = read_feed("bitfinex_book.jsonl")
+    server = ReplayFeedServer(messages, subscriptions=2)
+    feed = BitfinexBookFeed(["btcusd"], url=None)
+    books = run(replay(feed, server, lambda: feed.messages == len(messages)))
+
+    assert_book(books["btcusd"], bitfinex_book(messages))
+    assert feed.gaps == 0
+    assert json.loads(server.received[0]) == {"event": "conf", "flags": BitfinexBookFeed.SEQ_ALL}
+    assert json.loads(server.received[1])["symbol"] == "tBTCUSD"
+
+
+def test_bitfinex_feed_resubscribes_after_sequence_gap():
+    messages = read_feed("bitfinex_book.jsonl")
+    # drop one update, the sequence number after it skips
+    dropped = next(index for index, message in enumerate(messages) if message.endswith(", 5]"))
+    gapped = messages[:dropped] + messages[dropped + 1:]
+    server = ReplayFeedServer(gapped, subscriptions=2, reconnect_messages=messages)
+    feed = BitfinexBookFeed(["btcusd"], url=None)
+    books = run(replay(feed, server, lambda: server.connections == 2 and feed.messages == dropped + 1 + len(messages)))
+
+    assert feed.gaps == 1
+    assert feed.resyncs == 1
+    assert server.received[:2] == server.received[2:]
+    assert_book(books["btcusd"], bitfinex_book(messages))
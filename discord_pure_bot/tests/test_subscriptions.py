@@ -0,0 +1,9 @@
+from subscriptions import SubscriptionIndex
+
+
+def test_from_entries_skips_invalid_entries(capsys):
+    subscriptions = SubscriptionIndex.from_entries(["btc-*", "BTC", "*-*", None, "usdt-eth", "BTC-LTC-ETH"])
+    assert subscriptions.entries() == ["BTC-*", "USD-ETH"]
+    skipped = capsys.readouterr().out.splitlines()
+    assert len(skipped) == 4
+    assert all("is not a market like BTC-LTC" in line for line in skipped)
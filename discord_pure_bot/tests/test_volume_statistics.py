@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from volume_statistics import RollingWindow, edit_timeframes
+
+
+def test_reset_row_starts_over_like_a_new_market():
+    generator = np.random.RandomState(3)
+    window = RollingWindow(5)
+    for tick in range(1, 21):
+        window.update(tick, generator.uniform(100, 200, 2))
+    window.reset([0])
+    fresh = RollingWindow(5)
+    for tick in range(21, 41):
+        volumes = generator.uniform(1000, 2000, 2)
+        window.update(tick, volumes)
+        fresh.update(tick, np.array([volumes[0], np.nan]))
+        assert window.valid[0] == fresh.valid[0]
+        for name in ("rise", "breakout", "z"):
+            assert window.statistic(name)[0][0] == pytest.approx(fresh.statistic(name)[0][0], nan_ok=True)
+    assert window.means[0] == pytest.approx(fresh.means[0])
+    assert window.variances[0] == pytest.approx(fresh.variances[0])
+
+
+@pytest.mark.parametrize("arguments,expected", [
+    (["5", "0.1"], {5: {"rise": 0.5, "change": 0.1}, 60: {"change": 0.2, "z": 3.0}}),
+    (["60", "4", "z"], {5: {"rise": 0.5}, 60: {"change": 0.2, "z": 4.0}}),
+    (["60", "z"], {5: {"rise": 0.5}, 60: {"change": 0.2}}),
+    (["60"], {5: {"rise": 0.5}}),
+    (["15", "0.3", "breakout"], {5: {"rise": 0.5}, 15: {"breakout": 0.3}, 60: {"change": 0.2, "z": 3.0}}),
+])
+def test_edit_timeframes(arguments, expected):
+    timeframes = {5: {"rise": 0.5}, 60: {"change": 0.2, "z": 3.0}}
+    edit_timeframes(timeframes, arguments)
+    assert timeframes == expected
+
+
+@pytest.mark.parametrize("arguments,message", [
+    (["5", "3", "foo"], "foo is not a statistic"),
+    (["5", "z", "3"], "z is not a threshold"),
+    (["5", "foo"], "foo is not a threshold"),
+    (["5", "nan"], "nan is not a threshold"),
+    (["foo", "3"], "foo is not a number of minutes"),
+    ([""], " is not a number of minutes"),
+    (["5", "3", "z", "1"], "too many arguments"),
+])
+def test_edit_timeframes_rejects_malformed_arguments(arguments, message):
+    timeframes = {5: {"rise": 0.5}}
+    with pytest.raises(ValueError, match=message):
+        edit_timeframes(timeframes, arguments)
+    assert timeframes == {5: {"rise": 0.5}}
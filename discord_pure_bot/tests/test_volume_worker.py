@@ -0,0 +1,28 @@
+import pytest
+
+from volume_worker import split_rate_limits
+
+RATE_LIMITS = {"GDAX": (3.0, 6), "BITFINEX": (1.0, 10), "BITTREX": (1.0, 5)}
+
+
+@pytest.mark.parametrize("worker_share", [0.25, 0.5, 0.75])
+def test_split_rate_limits_stays_within_quota(worker_share):
+    bot, worker = split_rate_limits(RATE_LIMITS, worker_share)
+    for exchange, (rate, burst) in RATE_LIMITS.items():
+        assert bot[exchange][0] + worker[exchange][0] == pytest.approx(rate)
+        assert bot[exchange][1] + worker[exchange][1] <= burst
+        assert bot[exchange][1] >= 1 and worker[exchange][1] >= 1
+        assert bot[exchange][0] > 0 and worker[exchange][0] > 0
+
+
+def test_split_rate_limits_gives_unsplittable_burst_to_worker():
+    bot, worker = split_rate_limits({"GDAX": (3.0, 1), "BITTREX": (1.0, 2)}, 0.25)
+    assert worker["GDAX"] == (0.75, 1)
+    assert bot["GDAX"] == (2.25, 0)
+    assert bot["BITTREX"][1] == 1 and worker["BITTREX"][1] == 1
+
+
+@pytest.mark.parametrize("worker_share", [0, 1, -0.5, 1.5])
+def test_split_rate_limits_rejects_shares_outside_0_1(worker_share):
+    with pytest.raises(ValueError):
+        split_rate_limits(RATE_LIMITS, worker_share)
@@ -0,0 +1,90 @@
+import asyncio
+
+from digicoins.entity import registry, ColumnarOrderBook, Ticker
+from digicoins.queries import OrderBookQuery, TickerQuery
+from digicoins.scheduler import ExchangeScheduler, INTERACTIVE
+from wall_calculator import WallCalculator, AsyncWallCalculator
+
+MARKET = registry.market("USD", "BTC", "btcusd", "Bitfinex")
+ASKS = [(6701.0, 2.0), (6702.0, 30.0), (6703.0, 1.0)]
+BIDS = [(6700.0, 1.5), (6699.0, 3.0), (6698.0, 25.0)]
+# bitfinex books carry the timestamp of their best bid order only
+BEST_BID_TIMESTAMP = 1517054400.0
+
+
+def book(asks, bids):
+    return ColumnarOrderBook.from_levels(MARKET, asks, bids, timestamp=BEST_BID_TIMESTAMP)
+
+
+def test_changed_book_with_same_timestamp_renders_a_new_report():
+    calculator = WallCalculator(publicClientQueryExecutor=object())
+    ticker = Ticker(MARKET, 6701.0, 6700.0, 6700.5, timestamp=BEST_BID_TIMESTAMP)
+    first = calculator.render(book(ASKS, BIDS), ticker)
+
+    changed_asks = [(6701.0, 2.0), (6702.0, 1.0), (6703.0, 45.0)]
+    changed = calculator.render(book(changed_asks, BIDS), ticker)
+    assert changed != first
+    assert changed == calculator.calculate_walls_model(book(changed_asks, BIDS), ticker).view()
+
+
+def test_unchanged_book_and_ticker_reuse_the_report():
+    calculator = WallCalculator(publicClientQueryExecutor=object())
+    first = calculator.render(book(ASKS, BIDS), Ticker(MARKET, 6701.0, 6700.0, 6700.5, timestamp=1.0))
+    again = calculator.render(book(ASKS, BIDS), Ticker(MARKET, 6701.0, 6700.0, 6700.5, timestamp=2.0))
+    assert again is first
+    assert calculator.report_cache.hits == 1
+
+    moved_ticker = calculator.render(book(ASKS, BIDS), Ticker(MARKET, 6701.0, 6700.0, 6900.0, timestamp=2.0))
+    assert moved_ticker != first
+
+
+def test_consolidate_merges_books_and_skips_failed_exchanges():
+    calculator = WallCalculator(publicClientQueryExecutor=object())
+    # the rendered model is not what is checked here, only what consolidate hands to render
+    calculator.render = lambda order_book, ticker: (order_book, ticker)
+    markets = [registry.market("USD", "BTC", market_name, exchange_name)
+               for market_name, exchange_name in (("btcusd", "Bitfinex"), ("BTC-USD", "Gdax"), ("USDT-BTC", "Bittrex"))]
+    reports = [
+        (ColumnarOrderBook.from_levels(markets[0], [(6701.0, 1.0), (6703.0, 2.0)], [(6699.0, 1.0)]),
+         Ticker(markets[0], 6701.0, 6699.0, 6700.0)),
+        (ColumnarOrderBook.from_levels(markets[1], [(6702.0, 4.0), (6703.0, 3.0)], [(6700.0, 2.0), (6699.0, 0.5)]),
+         Ticker(markets[1], 6702.0, 6700.0, 6750.0)),
+        # an exchange that gave no book
+        (None, Ticker(markets[2], 6690.0, 6720.0, 1.0)),
+        (ColumnarOrderBook.from_levels(markets[2], [(6704.0, 1.0)], [(6698.0, 5.0)]),
+         Ticker(markets[2], 6704.0, 6698.0, 6690.0)),
+    ]
+    order_book, ticker = calculator.consolidate(MARKET, reports)
+
+    assert order_book.market.exchange_name == "Bitfinex + Gdax + Bittrex"
+    assert ticker.market is order_book.market
+    # the median last, not the mean, so one exchange far off does not move it
+    assert (ticker.ask, ticker.bid, ticker.last) == (6701.0, 6700.0, 6700.0)
+    # best price first, quantities of equal prices summed
+    assert order_book.rates["asks"].tolist() == [6701.0, 6702.0, 6703.0, 6704.0]
+    assert order_book.quantities["asks"].tolist() == [1.0, 4.0, 5.0, 1.0]
+    assert order_book.rates["bids"].tolist() == [6700.0, 6699.0, 6698.0]
+    assert order_book.quantities["bids"].tolist() == [2.0, 1.5, 5.0]
+
+
+def test_consolidate_without_any_book_gives_no_report():
+    calculator = WallCalculator(publicClientQueryExecutor=object())
+    assert calculator.consolidate(MARKET, [(None, None), (book(ASKS, BIDS), None)]) is None
+
+
+def test_report_answers_busy_when_no_request_slot_in_time():
+    calculator = AsyncWallCalculator()
+    executor = calculator.publicClientQueryExecutor
+    executor.presets["deadlines"][INTERACTIVE] = 0.05
+    # the only token is taken and the next one is far away
+    executor.schedulers["BITFINEX"] = ExchangeScheduler("BITFINEX", 0.01, 1)
+    executor.schedulers["BITFINEX"].bucket.tokens = 0
+    executor.clients["BITFINEX"].canonical_markets = {MARKET: MARKET}
+
+    loop = asyncio.new_event_loop()
+    try:
+        answer = loop.run_until_complete(calculator.report(OrderBookQuery("BITFINEX", MARKET, 50), TickerQuery("BITFINEX", MARKET)))
+    finally:
+        loop.close()
+    assert answer == "BITFINEX is busy, try again in a moment"
+    assert executor.schedulers["BITFINEX"].stats()["interactive"]["expired"] >= 1
@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from digicoins.entity import registry, OrderBookEntry, ColumnarOrderBook
+from wall_engine import WallEngine
+
+MARKET = registry.market("BTC", "BENCH", "BTC-BENCH", "Bench")
+WALL_MAX_COUNT = 10
+
+
+def build_levels(depth, generator, quantity):
+    asks = [(1.0 + i * 0.0001, quantity(generator)) for i in range(depth)]
+    bids = [(1.0 - i * 0.0001, quantity(generator)) for i in range(depth)]
+    return asks, bids
+
+
+def entry_sort(asks, bids):
+    """
+    Selection as done before the wall engine: entry objects, full stable sort of bids then asks
+    """
+    ask_entries = [OrderBookEntry(MARKET, "asks", quantity, rate) for rate, quantity in asks]
+    bid_entries = [OrderBookEntry(MARKET, "bids", quantity, rate) for rate, quantity in bids]
+    bid_grand_volume = sum(bid.traded_quantity for bid in bid_entries)
+    ask_grand_volume = sum(ask.traded_quantity for ask in ask_entries)
+    largest = sorted(bid_entries + ask_entries, key=lambda entry: entry.traded_quantity, reverse=True)[:WALL_MAX_COUNT]
+    return bid_grand_volume, ask_grand_volume, [(entry.side, entry.rate, entry.traded_quantity) for entry in largest]
+
+
+QUANTITIES = {
+    "spread": lambda generator: generator.expovariate(1.0),
+    # few distinct quantities, ties across sides and at the selection threshold
+    "ties": lambda generator: generator.choice([0.5, 1.0, 1.0, 2.0, 7.0]),
+}
+
+
+@pytest.mark.parametrize("kind", sorted(QUANTITIES))
+@pytest.mark.parametrize("depth", [0, 3, 50, 100, 500, 5000])
+def test_wall_engine_selects_like_entry_sort(depth, kind):
+    generator = random.Random(depth)
+    asks, bids = build_levels(depth, generator, QUANTITIES[kind])
+    order_book = ColumnarOrderBook.from_levels(MARKET, asks, bids)
+
+    bid_grand_volume, ask_grand_volume, largest = WallEngine(WALL_MAX_COUNT).select(order_book)
+    entries = [order_book.entry(side, index) for side, index in largest]
+
+    expected_bids, expected_asks, expected_largest = entry_sort(asks, bids)
+    assert bid_grand_volume == pytest.approx(expected_bids)
+    assert ask_grand_volume == pytest.approx(expected_asks)
+    assert [(entry.side, entry.rate, entry.traded_quantity) for entry in entries] == expected_largest
@@ -0,0 +1,115 @@
+import bisect
+import random
+
+import pytest
+
+from digicoins.entity import registry, ColumnarOrderBook, Ticker
+from wall_calculator import WallCalculator
+from digicoins.sortedlist import SortedKeyList
+from wall_tracker import WallTracker
+
+MARKET = registry.market("USD", "BTC", "BTC-USD", "Gdax")
+# enough levels for the price lists to split into several sublists
+PRICE_LEVELS = 400
+
+
+@pytest.mark.parametrize("load", [1, 2, 4, 128])
+def test_sorted_key_list_matches_sorted_list(load):
+    generator = random.Random(load)
+    keys = SortedKeyList(load=load)
+    expected = []
+    for step in range(2000):
+        key = generator.randrange(300)
+        if key in expected:
+            keys.remove(key)
+            expected.remove(key)
+        else:
+            keys.add(key)
+            expected.append(key)
+            expected.sort()
+        assert len(keys) == len(expected)
+        if step % 97 == 0:
+            probe = generator.randrange(300)
+            assert keys.bisect_left(probe) == bisect.bisect_left(expected, probe)
+            if expected:
+                position = generator.randrange(len(expected))
+                assert keys[position] == expected[position]
+    assert list(keys) == expected
+    assert keys.first(25) == expected[:25]
+    assert [keys[position] for position in range(len(expected))] == expected
+    for key in range(300):
+        assert keys.bisect_left(key) == sum(1 for other in expected if other < key)
+    with pytest.raises(IndexError):
+        keys[len(expected)]
+
+
+def test_sorted_key_list_from_sorted_keeps_positions():
+    expected = list(range(0, 2000, 3))
+    keys = SortedKeyList.from_sorted(expected, load=8)
+    assert [keys[position] for position in range(len(expected))] == expected
+    keys.add(4)
+    keys.remove(0)
+    expected = sorted(expected[1:] + [4])
+    assert [keys[position] for position in range(len(expected))] == expected
+    assert keys.bisect_left(1000) == bisect.bisect_left(expected, 1000)
+
+
+def random_level(generator, side):
+    offset = generator.randrange(PRICE_LEVELS) / 10
+    price = round(6700 + offset if side == "asks" else 6699.9 - offset, 1)
+    # a few big levels among small ones, with repeated quantities to exercise the tie breaks
+    quantity = generator.choice([0, 0, 0.5, 1, 1, 2, 3, 25, 40] + [400] * (generator.random() < 0.02))
+    return price, quantity
+
+
+def reference_model(calculator, sizes, depth, ticker):
+    asks = sorted(sizes["asks"].items())
+    bids = sorted(sizes["bids"].items(), reverse=True)
+    book = ColumnarOrderBook.from_levels(MARKET, asks, bids)
+    if depth is not None:
+        book = book.cut(depth)
+    return calculator.calculate_walls_model(book, ticker)
+
+
+def assert_same_model(model, expected):
+    """
+    :return: whether the models have walls
+    """
+    assert model.bid_grand_volume == pytest.approx(expected.bid_grand_volume)
+    assert model.ask_grand_volume == pytest.approx(expected.ask_grand_volume)
+    assert model.resistance == pytest.approx(expected.resistance)
+    walls = [(wall.orderBookEntry.side, wall.orderBookEntry.rate, wall.orderBookEntry.traded_quantity) for wall in model.walls]
+    assert walls == [(wall.orderBookEntry.side, wall.orderBookEntry.rate, wall.orderBookEntry.traded_quantity) for wall in expected.walls]
+    assert [wall.size for wall in model.walls] == pytest.approx([wall.size for wall in expected.walls])
+    return len(model.walls) > 0
+
+
+@pytest.mark.parametrize("depth", [None, 10, 50])
+def test_tracker_matches_calculate_walls_model_on_random_stream(depth):
+    generator = random.Random(depth or 0)
+    calculator = WallCalculator(publicClientQueryExecutor=object())
+    ticker = Ticker(MARKET, 6700.0, 6699.9, 6700.0)
+
+    sizes = {"asks": {}, "bids": {}}
+    for side in sizes:
+        for _ in range(PRICE_LEVELS):
+            price, quantity = random_level(generator, side)
+            if quantity > 0:
+                sizes[side][price] = quantity
+    tracker = WallTracker(MARKET, calculator.presets, depth)
+    tracker.reset(list(sizes["asks"].items()), list(sizes["bids"].items()))
+    walled = assert_same_model(tracker.model(ticker), reference_model(calculator, sizes, depth, ticker))
+
+    for step in range(3000):
+        side = generator.choice(("asks", "bids"))
+        price, quantity = random_level(generator, side)
+        tracker.update(side, price, quantity)
+        if quantity > 0:
+            sizes[side][price] = quantity
+        else:
+            sizes[side].pop(price, None)
+        if step % 50 == 0:
+            walled += assert_same_model(tracker.model(ticker), reference_model(calculator, sizes, depth, ticker))
+    assert_same_model(tracker.model(ticker), reference_model(calculator, sizes, depth, ticker))
+    # the comparison is only worth something when there are walls to compare
+    assert walled > 10
@@ -0,0 +1,404 @@
+import os
+import time
+
+import numpy as np
+
+from volume_statistics import VolumeStatistics,AlertCooldowns,alert_rules
+
+
+class VolumeSeries:
+    """
+    View on one market row of a VolumeHistory, newest sample is ago(0)
+    """
+
+    __slots__ = ("history", "row")
+
+    def __init__(self, history, row):
+        self.history = history
+        self.row = row
+
+    def ago(self, samples):
+        if samples < 0 or samples >= len(self):
+            raise IndexError("no sample {} ticks ago, series holds {}".format(samples, len(self)))
+        return float(self.history.volumes[self.row, (self.history.head - samples) % self.history.capacity])
+
+    def latest(self):
+        return self.ago(0)
+
+    def clear(self):
+        self.history.sizes[self.row] = 0
+
+    def __len__(self):
+        return int(self.history.sizes[self.row])
+
+    def __str__(self):
+        return "[VolumeSeries {}/{}]".format(len(self), self.history.capacity)
+
+
+class VolumeHistory:
+    """
+    Volumes of all markets as one markets x time matrix of doubles, used as a ring
+    buffer along the time axis: every tick writes one column for every market
+    """
+
+    def __init__(self, capacity=1441, market_filter=None):
+        # one day of minute ticks plus the sample the oldest change is measured against
+        self.capacity = capacity
+        self.market_filter = market_filter
+        self.rows = {}
+        self.names = []
+        self.volumes = np.zeros((0, capacity), dtype=np.float64)
+        self.sizes = np.zeros(0, dtype=np.int64)
+        self.scanned = np.zeros(0, dtype=bool)
+        self.head = -1
+
+    def __add_row__(self, market_name):
+        row = len(self.names)
+        if row == self.volumes.shape[0]:
+            self.__grow__(max(16, 2 * row))
+        self.volumes[row] = 0.0
+        self.sizes[row] = 0
+        self.scanned[row] = self.market_filter is None or self.market_filter(market_name)
+        self.rows[market_name] = row
+        self.names.append(market_name)
+        return row
+
+    def __grow__(self, slots):
+        self.volumes = np.resize(self.volumes, (slots, self.capacity))
+        self.sizes = np.resize(self.sizes, slots)
+        self.scanned = np.resize(self.scanned, slots)
+
+    def record(self, volumes):
+        """
+        Appends one tick, markets missing from volumes repeat their last sample
+        """
+        names = list(volumes)
+        self.record_columns(names, np.fromiter(volumes.values(), dtype=np.float64, count=len(names)))
+
+    def record_columns(self, names, volumes):
+        """
+        Appends one tick from market names and their float64 volumes, NaN volumes count as missing
+        """
+        present = ~np.isnan(volumes)
+        rows = np.fromiter((self.rows[name] if name in self.rows else self.__add_row__(name) for name in names),
+                           dtype=np.int64, count=len(names))[present]
+
+        count = len(self.names)
+        previous = self.head
+        self.head = (self.head + 1) % self.capacity
+        if previous >= 0:
+            self.volumes[:count, self.head] = self.volumes[:count, previous]
+        self.volumes[rows, self.head] = volumes[present]
+
+        if previous >= 0:
+            # rows that never had a sample stay empty
+            self.sizes[:count] = np.minimum(self.sizes[:count] + (self.sizes[:count] > 0), self.capacity)
+        self.sizes[rows] = np.maximum(self.sizes[rows], 1)
+
+    def repeat_last(self):
+        if self.head >= 0:
+            self.record({})
+
+    def set_market_filter(self, market_filter):
+        """
+        Scans the markets market_filter accepts from now on
+
+        :return: rows scanned now that were not before, their samples are dropped since
+                 nothing polled them for a while
+        """
+        count = len(self.names)
+        scanned = np.fromiter((market_filter is None or market_filter(name) for name in self.names), dtype=bool, count=count)
+        added = np.nonzero(scanned & ~self.scanned[:count])[0]
+        self.market_filter = market_filter
+        self.scanned[:count] = scanned
+        self.sizes[added] = 0
+        return added
+
+    def changes(self, frames, rows=None):
+        """
+        Relative change of markets over every frame
+
+        :param frames: int64 array of time frames in ticks
+        :param rows: rows of the markets, all of them by default
+        :return: (markets x frames changes, markets x frames flags of the changes that can be measured)
+        """
+        if rows is None:
+            rows = np.arange(len(self.names))
+        new = self.volumes[rows, self.head]
+        old = self.volumes[rows[:, None], (self.head - frames)[None, :] % self.capacity]
+        valid = (self.sizes[rows, None] > frames[None, :]) & (old > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            changes = (new[:, None] - old) / old
+        return changes, valid
+
+    def scan(self, timeframes):
+        """
+        Percent changes over every time frame for all scanned markets in one pass
+
+        :param timeframes: time frame in ticks -> minimal relative change
+        :return: list of (market name, time frame, relative change), grouped by market
+        """
+        count = len(self.names)
+        if count == 0 or len(timeframes) == 0:
+            return []
+
+        frames = np.fromiter(timeframes.keys(), dtype=np.int64, count=len(timeframes))
+        thresholds = np.fromiter(timeframes.values(), dtype=np.float64, count=len(timeframes))
+
+        changes, valid = self.changes(frames)
+        rows, columns = np.nonzero(valid & self.scanned[:count, None] & (changes >= thresholds[None, :]))
+
+        return [(self.names[row], int(frames[column]), float(changes[row, column])) for row, column in zip(rows, columns)]
+
+    def __getitem__(self, market_name):
+        return VolumeSeries(self, self.rows[market_name])
+
+    def __contains__(self, market_name):
+        return market_name in self.rows
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+
+class PersistentVolumeHistory(VolumeHistory):
+    """
+    VolumeHistory kept in a memory mapped file so it survives restarts.
+
+    File layout: header (magic, capacity, slots, count, head, last tick time),
+    market name index of fixed size slots, per slot sample counts, then the
+    slots x capacity volume matrix
+    """
+
+    MAGIC = 0x564f4c48
+    HEADER_FIELDS = 8
+    NAME_SIZE = 64
+
+    MAGIC_FIELD, CAPACITY_FIELD, SLOTS_FIELD, COUNT_FIELD, HEAD_FIELD, TICK_TIME_FIELD = range(6)
+
+    def __init__(self, path, capacity=1441, market_filter=None, slots=512, max_gap=300.0):
+        super().__init__(capacity, market_filter)
+        self.path = path
+        if os.path.exists(path) and self.__compatible__(path):
+            self.__map__(path, mode="r+")
+            self.__restore__(max_gap)
+        else:
+            self.__create__(path, slots)
+
+    @staticmethod
+    def __header_size__():
+        return PersistentVolumeHistory.HEADER_FIELDS * 8
+
+    def __compatible__(self, path):
+        header = np.fromfile(path, dtype=np.float64, count=PersistentVolumeHistory.HEADER_FIELDS)
+        return len(header) == PersistentVolumeHistory.HEADER_FIELDS and \
+            int(header[PersistentVolumeHistory.MAGIC_FIELD]) == PersistentVolumeHistory.MAGIC and \
+            int(header[PersistentVolumeHistory.CAPACITY_FIELD]) == self.capacity
+
+    def __create__(self, path, slots):
+        offset = PersistentVolumeHistory.__header_size__()
+        size = offset + slots * (PersistentVolumeHistory.NAME_SIZE + 8 + 8 * self.capacity)
+        with open(path, "wb") as file:
+            file.truncate(size)
+
+        header = np.memmap(path, dtype=np.float64, mode="r+", shape=(PersistentVolumeHistory.HEADER_FIELDS,))
+        header[PersistentVolumeHistory.MAGIC_FIELD] = PersistentVolumeHistory.MAGIC
+        header[PersistentVolumeHistory.CAPACITY_FIELD] = self.capacity
+        header[PersistentVolumeHistory.SLOTS_FIELD] = slots
+        header[PersistentVolumeHistory.HEAD_FIELD] = -1
+        header.flush()
+        del header
+
+        self.__map__(path, mode="r+")
+
+    def __map__(self, path, mode):
+        self.header = np.memmap(path, dtype=np.float64, mode=mode, shape=(PersistentVolumeHistory.HEADER_FIELDS,))
+        slots = int(self.header[PersistentVolumeHistory.SLOTS_FIELD])
+
+        offset = PersistentVolumeHistory.__header_size__()
+        self.index = np.memmap(path, dtype="S{}".format(PersistentVolumeHistory.NAME_SIZE), mode=mode, offset=offset, shape=(slots,))
+        offset += slots * PersistentVolumeHistory.NAME_SIZE
+        self.sizes = np.memmap(path, dtype=np.int64, mode=mode, offset=offset, shape=(slots,))
+        offset += slots * 8
+        self.volumes = np.memmap(path, dtype=np.float64, mode=mode, offset=offset, shape=(slots, self.capacity))
+
+        self.scanned = np.resize(self.scanned, slots)
+
+    def __restore__(self, max_gap):
+        count = int(self.header[PersistentVolumeHistory.COUNT_FIELD])
+        self.head = int(self.header[PersistentVolumeHistory.HEAD_FIELD])
+        for row in range(count):
+            market_name = self.index[row].decode("utf8")
+            self.rows[market_name] = row
+            self.names.append(market_name)
+            self.scanned[row] = self.market_filter is None or self.market_filter(market_name)
+
+        # samples are ticks, after a long outage "n ticks ago" would no longer mean n minutes ago
+        if time.time() - self.header[PersistentVolumeHistory.TICK_TIME_FIELD] > max_gap:
+            self.sizes[:count] = 0
+
+    def __grow__(self, slots):
+        self.flush()
+        grown_path = self.path + ".grow"
+        if os.path.exists(grown_path):
+            os.remove(grown_path)
+        grown = PersistentVolumeHistory(grown_path, self.capacity, self.market_filter, slots)
+        count = len(self.names)
+        grown.index[:count] = self.index[:count]
+        grown.sizes[:count] = self.sizes[:count]
+        grown.volumes[:count] = self.volumes[:count]
+        grown.header[PersistentVolumeHistory.COUNT_FIELD] = count
+        grown.header[PersistentVolumeHistory.HEAD_FIELD] = self.head
+        grown.header[PersistentVolumeHistory.TICK_TIME_FIELD] = self.header[PersistentVolumeHistory.TICK_TIME_FIELD]
+        grown.flush()
+        del grown
+
+        del self.header, self.index, self.sizes, self.volumes
+        os.replace(grown_path, self.path)
+        self.__map__(self.path, mode="r+")
+
+    def __add_row__(self, market_name):
+        row = super().__add_row__(market_name)
+        self.index[row] = market_name.encode("utf8")[:PersistentVolumeHistory.NAME_SIZE]
+        self.header[PersistentVolumeHistory.COUNT_FIELD] = len(self.names)
+        return row
+
+    def record_columns(self, names, volumes):
+        super().record_columns(names, volumes)
+        self.header[PersistentVolumeHistory.HEAD_FIELD] = self.head
+        self.header[PersistentVolumeHistory.TICK_TIME_FIELD] = time.time()
+        self.flush()
+
+    def flush(self):
+        self.volumes.flush()
+        self.sizes.flush()
+        self.index.flush()
+        self.header.flush()
+
+
+def exchange_history_path(path, exchange):
+    """
+    volume_history.bin -> volume_history.bittrex.bin
+    """
+    root, extension = os.path.splitext(path)
+    return "{}.{}{}".format(root, exchange.lower(), extension)
+
+
+class MarketVolumeStore:
+    """
+    Volume histories of several exchanges, one VolumeHistory each so every exchange
+    ticks at the cadence of its own poller and a failed poll only repeats its own samples.
+    Rows are exchange agnostic market names, so a market lines up across exchanges.
+    Every history has its rolling statistics and alert cooldowns next to it
+    """
+
+    def __init__(self, histories, intervals):
+        """
+        :param histories: VolumeHistory by exchange
+        :param intervals: seconds between two ticks of an exchange
+        """
+        self.histories = histories
+        self.intervals = intervals
+        self.statistics = {exchange: VolumeStatistics(history) for exchange, history in histories.items()}
+        self.cooldowns = {exchange: AlertCooldowns() for exchange in histories}
+
+    @staticmethod
+    def capacity(interval, minutes=1440):
+        # the longest time frame in ticks plus the sample its change is measured against
+        return int(round(minutes * 60 / interval)) + 1
+
+    @staticmethod
+    def persistent(path, intervals, market_filter=None):
+        histories = {
+            exchange: PersistentVolumeHistory(exchange_history_path(path, exchange), MarketVolumeStore.capacity(interval),
+                                              market_filter, max_gap=5 * interval)
+            for exchange, interval in intervals.items()
+        }
+        return MarketVolumeStore(histories, intervals)
+
+    def set_market_filter(self, market_filter):
+        for exchange, history in self.histories.items():
+            self.statistics[exchange].reset(history.set_market_filter(market_filter))
+
+    def record(self, exchange, names, volumes):
+        self.histories[exchange].record_columns(names, volumes)
+        self.statistics[exchange].update(names, volumes)
+
+    def repeat_last(self, exchange):
+        self.histories[exchange].repeat_last()
+        self.statistics[exchange].skip()
+
+    def ticks(self, exchange, minutes):
+        return max(1, int(round(minutes * 60 / self.intervals[exchange])))
+
+    def breaches(self, exchange, timeframes):
+        """
+        Markets over the thresholds of their time frames at the latest tick, alerted or not
+
+        :param timeframes: time frame in minutes -> minimal change or {statistic: minimal value}
+        :return: list of (market name, time frame in minutes, relative change), grouped by market
+        """
+        history = self.histories[exchange]
+        count = len(history.names)
+        rules = {}
+        for minutes, rule in sorted(alert_rules(timeframes).items()):
+            # frames less than a tick apart share the shortest one's rule
+            rules.setdefault(self.ticks(exchange, minutes), (minutes, rule))
+        statistics = self.statistics[exchange]
+        statistics.set_windows(rules)
+        if count == 0 or not rules:
+            return []
+
+        # only subscribed markets are evaluated
+        scanned = np.nonzero(history.scanned[:count])[0]
+        frames = np.fromiter(rules, dtype=np.int64, count=len(rules))
+        changes, valid = history.changes(frames, scanned)
+        breached = np.ones((len(scanned), len(rules)), dtype=bool)
+        for column, (ticks, (minutes, rule)) in enumerate(rules.items()):
+            window = statistics.windows[ticks]
+            for statistic, threshold in rule.items():
+                if statistic == "change":
+                    values, usable = changes[:, column], valid[:, column]
+                else:
+                    values, usable = window.statistic(statistic)
+                    values, usable = values[scanned], usable[scanned]
+                with np.errstate(invalid="ignore"):
+                    breached[:, column] &= usable & (values >= threshold)
+
+        rows, columns = np.nonzero(breached)
+        minutes = [minutes for minutes, _ in rules.values()]
+        return [(history.names[scanned[row]], minutes[column], float(changes[row, column])) for row, column in zip(rows, columns)]
+
+    def scan(self, exchange, timeframes):
+        """
+        breaches() that are due an alert, a market stays quiet on a time frame it alerted on
+        for that time frame and until the rise is over
+
+        :return: list of (market name, time frame in minutes, relative change), grouped by market
+        """
+        breaches = {(name, minutes): change for name, minutes, change in self.breaches(exchange, timeframes)}
+        alerts = self.cooldowns[exchange].step(self.statistics[exchange].tick, breaches,
+                                               lambda key: self.ticks(exchange, key[1]))
+        return [(name, minutes, breaches[name, minutes]) for name, minutes in alerts]
+
+    def __getitem__(self, market):
+        """
+        :param market: Market of any exchange or orientation
+        :return: VolumeSeries by exchange, for the exchanges that track the market
+        """
+        names = (market.pair_name(), "{}-{}".format(market.traded_coin.coin, market.base_coin.coin))
+        series = {}
+        for exchange, history in self.histories.items():
+            for market_name in names:
+                if market_name in history:
+                    series[exchange] = history[market_name]
+                    break
+        return series
+
+    def __iter__(self):
+        return iter(self.histories)
+
+    def __len__(self):
+        return len(self.histories)
@@ -0,0 +1,82 @@
+"""
+   Volume pollers of every exchange and the scan after each of their ticks,
+   run inside the bot or in the volume worker process
+"""
+
+import asyncio
+
+from digicoins.metrics import metrics
+
+
+class VolumeScanner:
+    """
+    One poller per exchange of a MarketVolumeStore, each at the exchange's cadence and none
+    waiting for another. Alerts of a tick go to publish as a list of
+    (exchange name, market name, time frame in minutes, relative change)
+    """
+
+    def __init__(self, executor, history, timeframes, subscriptions, publish):
+        """
+        :param executor: AsyncPublicClientQueryExecutor the volumes are polled through
+        :param history: MarketVolumeStore
+        :param timeframes: time frame in minutes -> minimal change or {statistic: minimal value}, read on every scan
+        :param subscriptions: SubscriptionIndex of the markets polled, kept and scanned
+        :param publish: coroutine function taking the alerts of one tick
+        """
+        self.executor = executor
+        self.history = history
+        self.timeframes = timeframes
+        self.publish = publish
+        self.tasks = []
+        self.set_subscriptions(subscriptions)
+
+    def set_subscriptions(self, subscriptions):
+        """
+        Call again after changing the SubscriptionIndex in place
+        """
+        self.subscriptions = subscriptions
+        self.history.set_market_filter(subscriptions.__contains__)
+
+    def start(self):
+        if not self.tasks:
+            self.tasks = [asyncio.ensure_future(self.poll(exchange)) for exchange in self.history]
+        return self.tasks
+
+    async def update_pair_volumes(self, exchange):
+        try:
+            names, volumes = await self.executor.get_market_volumes(exchange, self.subscriptions.matches_market)
+        except Exception as problem:
+            print("unable to poll volumes of", exchange, problem)
+            # keeps ticks in step with time, only this exchange's history repeats its samples
+            metrics.increment("digicoins_fallback_ticks_total", exchange)
+            self.history.repeat_last(exchange)
+            return
+
+        self.history.record(exchange, names, volumes)
+
+    def scan(self, exchange):
+        exchange_name = self.executor.clients[exchange].name
+        return [(exchange_name, pair, time_frame, change) for pair, time_frame, change in self.history.scan(exchange, self.timeframes)]
+
+    async def poll(self, exchange):
+        interval = self.history.intervals[exchange]
+        loop = asyncio.get_event_loop()
+        next_tick = loop.time()
+
+        while True:
+            started = metrics.start()
+            await self.update_pair_volumes(exchange)
+            metrics.observe("poll", exchange, started)
+
+            started = metrics.start()
+            alerts = self.scan(exchange)
+            metrics.observe("scan", exchange, started)
+
+            if alerts:
+                await self.publish(alerts)
+            else:
+                print("no big deals on", exchange, "..")
+
+            # ticks stay on schedule however long the poll took
+            next_tick += interval
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
@@ -0,0 +1,259 @@
+"""
+   Rolling volume statistics per market, updated in O(1) per market and tick: window
+   minimum and maximum from monotonic deques, EWMA mean and variance for z-scores.
+   Alert rules put thresholds on them, a cooldown state machine deduplicates the alerts
+"""
+
+import math
+from collections import deque
+
+import numpy as np
+
+# change: relative to the volume a time frame ago, rise: relative to the time frame's lowest volume,
+# breakout: relative to the time frame's highest volume, z: z-score against the time frame's EWMA
+STATISTICS = ("change", "rise", "breakout", "z")
+
+# standard deviation floor relative to the mean
+MINIMAL_DEVIATION = 1e-4
+
+
+def alert_rules(timeframes):
+    """
+    :param timeframes: time frame in minutes -> minimal change, or -> {statistic: minimal value}
+    :return: time frame in minutes -> {statistic: minimal value}, all of them must be reached
+    """
+    return {minutes: dict(rule) if isinstance(rule, dict) else {"change": rule} for minutes, rule in timeframes.items()}
+
+
+TIMEFRAME_USAGE = "use !tf minutes[,threshold][,statistic], statistics are " + ", ".join(STATISTICS)
+
+
+def edit_timeframes(timeframes, arguments):
+    """
+    Applies the arguments of !tf to the time frames in place: minutes alone drops the time frame,
+    minutes,threshold[,statistic] sets a threshold, change by default, minutes,statistic drops one
+
+    :param timeframes: time frame in minutes -> rule, as alert_rules takes them
+    :param arguments: the comma separated arguments, lower case
+    :raises ValueError: on malformed arguments, timeframes are left as they were
+    """
+    if not arguments or not arguments[0].isdigit() or int(arguments[0]) == 0:
+        raise ValueError("{} is not a number of minutes, {}".format(arguments[0] if arguments else "nothing", TIMEFRAME_USAGE))
+    if len(arguments) > 3:
+        raise ValueError("too many arguments, " + TIMEFRAME_USAGE)
+    minutes = int(arguments[0])
+    rule = alert_rules({minutes: timeframes.get(minutes, {})})[minutes]
+
+    if len(arguments) == 1:
+        rule = {}
+    elif len(arguments) == 2 and arguments[1] in STATISTICS:
+        rule.pop(arguments[1], None)
+    else:
+        try:
+            threshold = float(arguments[1])
+        except ValueError:
+            threshold = float("nan")
+        if not math.isfinite(threshold):
+            raise ValueError("{} is not a threshold, {}".format(arguments[1], TIMEFRAME_USAGE))
+        statistic = arguments[2] if len(arguments) == 3 else "change"
+        if statistic not in STATISTICS:
+            raise ValueError("{} is not a statistic, {}".format(statistic, TIMEFRAME_USAGE))
+        rule[statistic] = threshold
+
+    if rule:
+        timeframes[minutes] = rule
+    else:
+        timeframes.pop(minutes, None)
+
+
+class RollingWindow:
+    """
+    Statistics of every market over the last ticks samples. Each update sees the new
+    volume against the window before it: rise, breakout and z of the latest tick
+    """
+
+    def __init__(self, ticks):
+        self.ticks = ticks
+        self.alpha = 2.0 / (ticks + 1)
+        # (tick, volume) with increasing volumes for the minimum, decreasing ones for the maximum
+        self.minimums = []
+        self.maximums = []
+        self.means = np.zeros(0, dtype=np.float64)
+        self.variances = np.zeros(0, dtype=np.float64)
+        self.first_ticks = np.zeros(0, dtype=np.int64)
+        self.seen = np.zeros(0, dtype=bool)
+
+        self.rise = np.zeros(0, dtype=np.float64)
+        self.breakout = np.zeros(0, dtype=np.float64)
+        self.z = np.zeros(0, dtype=np.float64)
+        self.valid = np.zeros(0, dtype=bool)
+
+    def __grow__(self, count):
+        added = count - len(self.minimums)
+        self.minimums.extend(deque() for _ in range(added))
+        self.maximums.extend(deque() for _ in range(added))
+        self.means = np.concatenate((self.means, np.zeros(added)))
+        self.variances = np.concatenate((self.variances, np.zeros(added)))
+        self.first_ticks = np.concatenate((self.first_ticks, np.zeros(added, dtype=np.int64)))
+        self.seen = np.concatenate((self.seen, np.zeros(added, dtype=bool)))
+
+    def update(self, tick, volumes):
+        """
+        :param volumes: volume of every market at tick, NaN where the market has no sample
+        """
+        count = len(volumes)
+        if count > len(self.minimums):
+            self.__grow__(count)
+        rows = np.nonzero(~np.isnan(volumes))[0]
+        values = volumes[rows]
+        oldest = tick - self.ticks
+
+        lows = np.full(count, np.nan)
+        highs = np.full(count, np.nan)
+        for row, value in zip(rows.tolist(), values.tolist()):
+            minimum = self.minimums[row]
+            while minimum and minimum[0][0] <= oldest:
+                minimum.popleft()
+            if minimum:
+                lows[row] = minimum[0][1]
+            while minimum and minimum[-1][1] >= value:
+                minimum.pop()
+            minimum.append((tick, value))
+
+            maximum = self.maximums[row]
+            while maximum and maximum[0][0] <= oldest:
+                maximum.popleft()
+            if maximum:
+                highs[row] = maximum[0][1]
+            while maximum and maximum[-1][1] <= value:
+                maximum.pop()
+            maximum.append((tick, value))
+
+        # a market's first sample starts its mean
+        starting = ~self.seen[rows]
+        self.first_ticks[rows[starting]] = tick
+        self.seen[rows] = True
+        self.means[rows[starting]] = values[starting]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.rise = volumes / lows - 1
+            self.breakout = volumes / highs - 1
+            # flat volumes of quiet markets would make any move infinitely unusual
+            deviations = np.maximum(np.sqrt(self.variances), MINIMAL_DEVIATION * np.abs(self.means))
+            self.z = (volumes - self.means) / deviations
+        # a window is usable once it spans its whole length of samples
+        self.valid = self.seen & (tick - self.first_ticks >= self.ticks) & ~np.isnan(volumes)
+
+        # exponentially weighted mean and variance, incremental form
+        deltas = values - self.means[rows]
+        self.means[rows] += self.alpha * deltas
+        self.variances[rows] = (1 - self.alpha) * (self.variances[rows] + self.alpha * deltas * deltas)
+
+    def statistic(self, name):
+        return getattr(self, name), self.valid
+
+    def reset(self, rows):
+        """
+        Forgets rows, their next sample starts them over
+        """
+        for row in rows:
+            if row < len(self.minimums):
+                self.minimums[row].clear()
+                self.maximums[row].clear()
+                self.seen[row] = False
+                self.means[row] = 0.0
+                self.variances[row] = 0.0
+
+
+class VolumeStatistics:
+    """
+    RollingWindows of one VolumeHistory, fed the same ticks. Windows added later are
+    warmed up from the samples the history still holds
+    """
+
+    def __init__(self, history):
+        self.history = history
+        self.windows = {}
+        self.tick = 0
+
+    def __column__(self, names, volumes):
+        column = np.full(len(self.history.names), np.nan)
+        column[[self.history.rows[name] for name in names]] = volumes
+        return column
+
+    def update(self, names, volumes):
+        self.tick += 1
+        column = self.__column__(names, volumes)
+        for window in self.windows.values():
+            window.update(self.tick, column)
+
+    def reset(self, rows):
+        for window in self.windows.values():
+            window.reset(rows)
+
+    def skip(self):
+        # a tick without samples, windows still move on in time
+        self.tick += 1
+
+    def set_windows(self, ticks):
+        """
+        Keeps exactly the windows of the given lengths in ticks
+        """
+        for length in set(self.windows) - set(ticks):
+            del self.windows[length]
+        for length in set(ticks) - set(self.windows):
+            self.windows[length] = self.__warm__(RollingWindow(length))
+
+    def __warm__(self, window):
+        history = self.history
+        count = len(history.names)
+        if count == 0 or history.head < 0:
+            return window
+        sizes = history.sizes[:count]
+        # the ewma forgets what is older than a few windows
+        ages = min(int(sizes.max()), 4 * window.ticks + 1)
+        for age in range(ages - 1, -1, -1):
+            column = np.where(sizes > age, history.volumes[:count, (history.head - age) % history.capacity], np.nan)
+            window.update(self.tick - age, column)
+        return window
+
+
+ARMED, FIRED, SUSTAINED = "armed", "fired", "sustained"
+
+
+class AlertCooldowns:
+    """
+    Alert state of every (market, time frame) of one exchange, without touching its samples:
+    armed --breach--> fired, alerts --cooldown over--> armed, or sustained while still in breach
+    sustained --breach over--> armed. A long rise alerts once, a new one needs the first to end
+    """
+
+    def __init__(self):
+        # key -> (state, tick the cooldown ends), armed keys are left out
+        self.states = {}
+
+    def step(self, tick, breaches, cooldown):
+        """
+        :param breaches: keys over their thresholds at tick
+        :param cooldown: key -> ticks an alert of it keeps the key quiet
+        :return: keys to alert, in breaches order
+        """
+        alerts = []
+        for key in breaches:
+            if key not in self.states:
+                self.states[key] = (FIRED, tick + cooldown(key))
+                alerts.append(key)
+
+        for key, (state, until) in list(self.states.items()):
+            if state == FIRED and tick >= until:
+                if key in breaches:
+                    self.states[key] = (SUSTAINED, until)
+                else:
+                    del self.states[key]
+            elif state == SUSTAINED and key not in breaches:
+                del self.states[key]
+        return alerts
+
+    def stats(self):
+        states = [state for state, _ in self.states.values()]
+        return {FIRED: states.count(FIRED), SUSTAINED: states.count(SUSTAINED)}
@@ -0,0 +1,176 @@
+"""
+   The volume scanner in a process of its own, so polling and scanning never hold the
+   bot's event loop or GIL. Alerts come back over a pipe, time frame changes go the other way
+"""
+
+import asyncio
+import multiprocessing
+
+import volume_history
+from volume_scanner import VolumeScanner
+from subscriptions import SubscriptionIndex
+from digicoins.metrics import metrics,MetricsServer
+from digicoins.queries import AsyncPublicClientQueryExecutor
+
+# message kinds, every message is a (kind, payload) tuple
+ALERTS = "alerts"
+TIMEFRAMES = "timeframes"
+SUBSCRIPTIONS = "subscriptions"
+
+
+async def receive(connection):
+    """
+    Next message of connection, waiting on the event loop instead of blocking a thread
+    that would keep the interpreter from exiting
+    """
+    loop = asyncio.get_event_loop()
+    # poll() is also true once the other end is closed, recv() raises EOFError then
+    while not connection.poll():
+        readable = loop.create_future()
+        loop.add_reader(connection.fileno(), lambda: readable.done() or readable.set_result(None))
+        try:
+            await readable
+        finally:
+            loop.remove_reader(connection.fileno())
+    return connection.recv()
+
+
+def split_rate_limits(rate_limits, worker_share):
+    """
+    Splits every exchange's quota between the bot and the worker process. Each process has
+    its own schedulers, so rather than routing every request through one limiter across the
+    pipe, each one gets a fixed part of the rate and burst and together they stay within the quota
+
+    :param rate_limits: exchange -> (requests per second, burst), as in AsyncPublicClientQueryExecutor presets
+    :param worker_share: part of each quota the worker's volume polls get, strictly between 0 and 1
+    :return: (bot rate limits, worker rate limits), a burst of 1 can't be split and goes to the worker whole
+    """
+    if not 0 < worker_share < 1:
+        raise ValueError("volume_worker_rate_share must be between 0 and 1, got {}".format(worker_share))
+    bot, worker = {}, {}
+    for exchange, (rate, burst) in rate_limits.items():
+        worker_burst = min(burst, max(1, int(burst * worker_share)))
+        bot[exchange] = (rate * (1 - worker_share), burst - worker_burst)
+        worker[exchange] = (rate * worker_share, worker_burst)
+    return bot, worker
+
+
+def run_worker(alerts, control, settings):
+    """
+    Worker process main, with its own event loop, exchange clients, rate limiters and volume history
+
+    :param alerts: connection the alerts of every tick are sent on
+    :param control: connection time frame and subscription changes arrive on, closed when the bot process is gone
+    :param settings: picklable subset of the bot presets, see VolumeWorker
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    executor = AsyncPublicClientQueryExecutor(settings["catalog_path"])
+    if settings.get("rate_limits") is not None:
+        # the worker's part of each exchange quota, the bot keeps the rest, see split_rate_limits
+        executor.set_rate_limits(settings["rate_limits"])
+    # nothing in here serves wall reports
+    executor.presets["streamed_markets"] = {}
+    executor.presets["refresh_ticker_snapshots"] = False
+    subscriptions = SubscriptionIndex(settings["subscriptions"])
+    history = volume_history.MarketVolumeStore.persistent(settings["history_path"], settings["poll_intervals"],
+                                                          market_filter=subscriptions.__contains__)
+
+    async def publish(events):
+        alerts.send((ALERTS, events))
+
+    scanner = VolumeScanner(executor, history, dict(settings["timeframes"]), subscriptions, publish)
+
+    async def listen():
+        while True:
+            kind, payload = await receive(control)
+            if kind == TIMEFRAMES:
+                scanner.timeframes = payload
+            elif kind == SUBSCRIPTIONS:
+                scanner.set_subscriptions(SubscriptionIndex(payload))
+
+    if settings.get("metrics_port") is not None:
+        metrics.enabled = True
+        loop.run_until_complete(MetricsServer(metrics, port=settings["metrics_port"]).start())
+    loop.run_until_complete(executor.start())
+    scanner.start()
+    try:
+        loop.run_until_complete(listen())
+    except EOFError:
+        print("bot process is gone, volume worker stops")
+
+
+class VolumeWorker:
+    """
+    The bot's side of the volume worker: starts the process, relays its alerts and
+    restarts it when it dies. Settings are "timeframes", "subscriptions" (SubscriptionIndex entries),
+    "poll_intervals", "history_path", "catalog_path" and optionally "metrics_port" and "rate_limits",
+    the worker's part of the exchange quotas from split_rate_limits
+    """
+
+    def __init__(self, settings, restart_delay=60.0):
+        self.settings = settings
+        self.restart_delay = restart_delay
+        # a fresh interpreter, nothing of the bot's event loop or discord client is inherited
+        self.context = multiprocessing.get_context("spawn")
+        self.process = None
+        self.alerts = None
+        self.control = None
+        self.restarts = 0
+
+    def start(self):
+        self.alerts, worker_alerts = self.context.Pipe(duplex=False)
+        worker_control, self.control = self.context.Pipe(duplex=False)
+        self.process = self.context.Process(target=run_worker, args=(worker_alerts, worker_control, self.settings),
+                                            name="volume-worker", daemon=True)
+        self.process.start()
+        # only the worker holds these ends now, so its death reads as EOF on ours
+        worker_alerts.close()
+        worker_control.close()
+
+    def __send__(self, kind, payload):
+        self.settings[kind] = payload
+        if self.control is None:
+            return
+        try:
+            self.control.send((kind, payload))
+        except OSError as problem:
+            # a restarted worker starts from settings, which already hold the change
+            print("unable to reach the volume worker", problem)
+
+    def set_timeframes(self, timeframes):
+        self.__send__(TIMEFRAMES, dict(timeframes))
+
+    def set_subscriptions(self, subscriptions):
+        self.__send__(SUBSCRIPTIONS, subscriptions.entries())
+
+    async def run(self, publish):
+        """
+        Keeps the worker running and awaits publish with the alerts of each of its ticks
+        """
+        loop = asyncio.get_event_loop()
+        while True:
+            if self.process is None:
+                self.start()
+            try:
+                kind, payload = await receive(self.alerts)
+            except (EOFError, OSError):
+                await loop.run_in_executor(None, self.process.join)
+                print("volume worker exited with", self.process.exitcode, "restarting in", self.restart_delay, "seconds")
+                self.alerts.close()
+                self.control.close()
+                self.process = self.alerts = self.control = None
+                self.restarts += 1
+                await asyncio.sleep(self.restart_delay)
+                continue
+
+            if kind == ALERTS:
+                await publish(payload)
+
+    def stats(self):
+        return {
+            "pid": None if self.process is None else self.process.pid,
+            "alive": self.process is not None and self.process.is_alive(),
+            "restarts": self.restarts
+        }
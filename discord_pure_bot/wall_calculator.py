@@ -1,6 +1,16 @@
-from digicoins.entity import Coin,Market
-from digicoins.queries import OrderBookQuery,TickerQuery,PublicClientQueryExecutor
+import asyncio
 
+from digicoins.entity import registry,ColumnarOrderBook,Ticker
+from digicoins.queries import OrderBookQuery,TickerQuery,PublicClientQueryExecutor,AsyncPublicClientQueryExecutor
+from digicoins.scheduler import DeadlineExceeded
+from digicoins.singleflight import SingleFlight
+from digicoins.metrics import metrics
+from digicoins.cache import ExpiringLruCache
+from rendering import templates
+from wall_engine import WallEngine
+
+# exchange parameter asking for one report over the books of every exchange
+ALL_EXCHANGES = "ALL"
 
 class WallCommandInterpreter:
 
@@ -8,20 +18,15 @@ class WallCommandInterpreter:
 
         self.exchanges = ["GDAX","BITFINEX","BITTREX"]
 
-        self.usd = Coin("USD")
-        self.btc = Coin("BTC")
-        self.eth = Coin("ETH")
-        self.ltc = Coin("LTC")
-
         self.coin_default_markets = {
-            "BTC": Market(self.usd, self.btc),
-            "ETH": Market(self.usd,self.eth),
-            "LTC": Market(self.usd,self.ltc)
+            "BTC": registry.market("USD","BTC"),
+            "ETH": registry.market("USD","ETH"),
+            "LTC": registry.market("USD","LTC")
         }
         self.market_default_exchanges = {
-            Market(self.usd, self.btc):"BITFINEX",
-            Market(self.usd, self.eth):"GDAX",
-            Market(self.usd, self.ltc):"GDAX",
+            registry.market("USD","BTC"):"BITFINEX",
+            registry.market("USD","ETH"):"GDAX",
+            registry.market("USD","LTC"):"GDAX",
         }
 
     def get_params(self,command_params):
@@ -38,14 +43,12 @@ class WallCommandInterpreter:
     def get_ticker_from_params(self,params):
         coin = params[0]
         if coin.find("-") > -1:
-            c1 = coin.split("-")[0]
-            c2 = coin.split("-")[1]
-            market = Market(Coin(c1),Coin(c2))
+            market = registry.parse(coin)
         else:
             if coin in self.coin_default_markets:
                 market = self.coin_default_markets[coin]
             else:
-                market = Market(self.btc,Coin(coin))
+                market = registry.lookup("BTC",coin)
         return market
 
     def get_depth_from_params(self,params):
@@ -64,7 +67,7 @@ class WallCommandInterpreter:
 
     def get_exchange_from_params(self,params,market):
         for param in params[1:]:
-            if param in self.exchanges:
+            if param in self.exchanges or param == ALL_EXCHANGES:
                 return param
 
         if market in self.market_default_exchanges:
@@ -92,15 +95,20 @@ quit()
 
 class WallCalculator:
 
-    def __init__(self):
-        self.publicClientQueryExecutor = PublicClientQueryExecutor()
+    def __init__(self,publicClientQueryExecutor=None):
+        if publicClientQueryExecutor is None:
+            publicClientQueryExecutor = PublicClientQueryExecutor()
+        self.publicClientQueryExecutor = publicClientQueryExecutor
         self.wallCommandInterpreter = WallCommandInterpreter()
         self.presets = {
             "top_book_limit":50,
             "wall_min_volume":0.04,
             "wall_max_total_volume":0.75,
-            "wall_max_count":10
+            "wall_max_count":10,
+            "report_cache_ttl":60.0,
+            "report_cache_max_entries":128
         }
+        self.report_cache = ExpiringLruCache({}, self.presets["report_cache_max_entries"], self.presets["report_cache_ttl"])
 
     def walls(self,message):
         command = message.content.split(" ")[1:]
@@ -109,12 +117,71 @@ class WallCalculator:
             return self.help()
 
         order_book_query,ticker_query = self.wallCommandInterpreter.get_params(command)
+        if order_book_query.market is None:
+            return self.help()
+        if order_book_query.exchange == ALL_EXCHANGES:
+            return self.consolidate(order_book_query.market,[
+                (self.publicClientQueryExecutor.get_order_book(exchange_book_query,cut=True),
+                 self.publicClientQueryExecutor.get_ticker(exchange_ticker_query))
+                for exchange_book_query,exchange_ticker_query in self.exchange_queries(order_book_query)
+            ])
         order_book = self.publicClientQueryExecutor.get_order_book(order_book_query,cut=True)
         ticker = self.publicClientQueryExecutor.get_ticker(ticker_query)
+        return self.render(order_book,ticker)
+
+    def exchange_queries(self,order_book_query):
+        """
+        Book and ticker queries for every exchange listing the market the same way round,
+        USDT markets count as USD ones through Coin.coin_synonims
+        """
+        queries = []
+        for exchange in self.wallCommandInterpreter.exchanges:
+            listed = self.publicClientQueryExecutor.clients[exchange].__specify_market__(order_book_query.market)
+            if listed is not None and listed.base_coin == order_book_query.market.base_coin:
+                queries.append((OrderBookQuery(exchange,order_book_query.market,order_book_query.depth),
+                                TickerQuery(exchange,order_book_query.market)))
+        return queries
+
+    def consolidate(self,market,reports):
+        """
+        Wall report over the merged books of several exchanges
+
+        :param reports: (order book, ticker) of every exchange, missing answers as None
+        """
+        reports = [(order_book,ticker) for order_book,ticker in reports if order_book is not None and ticker is not None]
+        if not reports:
+            return None
+
+        exchange_name = " + ".join(order_book.market.exchange_name for order_book,_ in reports)
+        market_name = "{}-{}".format(market.base_coin.coin,market.traded_coin.coin)
+        consolidated = registry.market(market.base_coin.coin,market.traded_coin.coin,market_name,exchange_name)
+
+        order_book = ColumnarOrderBook.merge(consolidated,[order_book for order_book,_ in reports])
+        lasts = sorted(ticker.last for _,ticker in reports)
+        ticker = Ticker(consolidated,
+                        min(ticker.ask for _,ticker in reports),
+                        max(ticker.bid for _,ticker in reports),
+                        lasts[len(lasts) // 2],
+                        timestamp=max(ticker.timestamp for _,ticker in reports))
+        return self.render(order_book,ticker)
+
+    def render(self,order_book,ticker):
         if order_book is not None and ticker is not None:
+            exchange = order_book.market.exchange_name
+            # the same levels and prices render the same report, timestamps tell nothing about the content:
+            # bitfinex books carry the time of their best bid only and ticker snapshots are up to 30 seconds old
+            key = (exchange, order_book.market.market_name, order_book.fingerprint(), ticker.ask, ticker.bid, ticker.last)
+            view = self.report_cache.get(key)
+            if view is not None:
+                return view
+            started = metrics.start()
             model = self.calculate_walls_model(order_book,ticker)
+            metrics.observe("model",exchange,started)
             if model is not None:
+                started = metrics.start()
                 view = model.view()
+                metrics.observe("view",exchange,started)
+                self.report_cache.put(key,view)
                 return view
 
     def calculate_walls_model(self, order_book,ticker):
@@ -123,8 +190,7 @@ class WallCalculator:
         model.ticker = ticker
         model.is_usd = order_book.market.base_coin.coin == "USD" or order_book.market.traded_coin.coin == "USD"
 
-        model.bid_grand_volume = sum(bid.traded_quantity for bid in order_book.bids)
-        model.ask_grand_volume = sum(ask.traded_quantity for ask in order_book.asks)
+        model.bid_grand_volume,model.ask_grand_volume,largest = WallEngine(self.presets["wall_max_count"]).select(order_book)
         model.book_grand_volume = model.bid_grand_volume + model.ask_grand_volume
 
         model.bid_grand_volume_in_base_coin = model.bid_grand_volume * ticker.last
@@ -132,8 +198,7 @@ class WallCalculator:
 
         model.resistance = 100 * model.ask_grand_volume / model.bid_grand_volume
 
-        bookEntries = sorted(order_book.bids + order_book.asks,key=lambda orderBookEntry: orderBookEntry.traded_quantity, reverse=True)
-        bookEntries = bookEntries[:self.presets["wall_max_count"]]
+        bookEntries = [order_book.entry(side,index) for side,index in largest]
         total_wall_size = 0.0
 
         walls = []
@@ -154,9 +219,79 @@ class WallCalculator:
  [HELP]
 -------------------------------------------
 To use the bot, use the following syntax:
-!walls [coin] [number of orders] [exchange]
+!walls [coin] [number of orders] [exchange or all]
         ```'''
 
+class AsyncWallCalculator(WallCalculator):
+    """
+    WallCalculator running on the bot event loop, book and ticker are fetched concurrently
+    """
+
+    def __init__(self):
+        super().__init__(AsyncPublicClientQueryExecutor())
+        self.report_flights = SingleFlight()
+
+    async def start(self):
+        await self.publicClientQueryExecutor.start()
+
+    async def walls(self,message):
+        command = message.content.split(" ")[1:]
+
+        if self.wallCommandInterpreter.is_help(command):
+            return self.help()
+
+        order_book_query,ticker_query = self.wallCommandInterpreter.get_params(command)
+        if order_book_query.market is None:
+            return self.help()
+        return await self.report_flights.do(
+            order_book_query.key(),
+            lambda: self.report(order_book_query,ticker_query)
+        )
+
+    async def fetch(self,order_book_query,ticker_query):
+        return await asyncio.gather(
+            self.publicClientQueryExecutor.get_order_book(order_book_query,cut=True),
+            self.publicClientQueryExecutor.get_ticker(ticker_query)
+        )
+
+    async def report(self,order_book_query,ticker_query):
+        started = metrics.start()
+        if order_book_query.exchange == ALL_EXCHANGES:
+            view = await self.consolidated_report(order_book_query)
+            metrics.observe("report",order_book_query.exchange,started)
+            return view
+
+        try:
+            order_book,ticker = await self.fetch(order_book_query,ticker_query)
+        except DeadlineExceeded as problem:
+            print("no report from",order_book_query.exchange,problem)
+            return self.busy(order_book_query.exchange)
+        metrics.observe("gather",order_book_query.exchange,started)
+        view = self.render(order_book,ticker)
+        metrics.observe("report",order_book_query.exchange,started)
+        return view
+
+    async def consolidated_report(self,order_book_query):
+        # every exchange at once, the slowest one sets the latency
+        queries = self.exchange_queries(order_book_query)
+        results = await asyncio.gather(*[self.fetch(*exchange_queries) for exchange_queries in queries],return_exceptions=True)
+
+        reports = []
+        busy = False
+        for (exchange_book_query,_),result in zip(queries,results):
+            if isinstance(result,BaseException):
+                print("no book from",exchange_book_query.exchange,result)
+                busy = busy or isinstance(result,DeadlineExceeded)
+                continue
+            reports.append(result)
+        if not reports and busy:
+            return self.busy("every exchange")
+        return self.consolidate(order_book_query.market,reports)
+
+    def busy(self,exchange):
+        # the exchange's request quota is taken by other queries for longer than the interactive deadline
+        return "{} is busy, try again in a moment".format(exchange)
+
 class WallEntry:
     def __init__(self,orderBookEntry,size):
         self.orderBookEntry = orderBookEntry
@@ -176,51 +311,8 @@ class WallModel:
         self.book_grand_volume = None
         self.walls = None
 
-        self.deal_des = {
-            "asks": "In {} Asks",
-            "bids": "In {} Bids"
-        }
-        self.strike_line = "======================================================"
-
     def view(self):
-
-        message = "```\n"
-        message += "[Wall report from {}]\n\n".format(self.book.market.exchange_name)
-        if self.is_usd:
-            message += "[Last Price]\n{}\n  {} {:2.02f}\n".format(self.strike_line,self.book.market.base_coin.symbol,self.ticker.last)
-        else:
-            message += "[Last Price]\n{}\n  {} {:2.08f}\n".format(self.strike_line,self.book.market.base_coin.symbol,self.ticker.last)
-
-        for side in ["asks","bids"]:
-            deal_title = self.deal_des[side].format(len(self.book.deals[side]))
-            message += "\n[{}] {}\n{}\n" \
-                .format(self.ticker.market.market_name, deal_title,self.strike_line)
-
-            for wallEntry in self.walls:
-                if wallEntry.orderBookEntry.side == side:
-                    if self.is_usd:
-                        message += "  {} {:8.02f}  -  {:12.02f} {} {}\n" \
-                            .format(self.book.market.base_coin.symbol, wallEntry.orderBookEntry.rate, wallEntry.orderBookEntry.traded_quantity,
-                                    self.book.market.traded_coin.coin, "█" * int(wallEntry.size * 100))
-                    else:
-                        message += "  {} {:8.08f}  -  {:8.02f} {} {}\n" \
-                            .format(self.book.market.base_coin.symbol,wallEntry.orderBookEntry.rate, wallEntry.orderBookEntry.base_quantity,
-                                    self.book.market.base_coin.coin, "█" * int(wallEntry.size * 100))
-            message += "\n"
-
-        if self.is_usd:
-            resistance_params = (self.ask_grand_volume, self.book.market.traded_coin.coin,
-                        self.bid_grand_volume, self.book.market.traded_coin.coin,
-                        self.resistance)
-        else:
-            resistance_params = (self.ask_grand_volume_in_base_coin, self.book.market.base_coin.coin,
-                        self.bid_grand_volume_in_base_coin, self.book.market.base_coin.coin,
-                        self.resistance)
-        message += "====> Summary : Total Resistance / Support : {:.02f} {} / {:.02f} {} === {:.02f}% Resistance\n"\
-            .format(*resistance_params)
-        message += "```"
-
-        return message
+        return templates.wall_report(self.book.market).render(self)
 
 """
 
@@ -0,0 +1,57 @@
+import numpy as np
+
+
+class WallEngine:
+    """
+    Grand volumes and the largest levels of a ColumnarOrderBook without sorting the whole book.
+    Levels are ranked as in a stable sort of bids followed by asks by descending quantity
+    """
+
+    def __init__(self, count, small_book=256):
+        self.count = count
+        # below this many levels one stable sort beats partitioning both sides
+        self.small_book = small_book
+
+    def largest_indices(self, quantities):
+        """
+        Indices of every level at least as large as the count-th largest one, in book order
+        """
+        size = len(quantities)
+        if size <= self.count:
+            return np.arange(size)
+        threshold = np.partition(quantities, size - self.count)[size - self.count]
+        return np.flatnonzero(quantities >= threshold)
+
+    def select(self, order_book):
+        """
+        :return: bid grand volume, ask grand volume, list of (side, index) of the largest levels
+        """
+        bid_quantities = order_book.quantities["bids"]
+        ask_quantities = order_book.quantities["asks"]
+        bid_count = len(bid_quantities)
+        # totals and selection stay separate passes: numpy has no partition that also sums, and a
+        # vectorized sum over the contiguous column is a small part of the cost of the partition
+
+        if bid_count + len(ask_quantities) <= self.small_book:
+            positions = np.argsort(-np.concatenate((bid_quantities, ask_quantities)), kind="stable")[:self.count]
+            return float(bid_quantities.sum()), float(ask_quantities.sum()), self.__sides__(positions, bid_count)
+
+        bid_indices = self.largest_indices(bid_quantities)
+        ask_indices = self.largest_indices(ask_quantities)
+
+        # candidates hold at most a few more than 2 * count levels, ranking them is cheap
+        candidates = np.concatenate((bid_quantities[bid_indices], ask_quantities[ask_indices]))
+        positions = np.concatenate((bid_indices, ask_indices + len(bid_quantities)))
+        ranked = np.lexsort((positions, -candidates))[:self.count]
+
+        return float(bid_quantities.sum()), float(ask_quantities.sum()), self.__sides__(positions[ranked], bid_count)
+
+    @staticmethod
+    def __sides__(positions, bid_count):
+        largest = []
+        for position in positions.tolist():
+            if position < bid_count:
+                largest.append(("bids", position))
+            else:
+                largest.append(("asks", position - bid_count))
+        return largest
@@ -0,0 +1,212 @@
+import math
+
+import numpy as np
+
+from digicoins.entity import OrderBookEntry,ColumnarOrderBook
+from digicoins.sortedlist import SortedKeyList
+from wall_calculator import WallModel,WallEntry
+
+
+class WallTracker:
+    """
+    Keeps grand volumes, resistance and walls of one market up to date as single price levels change.
+
+    Only the depth best levels of each side count, like a wall query cut to that depth. Levels are ranked
+    by descending quantity, bids before asks and best price first, so walls match calculate_walls_model
+    """
+
+    SIDES = ("asks", "bids")
+    SIDE_RANKS = {"bids": 0, "asks": 1}
+    RESUM_INTERVAL = 10000
+
+    def __init__(self, market, presets, depth=None):
+        self.market = market
+        self.presets = presets
+        self.depth = depth
+
+        self.sizes = {"asks": {}, "bids": {}}
+        # price keys of every level, sorted best price first
+        self.prices = {"asks": SortedKeyList(), "bids": SortedKeyList()}
+        self.grand_volumes = {"asks": 0.0, "bids": 0.0}
+        self.ranked = SortedKeyList()
+        self.current_walls = {"asks": {}, "bids": {}}
+        self.updates = 0
+        self.timestamp = None
+
+        self.on_appear = []
+        self.on_disappear = []
+        self.on_move = []
+
+    @staticmethod
+    def __price_key__(side, price):
+        # its own inverse, also turns a key back into its price
+        return price if side == "asks" else -price
+
+    def __rank_key__(self, side, price, quantity):
+        return -quantity, WallTracker.SIDE_RANKS[side], WallTracker.__price_key__(side, price)
+
+    def __in_window__(self, position):
+        return self.depth is None or position < self.depth
+
+    def __enter_window__(self, side, price):
+        quantity = self.sizes[side][price]
+        self.grand_volumes[side] += quantity
+        self.ranked.add(self.__rank_key__(side, price, quantity))
+
+    def __leave_window__(self, side, price):
+        quantity = self.sizes[side][price]
+        self.grand_volumes[side] -= quantity
+        self.ranked.remove(self.__rank_key__(side, price, quantity))
+
+    def __price_at__(self, side, position):
+        return WallTracker.__price_key__(side, self.prices[side][position])
+
+    def __window__(self, side):
+        prices = self.prices[side]
+        return prices.first(len(prices) if self.depth is None else self.depth)
+
+    def reset(self, asks, bids, timestamp=None):
+        self.sizes = {"asks": {}, "bids": {}}
+        self.ranked = SortedKeyList()
+        for side, levels in (("asks", asks), ("bids", bids)):
+            for price, quantity in levels:
+                if quantity > 0:
+                    self.sizes[side][price] = quantity
+            self.prices[side] = SortedKeyList.from_sorted(sorted(WallTracker.__price_key__(side, price) for price in self.sizes[side]))
+            for key in self.__window__(side):
+                price = WallTracker.__price_key__(side, key)
+                self.ranked.add(self.__rank_key__(side, price, self.sizes[side][price]))
+        self.__resum__()
+        self.timestamp = timestamp
+        self.__publish__()
+
+    def update(self, side, price, quantity, timestamp=None):
+        sizes = self.sizes[side]
+        prices = self.prices[side]
+        key = WallTracker.__price_key__(side, price)
+        position = prices.bisect_left(key)
+        in_window = self.__in_window__(position)
+
+        if price in sizes:
+            if in_window:
+                self.__leave_window__(side, price)
+            if quantity > 0:
+                sizes[price] = quantity
+                if in_window:
+                    self.__enter_window__(side, price)
+            else:
+                del sizes[price]
+                prices.remove(key)
+                if in_window and not self.__in_window__(len(prices)):
+                    # the first level below the window moves up into it
+                    self.__enter_window__(side, self.__price_at__(side, self.depth - 1))
+        elif quantity > 0:
+            if in_window and not self.__in_window__(len(prices)):
+                # the last level of the window is pushed out of it
+                self.__leave_window__(side, self.__price_at__(side, self.depth - 1))
+            prices.add(key)
+            sizes[price] = quantity
+            if in_window:
+                self.__enter_window__(side, price)
+
+        self.updates += 1
+        if self.updates % WallTracker.RESUM_INTERVAL == 0:
+            self.__resum__()
+        self.timestamp = timestamp
+        self.__publish__()
+
+    def __resum__(self):
+        # running totals drift with float rounding, recompute them exactly once in a while
+        for side in WallTracker.SIDES:
+            window = self.__window__(side)
+            self.grand_volumes[side] = math.fsum(self.sizes[side][WallTracker.__price_key__(side, key)] for key in window)
+
+    @property
+    def book_grand_volume(self):
+        return self.grand_volumes["bids"] + self.grand_volumes["asks"]
+
+    @property
+    def resistance(self):
+        return 100 * self.grand_volumes["asks"] / self.grand_volumes["bids"]
+
+    def walls(self):
+        """
+        :return: {side: {price: (quantity, size)}} of the current walls
+        """
+        walls = {"asks": {}, "bids": {}}
+        book_grand_volume = self.book_grand_volume
+        if book_grand_volume <= 0:
+            return walls
+
+        total_wall_size = 0.0
+        for negated_quantity, side_rank, price_key in self.ranked.first(self.presets["wall_max_count"]):
+            wall_size = -negated_quantity / book_grand_volume
+            if wall_size < self.presets["wall_min_volume"]:
+                break
+            total_wall_size += wall_size
+            side = "bids" if side_rank == WallTracker.SIDE_RANKS["bids"] else "asks"
+            walls[side][WallTracker.__price_key__(side, price_key)] = (-negated_quantity, wall_size)
+            if total_wall_size > self.presets["wall_max_total_volume"]:
+                break
+        return walls
+
+    def __publish__(self):
+        if not (self.on_appear or self.on_disappear or self.on_move):
+            return
+
+        walls = self.walls()
+        for side in WallTracker.SIDES:
+            previous = self.current_walls[side]
+            current = walls[side]
+            gone = [price for price in previous if price not in current]
+            new = [price for price in current if price not in previous]
+
+            # a wall leaving one price while another shows up on the same side is reported as a move
+            while gone and new:
+                old_price = gone.pop(0)
+                new_price = new.pop(0)
+                for callback in self.on_move:
+                    callback(self, side, old_price, new_price, current[new_price][0])
+            for price in gone:
+                for callback in self.on_disappear:
+                    callback(self, side, price, previous[price][0])
+            for price in new:
+                for callback in self.on_appear:
+                    callback(self, side, price, current[price][0])
+        self.current_walls = walls
+
+    def order_book(self):
+        """
+        ColumnarOrderBook of the levels inside the window
+        """
+        columns = {}
+        for side in WallTracker.SIDES:
+            window = self.__window__(side)
+            rates = np.fromiter((WallTracker.__price_key__(side, key) for key in window), dtype=np.float64, count=len(window))
+            quantities = np.fromiter((self.sizes[side][rate] for rate in rates.tolist()), dtype=np.float64, count=len(window))
+            columns[side] = (rates, quantities)
+        return ColumnarOrderBook(self.market, columns["asks"][0], columns["asks"][1],
+                                 columns["bids"][0], columns["bids"][1], timestamp=self.timestamp)
+
+    def model(self, ticker):
+        """
+        WallModel snapshot of the tracked state, as calculate_walls_model would build it
+        """
+        model = WallModel()
+        model.book = self.order_book()
+        model.ticker = ticker
+        model.is_usd = self.market.base_coin.coin == "USD" or self.market.traded_coin.coin == "USD"
+
+        model.bid_grand_volume = self.grand_volumes["bids"]
+        model.ask_grand_volume = self.grand_volumes["asks"]
+        model.book_grand_volume = self.book_grand_volume
+        model.bid_grand_volume_in_base_coin = model.bid_grand_volume * ticker.last
+        model.ask_grand_volume_in_base_coin = model.ask_grand_volume * ticker.last
+        model.resistance = self.resistance
+
+        walls = []
+        for side, side_walls in self.walls().items():
+            for price, (quantity, size) in side_walls.items():
+                walls.append(WallEntry(OrderBookEntry(self.market, side, quantity, price), size))
+        model.walls = sorted(walls, key=lambda wallEntry: wallEntry.orderBookEntry.rate, reverse=True)
+        return model